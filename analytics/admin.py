@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.template.response import TemplateResponse
+from django.urls import path
+from .menu_engineering import build_report
+from .models import DailyCategorySales, DailyDishSales, DailyPaymentSales, DailySales
+from .rollups import sales_report
+from .views import parse_period
+
+MENU_ENGINEERING_CACHE_KEY = 'analytics:menu_engineering'
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """Сводки заполняются сигналами и командой backfill_sales - только просмотр"""
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(RollupAdmin):
+    list_display = ['date', 'orders_count', 'items_count', 'revenue', 'discount', 'delivery']
+    change_list_template = 'admin/analytics/dailysales/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('report/', self.admin_site.admin_view(self.report_view), name='analytics_sales_report'),
+            path(
+                'menu-engineering/',
+                self.admin_site.admin_view(self.menu_engineering_view),
+                name='analytics_menu_engineering',
+            ),
+        ] + super().get_urls()
+
+    def report_view(self, request):
+        """Отчет о продажах за период (по умолчанию 90 дней)"""
+        try:
+            start, end = parse_period(request.GET)
+        except ValueError as e:
+            self.message_user(request, f'Некорректный период: {e}', level='error')
+            start, end = parse_period({})
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'Продажи с {start:%d.%m.%Y} по {end:%d.%m.%Y}',
+            'report': sales_report(start, end),
+        }
+        return TemplateResponse(request, 'admin/analytics/sales_report.html', context)
+
+    def menu_engineering_view(self, request):
+        """Матрица menu engineering по всей истории (кэшируется, ?refresh=1 - пересчитать)"""
+        report = None if request.GET.get('refresh') else cache.get(MENU_ENGINEERING_CACHE_KEY)
+        if report is None:
+            report = build_report()
+            cache.set(
+                MENU_ENGINEERING_CACHE_KEY,
+                report,
+                getattr(settings, 'MENU_ENGINEERING_CACHE_TIMEOUT', 60 * 60),
+            )
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Menu engineering',
+            'report': report,
+        }
+        return TemplateResponse(request, 'admin/analytics/menu_engineering.html', context)
+
+
+@admin.register(DailyDishSales)
+class DailyDishSalesAdmin(RollupAdmin):
+    list_display = ['date', 'dish_name', 'quantity', 'revenue']
+    search_fields = ['dish_name']
+
+
+@admin.register(DailyCategorySales)
+class DailyCategorySalesAdmin(RollupAdmin):
+    list_display = ['date', 'category_name', 'quantity', 'revenue']
+
+
+@admin.register(DailyPaymentSales)
+class DailyPaymentSalesAdmin(RollupAdmin):
+    list_display = ['date', 'payment_method', 'orders_count', 'revenue']
+    list_filter = ['payment_method']
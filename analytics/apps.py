@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class AnalyticsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'analytics'
+    verbose_name = 'Аналитика продаж'
+
+    def ready(self):
+        # Импортируем signals при запуске приложения
+        import analytics.signals  # noqa
@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from analytics.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневные сводки продаж по подтвержденным заказам (весь период или --since/--until)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Первый день, YYYY-MM-DD')
+        parser.add_argument('--until', help='Последний день, YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['since']) if options['since'] else None
+            end = date.fromisoformat(options['until']) if options['until'] else None
+        except ValueError as e:
+            raise CommandError(f'Некорректная дата: {e}')
+
+        days = rebuild_rollups(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Сводки пересчитаны, дней с продажами: {days}'))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+from analytics.recommendations import get_recommendation_index, rebuild_pairs
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает пары блюд по всей истории заказов и публикует индекс рекомендаций'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help='Строк заказов в одной порции')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        pairs = rebuild_pairs(chunk_size=options['chunk_size'])
+        index = get_recommendation_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пар блюд: {pairs}, блюд в индексе: {len(index)}, '
+            f'время: {time.perf_counter() - started:.2f} с'
+        ))
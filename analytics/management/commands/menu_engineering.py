@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from analytics.menu_engineering import build_report
+
+
+class Command(BaseCommand):
+    help = 'Отчет menu engineering: классы блюд, эластичность спроса по цене и совместные покупки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help='Строк заказов в одной порции')
+        parser.add_argument('--pairs', type=int, default=20, help='Сколько пар блюд показать')
+        parser.add_argument('--min-pair-orders', type=int, default=5, help='Минимум совместных заказов для пары')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        report = build_report(
+            chunk_size=options['chunk_size'],
+            pairs=options['pairs'],
+            min_pair_orders=options['min_pair_orders'],
+        )
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'Строк заказов: {report.lines}, заказов: {report.orders}, '
+            f'недель истории: {report.weeks}, время: {elapsed:.2f} с\n'
+        )
+
+        header = f'{"Категория":<20} {"Блюдо":<30} {"Продано":>8} {"Доля":>7} {"Маржа":>9} {"Эласт.":>7}  Класс'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for dish in report.dishes:
+            elasticity = f'{dish.elasticity:.2f}' if dish.elasticity is not None else '—'
+            self.stdout.write(
+                f'{dish.category[:20]:<20} {dish.name[:30]:<30} {dish.quantity:>8} '
+                f'{dish.menu_mix:>7.1%} {dish.unit_margin:>9.2f} {elasticity:>7}  {dish.menu_class_label}'
+            )
+
+        if report.pairs:
+            self.stdout.write('\nЧасто заказывают вместе:')
+            for pair in report.pairs:
+                self.stdout.write(
+                    f'  {pair["first"]} + {pair["second"]}: {pair["orders"]} заказов, lift {pair["lift"]:.2f}'
+                )
@@ -0,0 +1,442 @@
+"""
+Матрица menu engineering (популярность x маржинальность).
+
+Позиции подтвержденных заказов читаются курсором порциями по
+MENU_ENGINEERING_CHUNK_SIZE строк сразу в массивы NumPy, без создания
+объектов модели. Все накопители имеют размер, зависящий только от
+числа блюд (и недель истории), поэтому память ограничена при любом
+количестве строк:
+
+- продажи и выручка по блюдам - np.bincount;
+- продажи по (блюдо, неделя) для оценки эластичности спроса по цене;
+- совместные покупки: пары блюд внутри каждого заказа порции строятся
+  без матрицы заказ x блюдо и копятся разреженно (ключ пары -> число
+  заказов), так что память растет с числом встреченных пар, а не заказов.
+
+Дата заказа приходит из базы целым числом секунд Unix-времени, без
+разбора строк и без зависимости от TimeZone сессии.
+
+Строки читаются упорядоченными по заказу; последний заказ порции может
+продолжиться в следующей, поэтому он переносится в нее.
+
+Классы считаются внутри категории меню (Kasavana & Smith): блюдо
+популярно, если его доля продаж не меньше 70% от равной доли
+(1 / число блюд категории), и маржинально, если маржа с порции не ниже
+средневзвешенной по категории.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import BigIntegerField, Func, Max, Min
+from menu.models import MenuItem
+from orders.models import Order, OrderItem
+
+STAR = 'star'
+PLOWHORSE = 'plowhorse'
+PUZZLE = 'puzzle'
+DOG = 'dog'
+
+CLASS_LABELS = {
+    STAR: 'Звезда',
+    PLOWHORSE: 'Рабочая лошадка',
+    PUZZLE: 'Загадка',
+    DOG: 'Собака',
+}
+
+# Порог популярности - доля от равной доли продаж в категории
+POPULARITY_FACTOR = 0.7
+# Для оценки эластичности нужно хотя бы столько недель продаж
+MIN_ELASTICITY_WEEKS = 4
+
+SECONDS_PER_WEEK = 7 * 24 * 60 * 60
+
+
+@dataclass
+class DishStats:
+    dish_id: int
+    name: str
+    category: str
+    quantity: int
+    orders: int
+    revenue: float
+    avg_price: float
+    unit_cost: float
+    unit_margin: float
+    menu_mix: float
+    menu_class: str
+    elasticity: float | None
+    companions: list = field(default_factory=list)
+
+    @property
+    def menu_class_label(self):
+        return CLASS_LABELS[self.menu_class]
+
+
+@dataclass
+class MenuEngineeringReport:
+    dishes: list
+    pairs: list
+    lines: int
+    orders: int
+    weeks: int
+
+
+class MenuEngineeringAccumulator:
+    """
+    Счетчики по блюдам, неделям и парам блюд
+
+    Args:
+        dish_ids: id всех блюд (индекс блюда в массивах - позиция в dish_ids)
+        weeks: число недель истории
+    """
+
+    def __init__(self, dish_ids, weeks):
+        self.dish_ids = np.asarray(sorted(dish_ids), dtype=np.int64)
+        self.size = len(self.dish_ids)
+        self.weeks = max(weeks, 1)
+
+        self.quantity = np.zeros(self.size)
+        self.revenue = np.zeros(self.size)
+        self.week_quantity = np.zeros(self.size * self.weeks)
+        self.week_revenue = np.zeros(self.size * self.weeks)
+        # Пары (first <= second) ключом first * size + second; first == second - заказы с блюдом
+        self.pair_keys = np.zeros(0, dtype=np.int64)
+        self.pair_counts = np.zeros(0, dtype=np.int64)
+
+        self.lines = 0
+        self.orders = 0
+
+    def dish_index(self, dish_ids):
+        return np.searchsorted(self.dish_ids, dish_ids)
+
+    def add(self, order_starts, dish_ids, quantity, price, week):
+        """
+        Добавляет порцию строк, содержащую только целые заказы
+
+        Args:
+            order_starts: bool-массив, True в первой строке каждого заказа
+            dish_ids, quantity, price, week: массивы по строкам
+        """
+        if not len(dish_ids):
+            return
+
+        dish = self.dish_index(dish_ids)
+        revenue = quantity * price
+        size = self.size
+
+        self.quantity += np.bincount(dish, weights=quantity, minlength=size)
+        self.revenue += np.bincount(dish, weights=revenue, minlength=size)
+
+        week_key = dish * self.weeks + np.clip(week, 0, self.weeks - 1)
+        self.week_quantity += np.bincount(week_key, weights=quantity, minlength=size * self.weeks)
+        self.week_revenue += np.bincount(week_key, weights=revenue, minlength=size * self.weeks)
+
+        order_codes = np.cumsum(order_starts) - 1
+        self._add_pairs(order_codes, dish)
+
+        self.lines += len(dish_ids)
+        self.orders += int(order_codes[-1]) + 1
+
+    def _add_pairs(self, order_codes, dish):
+        """Считает пары блюд внутри заказов порции, включая пару блюда с самим собой"""
+        # Уникальные (заказ, блюдо), отсортированные по заказу, затем по блюду
+        baskets = np.unique(order_codes * self.size + dish)
+        orders, dish = np.divmod(baskets, self.size)
+
+        # Каждая строка в паре с собой и со всеми следующими строками своего заказа
+        rows = np.arange(len(baskets))
+        partners = np.searchsorted(orders, orders, side='right') - rows
+        first = np.repeat(rows, partners)
+        offsets = np.arange(len(first)) - np.repeat(np.cumsum(partners) - partners, partners)
+        keys, counts = np.unique(dish[first] * self.size + dish[first + offsets], return_counts=True)
+
+        keys = np.concatenate([self.pair_keys, keys])
+        counts = np.concatenate([self.pair_counts, counts])
+        self.pair_keys, inverse = np.unique(keys, return_inverse=True)
+        self.pair_counts = np.bincount(inverse, weights=counts).astype(np.int64)
+
+    def pairs(self):
+        """
+        Пары блюд и число заказов с ними
+
+        Returns:
+            (first, second, orders) - индексы блюд (first <= second) и счетчики
+        """
+        first, second = np.divmod(self.pair_keys, self.size)
+        return first, second, self.pair_counts
+
+    def pair_matrix(self):
+        """Симметричная матрица size x size числа заказов с парой; диагональ - заказы с блюдом"""
+        first, second, orders = self.pairs()
+        matrix = np.zeros((self.size, self.size), dtype=np.int64)
+        matrix[first, second] = orders
+        matrix[second, first] = orders
+        return matrix
+
+    def elasticity(self):
+        """
+        Эластичность спроса по цене для каждого блюда
+
+        Наклон регрессии ln(продаж за неделю) на ln(средней цены за
+        неделю); nan, если цена не менялась или недель слишком мало.
+        """
+        quantity = self.week_quantity.reshape(self.size, self.weeks)
+        revenue = self.week_revenue.reshape(self.size, self.weeks)
+        sold = quantity > 0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = np.where(sold, np.log(np.where(sold, revenue / np.where(sold, quantity, 1), 1)), 0)
+            y = np.where(sold, np.log(np.where(sold, quantity, 1)), 0)
+
+            n = sold.sum(axis=1)
+            sum_x = x.sum(axis=1)
+            sum_y = y.sum(axis=1)
+            sxx = (x * x).sum(axis=1) - sum_x * sum_x / np.maximum(n, 1)
+            sxy = (x * y).sum(axis=1) - sum_x * sum_y / np.maximum(n, 1)
+            slope = sxy / sxx
+
+        valid = (n >= MIN_ELASTICITY_WEEKS) & (sxx > 1e-9)
+        return np.where(valid, slope, np.nan)
+
+    def pair_stats(self, min_orders=5):
+        """
+        Поддержка, достоверность и lift для пар блюд
+
+        Returns:
+            (support, confidence, lift) - матрицы size x size;
+            confidence[i, j] = P(j в заказе | i в заказе)
+        """
+        together = self.pair_matrix().astype(float)
+        with_dish = np.diag(together).copy()
+        total = max(self.orders, 1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            support = together / total
+            confidence = together / with_dish[:, None]
+            lift = together * total / np.outer(with_dish, with_dish)
+
+        mask = (together >= min_orders) & ~np.eye(self.size, dtype=bool)
+        confidence = np.where(mask, confidence, 0)
+        lift = np.where(mask, lift, 0)
+        return support, confidence, lift
+
+
+def _iter_chunks(queryset, chunk_size):
+    """
+    Строки запроса порциями (списками кортежей) без создания объектов модели
+
+    chunked_cursor() - серверный курсор на PostgreSQL, так что в памяти
+    процесса не больше одной порции.
+    """
+    sql, params = queryset.query.sql_with_params()
+    connection = connections[router.db_for_read(queryset.model)]
+
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+
+
+class EpochSeconds(Func):
+    """Момент времени как целое число секунд Unix-времени"""
+    template = 'CAST(EXTRACT(EPOCH FROM %(expressions)s) AS BIGINT)'
+    output_field = BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # %% экранирует процент и в шаблоне, и при подстановке параметров
+        return self.as_sql(
+            compiler, connection,
+            template="CAST(strftime('%%%%s', %(expressions)s) AS INTEGER)",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='UNIX_TIMESTAMP(%(expressions)s)', **extra_context)
+
+
+def confirmed_order_lines():
+    """Строки подтвержденных заказов в формате load_order_lines, упорядоченные по заказу"""
+    return (
+        OrderItem.objects
+        .filter(order__is_confirmed=True)
+        .annotate(created=EpochSeconds('order__created_at'))
+        .order_by('order_id')
+        .values_list('order_id', 'dish_id', 'quantity', 'price_at_order', 'created')
+    )
+
+
+def _to_arrays(rows):
+    order_ids, dish_ids, quantity, price, created_at = zip(*rows)
+    return [
+        np.array(order_ids),
+        np.fromiter(dish_ids, dtype=np.int64, count=len(rows)),
+        np.fromiter(quantity, dtype=np.float64, count=len(rows)),
+        np.array(price, dtype=np.float64),
+        np.fromiter(created_at, dtype=np.int64, count=len(rows)).astype('datetime64[s]'),
+    ]
+
+
+def load_order_lines(accumulator, queryset, start, chunk_size):
+    """
+    Читает строки (order_id, dish_id, quantity, price_at_order, created_at)
+    порциями и передает накопителю только целые заказы
+    """
+    carry = None
+
+    for rows in _iter_chunks(queryset, chunk_size):
+        columns = _to_arrays(rows)
+        if carry is not None:
+            columns = [np.concatenate([tail, column]) for tail, column in zip(carry, columns)]
+
+        # Последний заказ порции может продолжиться в следующей
+        order_ids = columns[0]
+        others = np.flatnonzero(order_ids != order_ids[-1])
+        last = others[-1] + 1 if len(others) else 0
+        carry = [column[last:] for column in columns]
+        if last:
+            _add_columns(accumulator, [column[:last] for column in columns], start)
+
+    if carry is not None:
+        _add_columns(accumulator, carry, start)
+
+
+def _add_columns(accumulator, columns, start):
+    order_ids, dish_ids, quantity, price, created_at = columns
+
+    order_starts = np.ones(len(order_ids), dtype=bool)
+    order_starts[1:] = order_ids[1:] != order_ids[:-1]
+    week = ((created_at - start) // np.timedelta64(SECONDS_PER_WEEK, 's')).astype(np.int64)
+
+    accumulator.add(order_starts, dish_ids, quantity, price, week)
+
+
+def classify(quantity, margin, categories):
+    """
+    Классы menu engineering внутри каждой категории
+
+    Args:
+        quantity: продано порций по блюдам
+        margin: маржа с порции по блюдам
+        categories: код категории по блюдам
+
+    Returns:
+        (доля блюда в продажах категории, массив классов)
+    """
+    classes = np.empty(len(quantity), dtype=object)
+    mix = np.zeros(len(quantity))
+
+    for category in np.unique(categories):
+        members = categories == category
+        sold = quantity[members].sum()
+        count = members.sum()
+
+        share = quantity[members] / sold if sold else np.zeros(count)
+        popular = share >= POPULARITY_FACTOR / count
+        average_margin = (margin[members] * quantity[members]).sum() / sold if sold else 0
+        profitable = margin[members] >= average_margin
+
+        mix[members] = share
+        classes[members] = np.select(
+            [popular & profitable, popular, profitable],
+            [STAR, PLOWHORSE, PUZZLE],
+            default=DOG,
+        )
+
+    return mix, classes
+
+
+def build_report(chunk_size=None, companions=3, pairs=20, min_pair_orders=5):
+    """
+    Отчет menu engineering по всей истории подтвержденных заказов
+
+    Args:
+        chunk_size: строк в одной порции (по умолчанию MENU_ENGINEERING_CHUNK_SIZE)
+        companions: сколько блюд-компаньонов показывать для каждого блюда
+        pairs: сколько пар с наибольшим lift вернуть
+        min_pair_orders: пары, встречавшиеся реже, не учитываются
+    """
+    chunk_size = chunk_size or getattr(settings, 'MENU_ENGINEERING_CHUNK_SIZE', 50000)
+    food_cost_ratio = getattr(settings, 'MENU_DEFAULT_FOOD_COST_RATIO', 0.35)
+
+    menu = list(
+        MenuItem.objects
+        .values_list('id', 'name', 'price', 'cost_price', 'category_id', 'category__name')
+        .order_by('id')
+    )
+    if not menu:
+        return MenuEngineeringReport(dishes=[], pairs=[], lines=0, orders=0, weeks=0)
+
+    confirmed = Order.objects.filter(is_confirmed=True)
+    period = confirmed.aggregate(first=Min('created_at'), last=Max('created_at'))
+    if period['first'] is None:
+        weeks = 1
+        start = np.datetime64('1970-01-01T00:00:00', 's')
+    else:
+        weeks = (period['last'] - period['first']).days // 7 + 1
+        start = np.datetime64(period['first'].replace(tzinfo=None), 's')
+
+    accumulator = MenuEngineeringAccumulator([row[0] for row in menu], weeks)
+    load_order_lines(accumulator, confirmed_order_lines(), start, chunk_size)
+
+    _, names, prices, costs, category_ids, category_names = zip(*menu)
+    prices = np.array(prices, dtype=float)
+    unit_cost = np.array(
+        [float(cost) if cost is not None else float(price) * food_cost_ratio for cost, price in zip(costs, prices)]
+    )
+
+    quantity = accumulator.quantity
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_price = np.where(quantity > 0, accumulator.revenue / quantity, prices)
+    margin = avg_price - unit_cost
+    mix, classes = classify(quantity, margin, np.array(category_ids))
+    elasticity = accumulator.elasticity()
+    support, confidence, lift = accumulator.pair_stats(min_pair_orders)
+    together = accumulator.pair_matrix()
+    with_dish = np.diag(together)
+
+    dishes = []
+    for index in range(accumulator.size):
+        top = [j for j in np.argsort(-confidence[index])[:companions] if confidence[index, j] > 0]
+        dishes.append(DishStats(
+            dish_id=int(accumulator.dish_ids[index]),
+            name=names[index],
+            category=category_names[index],
+            quantity=int(quantity[index]),
+            orders=int(with_dish[index]),
+            revenue=round(float(accumulator.revenue[index]), 2),
+            avg_price=round(float(avg_price[index]), 2),
+            unit_cost=round(float(unit_cost[index]), 2),
+            unit_margin=round(float(margin[index]), 2),
+            menu_mix=round(float(mix[index]), 4),
+            menu_class=classes[index],
+            elasticity=None if np.isnan(elasticity[index]) else round(float(elasticity[index]), 2),
+            companions=[(names[j], round(float(confidence[index, j]), 3)) for j in top],
+        ))
+
+    # Каждая пара один раз: верхний треугольник матрицы
+    upper = np.triu(lift, k=1)
+    best = np.argsort(-upper, axis=None)[:pairs]
+    top_pairs = [
+        {
+            'first': names[i],
+            'second': names[j],
+            'orders': int(together[i, j]),
+            'support': round(float(support[i, j]), 4),
+            'lift': round(float(upper[i, j]), 2),
+        }
+        for i, j in zip(*np.unravel_index(best, upper.shape))
+        if upper[i, j] > 0
+    ]
+
+    return MenuEngineeringReport(
+        dishes=sorted(dishes, key=lambda dish: (dish.category, -dish.quantity)),
+        pairs=top_pairs,
+        lines=accumulator.lines,
+        orders=accumulator.orders,
+        weeks=weeks,
+    )
@@ -0,0 +1,83 @@
+# Generated by Django 6.0 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('menu', '0011_menuitem_is_delivery_alter_menuitem_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('orders_count', models.IntegerField(default=0, verbose_name='Заказов')),
+                ('items_count', models.IntegerField(default=0, verbose_name='Порций')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Скидки')),
+                ('delivery', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Доставка')),
+            ],
+            options={
+                'verbose_name': 'Продажи за день',
+                'verbose_name_plural': 'Продажи по дням',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyPaymentSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('payment_method', models.CharField(choices=[('cash', 'Наличные'), ('card', 'Банковская карта')], max_length=20, verbose_name='Способ оплаты')),
+                ('orders_count', models.IntegerField(default=0, verbose_name='Заказов')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+            ],
+            options={
+                'verbose_name': 'Продажи по способу оплаты за день',
+                'verbose_name_plural': 'Продажи по способам оплаты',
+                'ordering': ['-date', 'payment_method'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'payment_method'), name='analytics_paymentsales_date_method_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCategorySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('category_name', models.CharField(blank=True, max_length=100, verbose_name='Категория')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Порций')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_sales', to='menu.category', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Продажи категории за день',
+                'verbose_name_plural': 'Продажи категорий по дням',
+                'ordering': ['-date', '-revenue'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'category'), name='analytics_categorysales_date_category_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyDishSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('dish_name', models.CharField(blank=True, max_length=200, verbose_name='Название блюда')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Порций')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('dish', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_sales', to='menu.menuitem', verbose_name='Блюдо')),
+            ],
+            options={
+                'verbose_name': 'Продажи блюда за день',
+                'verbose_name_plural': 'Продажи блюд по дням',
+                'ordering': ['-date', '-revenue'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'dish'), name='analytics_dishsales_date_dish_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DishPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_id', models.PositiveIntegerField(verbose_name='Блюдо')),
+                ('second_id', models.PositiveIntegerField(verbose_name='Блюдо')),
+                ('orders_count', models.IntegerField(default=0, verbose_name='Заказов')),
+            ],
+            options={
+                'verbose_name': 'Пара блюд',
+                'verbose_name_plural': 'Пары блюд',
+                'constraints': [models.UniqueConstraint(fields=('first_id', 'second_id'), name='analytics_dishpair_uniq')],
+            },
+        ),
+    ]
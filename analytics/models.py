@@ -0,0 +1,119 @@
+from django.db import models
+from orders.models import Order
+
+
+class DailySales(models.Model):
+    """Итоги подтвержденных заказов за день"""
+
+    date = models.DateField('Дата', unique=True)
+    orders_count = models.IntegerField('Заказов', default=0)
+    items_count = models.IntegerField('Порций', default=0)
+    revenue = models.DecimalField('Выручка', max_digits=14, decimal_places=2, default=0)
+    discount = models.DecimalField('Скидки', max_digits=14, decimal_places=2, default=0)
+    delivery = models.DecimalField('Доставка', max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Продажи за день'
+        verbose_name_plural = 'Продажи по дням'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}: {self.revenue}"
+
+
+class DailyDishSales(models.Model):
+    """Продажи блюда за день (сумма позиций без скидки и доставки)"""
+
+    date = models.DateField('Дата')
+    dish = models.ForeignKey(
+        'menu.MenuItem',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='daily_sales',
+        verbose_name='Блюдо'
+    )
+    dish_name = models.CharField('Название блюда', max_length=200, blank=True)
+    quantity = models.IntegerField('Порций', default=0)
+    revenue = models.DecimalField('Выручка', max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Продажи блюда за день'
+        verbose_name_plural = 'Продажи блюд по дням'
+        ordering = ['-date', '-revenue']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'dish'], name='analytics_dishsales_date_dish_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.dish_name}: {self.quantity}"
+
+
+class DailyCategorySales(models.Model):
+    """Продажи категории меню за день"""
+
+    date = models.DateField('Дата')
+    category = models.ForeignKey(
+        'menu.Category',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='daily_sales',
+        verbose_name='Категория'
+    )
+    category_name = models.CharField('Категория', max_length=100, blank=True)
+    quantity = models.IntegerField('Порций', default=0)
+    revenue = models.DecimalField('Выручка', max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Продажи категории за день'
+        verbose_name_plural = 'Продажи категорий по дням'
+        ordering = ['-date', '-revenue']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category'], name='analytics_categorysales_date_category_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.category_name}: {self.revenue}"
+
+
+class DailyPaymentSales(models.Model):
+    """Выручка по способу оплаты за день"""
+
+    date = models.DateField('Дата')
+    payment_method = models.CharField('Способ оплаты', max_length=20, choices=Order.PAYMENT_CHOICES)
+    orders_count = models.IntegerField('Заказов', default=0)
+    revenue = models.DecimalField('Выручка', max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Продажи по способу оплаты за день'
+        verbose_name_plural = 'Продажи по способам оплаты'
+        ordering = ['-date', 'payment_method']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'payment_method'], name='analytics_paymentsales_date_method_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.get_payment_method_display()}: {self.revenue}"
+
+
+class DishPair(models.Model):
+    """
+    Сколько подтвержденных заказов содержат оба блюда
+
+    Пара хранится один раз (first_id <= second_id); строка с first_id ==
+    second_id - число заказов с этим блюдом. По этой таблице строится
+    индекс рекомендаций (analytics/recommendations.py).
+    """
+
+    first_id = models.PositiveIntegerField('Блюдо')
+    second_id = models.PositiveIntegerField('Блюдо')
+    orders_count = models.IntegerField('Заказов', default=0)
+
+    class Meta:
+        verbose_name = 'Пара блюд'
+        verbose_name_plural = 'Пары блюд'
+        constraints = [
+            models.UniqueConstraint(fields=['first_id', 'second_id'], name='analytics_dishpair_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.first_id} + {self.second_id}: {self.orders_count}"
@@ -0,0 +1,282 @@
+"""
+Рекомендации «с этим часто заказывают».
+
+Источник - таблица DishPair: сколько подтвержденных заказов содержат
+каждую пару блюд. Полностью она пересчитывается командой
+build_recommendations (по всей истории, через NumPy), а затем меняется
+инкрементально: подтверждение заказа ставит задачу очереди, которая
+прибавляет пары заказа и публикует новый индекс, а снятие подтверждения
+и удаление подтвержденного заказа - задачу, которая их вычитает. Правка
+позиций подтвержденного заказа вычитает пары прежнего состава и
+прибавляет пары нового.
+
+Индекс - разреженная структура в стиле CSR: для каждого блюда срез
+общих массивов с id соседей и их оценками (косинусная мера
+together / sqrt(n_a * n_b)), не больше RECOMMENDATIONS_NEIGHBOURS
+соседей на блюдо. Индекс версионируется так же, как снимок меню:
+общий кэш + копия в памяти процесса, поэтому подбор рекомендаций в
+запросе не обращается к базе. Стоп-лист и доставка проверяются по
+текущему снимку меню.
+"""
+import math
+import threading
+from array import array
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from menu.models import MenuItem
+from menu.snapshot import get_menu_snapshot
+from notifications.jobs import enqueue, job, make_job
+from orders.models import OrderItem
+from web_restaurant.cache_versions import bump_version, get_version
+from .menu_engineering import MenuEngineeringAccumulator, confirmed_order_lines, load_order_lines
+from .models import DishPair
+from .rollups import increment
+
+RECOMMENDATIONS_VERSION_KEY = 'analytics:recommendations:version'
+RECOMMENDATIONS_INDEX_KEY = 'analytics:recommendations:{version}'
+
+# Копия индекса в памяти процесса: (версия, индекс)
+_local_index = None
+_build_lock = threading.Lock()
+
+
+class RecommendationIndex:
+    """
+    Соседи блюд по совместным заказам
+
+    Args:
+        neighbours: {id блюда: [(id соседа, оценка), ...]} по убыванию оценки
+    """
+
+    def __init__(self, neighbours, version=0):
+        self.version = version
+        self.offsets = {}
+        self.dish_ids = array('l')
+        self.scores = array('f')
+
+        for dish_id, items in neighbours.items():
+            self.offsets[dish_id] = (len(self.dish_ids), len(items))
+            self.dish_ids.extend(other for other, _ in items)
+            self.scores.extend(score for _, score in items)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def neighbours(self, dish_id):
+        start, count = self.offsets.get(dish_id, (0, 0))
+        return zip(self.dish_ids[start:start + count], self.scores[start:start + count])
+
+
+def build_index(version=0):
+    """Собирает индекс из DishPair одним запросом"""
+    limit = getattr(settings, 'RECOMMENDATIONS_NEIGHBOURS', 20)
+    min_orders = getattr(settings, 'RECOMMENDATIONS_MIN_ORDERS', 3)
+
+    rows = list(DishPair.objects.filter(orders_count__gt=0).values_list('first_id', 'second_id', 'orders_count'))
+    orders_with = {first: count for first, second, count in rows if first == second}
+
+    neighbours = defaultdict(list)
+    for first, second, count in rows:
+        if first == second or count < min_orders:
+            continue
+        score = count / math.sqrt(orders_with.get(first, count) * orders_with.get(second, count))
+        neighbours[first].append((second, score))
+        neighbours[second].append((first, score))
+
+    return RecommendationIndex(
+        {
+            dish_id: sorted(items, key=lambda item: item[1], reverse=True)[:limit]
+            for dish_id, items in neighbours.items()
+        },
+        version=version,
+    )
+
+
+def publish_index():
+    """Пересобирает индекс и делает его текущим для всех процессов"""
+    index = build_index()
+    index.version = bump_version(RECOMMENDATIONS_VERSION_KEY)
+    cache.set(
+        RECOMMENDATIONS_INDEX_KEY.format(version=index.version),
+        index,
+        getattr(settings, 'RECOMMENDATIONS_TIMEOUT', 60 * 60 * 24),
+    )
+    return index
+
+
+def get_recommendation_index():
+    """
+    Текущий индекс рекомендаций
+
+    Порядок поиска: память процесса → общий кэш → сборка из базы.
+    """
+    global _local_index
+
+    version = get_version(RECOMMENDATIONS_VERSION_KEY)
+    local = _local_index
+    if local is not None and local[0] == version:
+        return local[1]
+
+    with _build_lock:
+        local = _local_index
+        if local is not None and local[0] == version:
+            return local[1]
+
+        key = RECOMMENDATIONS_INDEX_KEY.format(version=version)
+        index = cache.get(key)
+        if index is None:
+            index = build_index(version)
+            cache.set(key, index, getattr(settings, 'RECOMMENDATIONS_TIMEOUT', 60 * 60 * 24))
+
+        _local_index = (version, index)
+        return index
+
+
+def suggest_dishes(dish_ids, limit=None):
+    """
+    Блюда, которые чаще всего заказывают вместе с dish_ids
+
+    Оценки соседей всех блюд складываются; блюда из dish_ids, стоп-лист
+    и блюда без доставки пропускаются. Возвращает DishSnapshot из
+    текущего снимка меню.
+    """
+    limit = limit or getattr(settings, 'RECOMMENDATIONS_LIMIT', 4)
+    exclude = set(dish_ids)
+    index = get_recommendation_index()
+
+    scores = defaultdict(float)
+    for dish_id in exclude:
+        for other, score in index.neighbours(dish_id):
+            if other not in exclude:
+                scores[other] += score
+
+    snapshot = get_menu_snapshot()
+    suggestions = []
+    for dish_id in sorted(scores, key=scores.__getitem__, reverse=True):
+        dish = snapshot.get_dish(dish_id)
+        if dish is not None and dish.is_available:
+            suggestions.append(dish)
+            if len(suggestions) >= limit:
+                break
+    return suggestions
+
+
+def basket_pairs(dish_ids):
+    """Пары (first <= second) блюд одного заказа, включая пары блюда с самим собой"""
+    dish_ids = sorted(set(dish_ids))
+    return [
+        (first, second)
+        for position, first in enumerate(dish_ids)
+        for second in dish_ids[position:]
+    ]
+
+
+@job('analytics.dish_pairs', batch=True)
+def record_confirmed_baskets(payloads):
+    """
+    Задача очереди: пары блюд из dish_ids прибавляются к DishPair
+    (sign=-1 - вычитаются), затем публикуется новый индекс (один раз на
+    пачку)
+    """
+    # Задачи, поставленные до того, как состав заказа сохранялся в задаче
+    legacy = [payload['order_id'] for payload in payloads if 'dish_ids' not in payload]
+    baskets = defaultdict(list)
+    for order_id, dish_id in OrderItem.objects.filter(order_id__in=legacy).values_list('order_id', 'dish_id'):
+        baskets[str(order_id)].append(dish_id)
+
+    pairs = Counter()
+    for payload in payloads:
+        dish_ids = payload['dish_ids'] if 'dish_ids' in payload else baskets[payload['order_id']]
+        if payload.get('sign', 1) > 0:
+            pairs.update(basket_pairs(dish_ids))
+        else:
+            pairs.subtract(basket_pairs(dish_ids))
+
+    with transaction.atomic():
+        for (first, second), count in pairs.items():
+            if count:
+                increment(DishPair, {'first_id': first, 'second_id': second}, orders_count=count)
+
+    publish_index()
+
+
+def order_dish_ids(order_id):
+    """Блюда позиций заказа"""
+    return list(OrderItem.objects.filter(order_id=order_id).values_list('dish_id', flat=True))
+
+
+def enqueue_basket(order, sign=1):
+    """
+    Ставит задачу record_confirmed_baskets для заказа
+
+    Состав заказа сохраняется в задаче, поэтому вычитание снимает ровно
+    те пары, что были прибавлены (к запуску задачи позиции могут уже
+    измениться или быть удалены). Ключ включает направление и время
+    сохранения заказа: повторное подтверждение после снятия ставит новую
+    задачу.
+    """
+    enqueue(make_job(
+        record_confirmed_baskets.job_name,
+        f'order:{order.id}:pairs:{sign:+d}:{order.updated_at.isoformat()}',
+        order_id=str(order.id),
+        sign=sign,
+        dish_ids=order_dish_ids(order.id),
+    ))
+
+
+def enqueue_basket_change(order_id, previous_dish_ids, dish_ids):
+    """
+    Изменился состав подтвержденного заказа: пары прежнего состава
+    вычитаются, нового - прибавляются (если набор блюд изменился)
+    """
+    if set(previous_dish_ids) == set(dish_ids):
+        return
+
+    name = record_confirmed_baskets.job_name
+    changed_at = timezone.now().isoformat()
+    enqueue(
+        make_job(
+            name, f'order:{order_id}:pairs:-1:lines:{changed_at}',
+            order_id=str(order_id), sign=-1, dish_ids=previous_dish_ids,
+        ),
+        make_job(
+            name, f'order:{order_id}:pairs:+1:lines:{changed_at}',
+            order_id=str(order_id), sign=1, dish_ids=dish_ids,
+        ),
+    )
+
+
+def rebuild_pairs(chunk_size=None):
+    """
+    Пересчитывает DishPair по всей истории подтвержденных заказов
+
+    Returns:
+        число сохраненных пар
+    """
+    chunk_size = chunk_size or getattr(settings, 'MENU_ENGINEERING_CHUNK_SIZE', 50000)
+    dish_ids = list(MenuItem.objects.values_list('id', flat=True))
+    accumulator = MenuEngineeringAccumulator(dish_ids, weeks=1)
+    if accumulator.size:
+        # Недели для пар не нужны: все строки попадают в одну
+        load_order_lines(accumulator, confirmed_order_lines(), np.datetime64('1970-01-01', 's'), chunk_size)
+
+    pairs = [
+        DishPair(
+            first_id=int(accumulator.dish_ids[first]),
+            second_id=int(accumulator.dish_ids[second]),
+            orders_count=int(orders),
+        )
+        for first, second, orders in zip(*accumulator.pairs())
+    ]
+
+    with transaction.atomic():
+        DishPair.objects.all().delete()
+        DishPair.objects.bulk_create(pairs, batch_size=1000)
+
+    publish_index()
+    return len(pairs)
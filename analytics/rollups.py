@@ -0,0 +1,301 @@
+"""
+Дневные сводки продаж.
+
+Подтвержденный заказ (переход is_confirmed False -> True, его видит
+FieldTracker) один раз добавляется в сводки за день заказа: итоги дня,
+блюда, категории и способы оплаты. Отчеты за любой период читают только
+сводки - несколько сотен строк вместо GROUP BY по всем позициям заказов.
+
+Снятие подтверждения и удаление подтвержденного заказа вычитают его
+обратно. Правка сумм и способа оплаты подтвержденного заказа, а также его
+позиций (админка) переносит разницу: прежние значения из FieldTracker
+вычитаются, новые добавляются. Сводки за период пересобирает
+rebuild_rollups() (команда backfill_sales), например после массовых
+правок заказов через update().
+"""
+import copy
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from menu.models import MenuItem
+from orders.models import Order, OrderItem
+from orders.stats import order_date
+from .models import DailyCategorySales, DailyDishSales, DailyPaymentSales, DailySales
+
+ZERO = Decimal('0')
+
+# Поля заказа и позиции, которые попадают в сводки (delivery_method
+# меняет delivery_cost и final_cost)
+ORDER_FIELDS = ('final_cost', 'discount', 'delivery_cost', 'payment_method')
+ITEM_FIELDS = ('dish', 'quantity', 'line_total')
+
+
+def increment(model, keys, defaults=None, **deltas):
+    """
+    Атомарно прибавляет deltas к строке сводки с ключом keys
+
+    Args:
+        defaults: поля, которые записываются только при создании строки
+    """
+    changes = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**keys).update(**changes):
+        return
+
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **(defaults or {}), **deltas)
+    except IntegrityError:
+        # Строку одновременно создал другой запрос
+        model.objects.filter(**keys).update(**changes)
+
+
+def order_lines(order):
+    """Позиции заказа, сгруппированные по блюду, с категорией блюда"""
+    return list(
+        OrderItem.objects
+        .filter(order=order)
+        .values('dish_id', 'dish_name', 'dish__category_id', 'dish__category__name')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('line_total'))
+        .order_by()
+    )
+
+
+def _apply_totals(order, date, sign, items_count):
+    """Итоги дня и способ оплаты заказа (sign=-1 - вычитает)"""
+    increment(
+        DailySales, {'date': date},
+        orders_count=sign,
+        items_count=items_count,
+        revenue=sign * (order.final_cost or ZERO),
+        discount=sign * (order.discount or ZERO),
+        delivery=sign * (order.delivery_cost or ZERO),
+    )
+    increment(
+        DailyPaymentSales, {'date': date, 'payment_method': order.payment_method},
+        orders_count=sign,
+        revenue=sign * (order.final_cost or ZERO),
+    )
+
+
+def _apply_lines(date, lines, sign):
+    """Позиции (строки order_lines) в сводки по блюдам и категориям"""
+    categories = defaultdict(lambda: {'name': '', 'quantity': 0, 'revenue': ZERO})
+    for line in lines:
+        category = categories[line['dish__category_id']]
+        category['name'] = line['dish__category__name'] or ''
+        category['quantity'] += line['quantity']
+        category['revenue'] += line['revenue'] or ZERO
+
+    for line in lines:
+        increment(
+            DailyDishSales, {'date': date, 'dish_id': line['dish_id']},
+            defaults={'dish_name': line['dish_name']},
+            quantity=sign * line['quantity'],
+            revenue=sign * (line['revenue'] or ZERO),
+        )
+    for category_id, category in categories.items():
+        increment(
+            DailyCategorySales, {'date': date, 'category_id': category_id},
+            defaults={'category_name': category['name']},
+            quantity=sign * category['quantity'],
+            revenue=sign * category['revenue'],
+        )
+
+
+def apply_order(order, sign=1):
+    """Добавляет заказ в сводки (sign=-1 - вычитает)"""
+    date = order_date(order.created_at)
+    lines = order_lines(order)
+
+    _apply_totals(order, date, sign, sign * sum(line['quantity'] for line in lines))
+    _apply_lines(date, lines, sign)
+
+
+def previous_order(order):
+    """Копия заказа со значениями ORDER_FIELDS до текущего сохранения"""
+    previous = copy.copy(order)
+    for field in ORDER_FIELDS:
+        if order.tracker.has_changed(field):
+            setattr(previous, field, order.tracker.previous(field))
+    return previous
+
+
+def apply_order_change(order):
+    """
+    У подтвержденного заказа изменились суммы или способ оплаты:
+    вычитает прежние значения и добавляет новые (позиции не меняются)
+    """
+    if not any(order.tracker.has_changed(field) for field in ORDER_FIELDS):
+        return
+
+    date = order_date(order.created_at)
+    _apply_totals(previous_order(order), date, -1, 0)
+    _apply_totals(order, date, 1, 0)
+
+
+def apply_item(item, sign=1):
+    """Добавляет позицию подтвержденного заказа в сводки (sign=-1 - вычитает)"""
+    dish = MenuItem.objects.values('category_id', 'category__name').get(pk=item.dish_id)
+    line = {
+        'dish_id': item.dish_id,
+        'dish_name': item.dish_name,
+        'dish__category_id': dish['category_id'],
+        'dish__category__name': dish['category__name'],
+        'quantity': item.quantity,
+        'revenue': item.line_total,
+    }
+    date = order_date(item.order.created_at)
+
+    increment(DailySales, {'date': date}, items_count=sign * item.quantity)
+    _apply_lines(date, [line], sign)
+
+
+def apply_item_change(item):
+    """Позицию подтвержденного заказа изменили: прежние значения вычитаются"""
+    tracker = item.tracker
+    if not any(tracker.has_changed(field) for field in ITEM_FIELDS):
+        return
+
+    previous = copy.copy(item)
+    for field in ITEM_FIELDS:
+        if tracker.has_changed(field):
+            setattr(previous, f'{field}_id' if field == 'dish' else field, tracker.previous(field))
+    apply_item(previous, sign=-1)
+    apply_item(item)
+
+
+def rebuild_rollups(start=None, end=None):
+    """
+    Пересчитывает сводки за период [start, end] по подтвержденным заказам
+
+    Returns:
+        число дней, за которые есть продажи
+    """
+    orders = Order.objects.filter(is_confirmed=True)
+    items = OrderItem.objects.filter(order__is_confirmed=True)
+    rollups = [DailySales, DailyDishSales, DailyCategorySales, DailyPaymentSales]
+    rollup_range = {}
+
+    if start is not None:
+        orders = orders.filter(created_at__date__gte=start)
+        items = items.filter(order__created_at__date__gte=start)
+        rollup_range['date__gte'] = start
+    if end is not None:
+        orders = orders.filter(created_at__date__lte=end)
+        items = items.filter(order__created_at__date__lte=end)
+        rollup_range['date__lte'] = end
+
+    orders = orders.annotate(date=TruncDate('created_at')).order_by()
+    items = items.annotate(date=TruncDate('order__created_at')).order_by()
+
+    items_per_day = dict(items.values_list('date').annotate(Sum('quantity')))
+    days = [
+        DailySales(
+            date=row['date'],
+            orders_count=row['orders_count'],
+            items_count=items_per_day.get(row['date']) or 0,
+            revenue=row['revenue'] or ZERO,
+            discount=row['discount_sum'] or ZERO,
+            delivery=row['delivery_sum'] or ZERO,
+        )
+        for row in orders.values('date').annotate(
+            orders_count=Count('id'),
+            revenue=Sum('final_cost'),
+            discount_sum=Sum('discount'),
+            delivery_sum=Sum('delivery_cost'),
+        )
+    ]
+    payments = [
+        DailyPaymentSales(**row)
+        for row in orders.values('date', 'payment_method').annotate(
+            orders_count=Count('id'),
+            revenue=Sum('final_cost'),
+        )
+    ]
+    dishes = [
+        DailyDishSales(
+            date=row['date'],
+            dish_id=row['dish_id'],
+            dish_name=row['name'] or '',
+            quantity=row['quantity'],
+            revenue=row['revenue'] or ZERO,
+        )
+        for row in items.values('date', 'dish_id').annotate(
+            name=Max('dish_name'),
+            quantity=Sum('quantity'),
+            revenue=Sum('line_total'),
+        )
+    ]
+    categories = [
+        DailyCategorySales(
+            date=row['date'],
+            category_id=row['dish__category_id'],
+            category_name=row['name'] or '',
+            quantity=row['quantity'],
+            revenue=row['revenue'] or ZERO,
+        )
+        for row in items.values('date', 'dish__category_id').annotate(
+            name=Max('dish__category__name'),
+            quantity=Sum('quantity'),
+            revenue=Sum('line_total'),
+        )
+    ]
+
+    with transaction.atomic():
+        for model in rollups:
+            model.objects.filter(**rollup_range).delete()
+        DailySales.objects.bulk_create(days, batch_size=500)
+        DailyPaymentSales.objects.bulk_create(payments, batch_size=500)
+        DailyDishSales.objects.bulk_create(dishes, batch_size=500)
+        DailyCategorySales.objects.bulk_create(categories, batch_size=500)
+
+    return len(days)
+
+
+def _ranked(queryset, key_field, name_field, limit=None):
+    """Строки сводки за период, сложенные по key_field, по убыванию выручки"""
+    rows = (
+        queryset
+        .values(key_field)
+        .annotate(name=Max(name_field), quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-revenue')
+    )
+    return list(rows[:limit] if limit else rows)
+
+
+def sales_report(start, end, limit=20):
+    """
+    Отчет о продажах за период [start, end] только по сводкам
+
+    Returns:
+        dict с итогами, рядом по дням и разбивками по блюдам,
+        категориям и способам оплаты
+    """
+    period = {'date__gte': start, 'date__lte': end}
+    days = list(
+        DailySales.objects.filter(**period)
+        .order_by('date')
+        .values('date', 'orders_count', 'items_count', 'revenue', 'discount', 'delivery')
+    )
+    totals = {
+        field: sum((day[field] for day in days), 0)
+        for field in ('orders_count', 'items_count', 'revenue', 'discount', 'delivery')
+    }
+
+    return {
+        'start': start,
+        'end': end,
+        'totals': totals,
+        'days': days,
+        'dishes': _ranked(DailyDishSales.objects.filter(**period), 'dish_id', 'dish_name', limit),
+        'categories': _ranked(DailyCategorySales.objects.filter(**period), 'category_id', 'category_name'),
+        'payment_methods': list(
+            DailyPaymentSales.objects.filter(**period)
+            .values('payment_method')
+            .annotate(orders_count=Sum('orders_count'), revenue=Sum('revenue'))
+            .order_by('-revenue')
+        ),
+    }
@@ -0,0 +1,84 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from orders.models import Order, OrderItem
+from .recommendations import enqueue_basket, enqueue_basket_change, order_dish_ids
+from .rollups import apply_item, apply_item_change, apply_order, apply_order_change, previous_order
+
+
+@receiver(post_save, sender=Order)
+def order_confirmation_changed(sender, instance, created, **kwargs):
+    """
+    Заказ попадает в сводки продаж в момент подтверждения по SMS,
+    правки подтвержденного заказа переносят разницу
+    """
+    if created:
+        if instance.is_confirmed:
+            apply_order(instance)
+            enqueue_basket(instance)
+        return
+
+    if not instance.tracker.has_changed('is_confirmed'):
+        if instance.is_confirmed:
+            apply_order_change(instance)
+        return
+
+    # Пары блюд для рекомендаций обновляет очередь задач
+    if instance.is_confirmed:
+        apply_order(instance)
+        enqueue_basket(instance)
+    else:
+        apply_order(previous_order(instance), sign=-1)
+        enqueue_basket(instance, sign=-1)
+
+
+@receiver(pre_delete, sender=Order)
+def confirmed_order_deleted(sender, instance, **kwargs):
+    """
+    Позиции удаляются каскадом до post_delete, поэтому вычитаем заранее
+    """
+    if instance.is_confirmed:
+        apply_order(instance, sign=-1)
+        enqueue_basket(instance, sign=-1)
+
+
+@receiver(post_save, sender=OrderItem)
+def confirmed_order_item_saved(sender, instance, created, **kwargs):
+    """Позицию подтвержденного заказа добавили или изменили (админка)"""
+    if not instance.order.is_confirmed:
+        return
+
+    if created:
+        apply_item(instance)
+    else:
+        apply_item_change(instance)
+        if not instance.tracker.has_changed('dish'):
+            # Количество и цена на пары блюд не влияют
+            return
+
+    # Пары блюд: прежний состав - без этой позиции или с прежним блюдом
+    dish_ids = order_dish_ids(instance.order_id)
+    previous_dish_ids = list(dish_ids)
+    previous_dish_ids.remove(instance.dish_id)
+    if not created:
+        previous_dish_ids.append(instance.tracker.previous('dish'))
+    enqueue_basket_change(instance.order_id, previous_dish_ids, dish_ids)
+
+
+@receiver(post_delete, sender=OrderItem)
+def confirmed_order_item_deleted(sender, instance, origin=None, **kwargs):
+    """
+    Позицию удалили из подтвержденного заказа
+
+    При удалении самого заказа позиции уже вычтены в confirmed_order_deleted.
+    """
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is Order:
+        return
+
+    order = Order.objects.filter(pk=instance.order_id).only('is_confirmed', 'created_at').first()
+    if order is not None and order.is_confirmed:
+        instance.order = order
+        apply_item(instance, sign=-1)
+        dish_ids = order_dish_ids(order.pk)
+        enqueue_basket_change(order.pk, dish_ids + [instance.dish_id], dish_ids)
@@ -0,0 +1,381 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from menu.models import Category, MenuItem
+from menu.snapshot import bump_menu_version
+from notifications.jobs import claim_jobs, run_jobs
+from notifications.models import Job
+from orders.models import Order, OrderItem
+from .menu_engineering import PLOWHORSE, STAR, MenuEngineeringAccumulator, build_report, confirmed_order_lines
+from .models import DailyCategorySales, DailyDishSales, DailyPaymentSales, DailySales, DishPair
+from .recommendations import rebuild_pairs, suggest_dishes
+from .rollups import rebuild_rollups, sales_report
+from .views import parse_period
+
+
+class SalesRollupTest(TestCase):
+
+    def setUp(self):
+        self.soups = Category.objects.create(name='Soups')
+        self.desserts = Category.objects.create(name='Desserts')
+        self.soup = self.create_dish('Soup', self.soups, '10.00')
+        self.cake = self.create_dish('Cake', self.desserts, '5.00')
+
+    def create_dish(self, name, category, price):
+        return MenuItem.objects.create(
+            name=name,
+            description=name,
+            ingredients=name,
+            price=Decimal(price),
+            category=category,
+        )
+
+    def create_order(self, lines, payment_method=Order.PAYMENT_CASH):
+        total = sum(dish.price * quantity for dish, quantity in lines)
+        order = Order.objects.create(
+            customer_name='Test',
+            phone_number='+70000000000',
+            delivery_address='Street 1',
+            payment_method=payment_method,
+            total_cost=total,
+            final_cost=total,
+        )
+        for dish, quantity in lines:
+            OrderItem.objects.create(order=order, dish=dish, quantity=quantity, price_at_order=dish.price)
+        return order
+
+    def confirm(self, order):
+        order.is_confirmed = True
+        order.status = Order.STATUS_CONFIRMED
+        order.save()
+
+    def snapshot(self):
+        return {
+            'days': list(DailySales.objects.values_list('date', 'orders_count', 'items_count', 'revenue')),
+            'dishes': sorted(DailyDishSales.objects.values_list('dish_id', 'quantity', 'revenue')),
+            'categories': sorted(DailyCategorySales.objects.values_list('category_id', 'quantity', 'revenue')),
+            'payments': sorted(DailyPaymentSales.objects.values_list('payment_method', 'orders_count', 'revenue')),
+        }
+
+    def test_only_confirmed_orders_are_counted(self):
+        self.create_order([(self.soup, 1)])
+        self.assertFalse(DailySales.objects.exists())
+
+        self.confirm(self.create_order([(self.soup, 2), (self.cake, 1)]))
+        self.confirm(self.create_order([(self.cake, 3)], payment_method=Order.PAYMENT_CARD))
+
+        day = DailySales.objects.get()
+        self.assertEqual((day.orders_count, day.items_count, day.revenue), (2, 6, Decimal('40.00')))
+        self.assertEqual(DailyDishSales.objects.get(dish=self.cake).quantity, 4)
+        self.assertEqual(DailyCategorySales.objects.get(category=self.soups).revenue, Decimal('20.00'))
+        self.assertEqual(DailyPaymentSales.objects.get(payment_method=Order.PAYMENT_CARD).revenue, Decimal('15.00'))
+
+    def test_deleted_and_unconfirmed_orders_are_subtracted(self):
+        first = self.create_order([(self.soup, 1)])
+        second = self.create_order([(self.cake, 2)])
+        self.confirm(first)
+        self.confirm(second)
+
+        first.delete()
+        second.is_confirmed = False
+        second.save()
+
+        day = DailySales.objects.get()
+        self.assertEqual((day.orders_count, day.revenue), (0, Decimal('0.00')))
+        self.assertEqual(DailyDishSales.objects.get(dish=self.cake).quantity, 0)
+
+    def test_edits_of_confirmed_orders_move_the_difference(self):
+        order = self.create_order([(self.soup, 2), (self.cake, 1)])
+        self.confirm(order)
+
+        order.payment_method = Order.PAYMENT_CARD
+        order.discount = Decimal('5.00')
+        order.save()
+
+        item = order.items.get(dish=self.soup)
+        item.quantity = 3
+        item.save()
+        order.items.get(dish=self.cake).delete()
+        OrderItem.objects.create(order=order, dish=self.cake, quantity=2, price_at_order=self.cake.price)
+
+        incremental = self.snapshot()
+        self.assertEqual(incremental['payments'], [
+            (Order.PAYMENT_CARD, 1, Decimal('20.00')), (Order.PAYMENT_CASH, 0, Decimal('0.00')),
+        ])
+        # Пересборка не создает строк с нулями, остальное совпадает
+        incremental['payments'] = incremental['payments'][:1]
+        rebuild_rollups()
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertEqual(DailyDishSales.objects.get(dish=self.soup).quantity, 3)
+        self.assertEqual(DailySales.objects.get().items_count, 5)
+
+        # Удаление заказа вычитает его один раз, вместе с позициями
+        order.delete()
+        self.assertEqual(DailySales.objects.get().items_count, 0)
+        self.assertEqual(DailyDishSales.objects.get(dish=self.cake).quantity, 0)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.confirm(self.create_order([(self.soup, 2), (self.cake, 1)]))
+        self.confirm(self.create_order([(self.cake, 3)], payment_method=Order.PAYMENT_CARD))
+        self.create_order([(self.soup, 5)])
+        incremental = self.snapshot()
+
+        self.assertEqual(rebuild_rollups(), 1)
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_report_reads_rollups_only(self):
+        self.confirm(self.create_order([(self.soup, 2), (self.cake, 1)]))
+        today = date.today()
+
+        with self.assertNumQueries(4):
+            report = sales_report(today - timedelta(days=89), today)
+
+        self.assertEqual(report['totals']['revenue'], Decimal('25.00'))
+        self.assertEqual([row['name'] for row in report['dishes']], ['Soup', 'Cake'])
+
+    def test_api_requires_staff(self):
+        url = reverse('analytics:sales_api')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        self.confirm(self.create_order([(self.soup, 1)]))
+
+        response = self.client.get(url, {'days': 90})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['totals']['orders_count'], 1)
+        self.assertEqual(self.client.get(url, {'days': 0}).status_code, 400)
+
+    @override_settings(USE_TZ=True, TIME_ZONE='Asia/Vladivostok')
+    def test_default_period_ends_on_local_date(self):
+        # 20:00 UTC 1 января - во Владивостоке (UTC+10) уже 2 января
+        now = datetime(2026, 1, 1, 20, 0, tzinfo=timezone.UTC)
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            self.assertEqual(parse_period({'days': '2'}), (date(2026, 1, 1), date(2026, 1, 2)))
+
+
+class MenuEngineeringTest(TestCase):
+
+    def setUp(self):
+        mains = Category.objects.create(name='Mains')
+        drinks = Category.objects.create(name='Drinks')
+        self.steak = MenuItem.objects.create(
+            name='Steak', description='-', ingredients='-', price=Decimal('30.00'),
+            cost_price=Decimal('10.00'), category=mains,
+        )
+        self.pasta = MenuItem.objects.create(
+            name='Pasta', description='-', ingredients='-', price=Decimal('12.00'),
+            cost_price=Decimal('4.00'), category=mains,
+        )
+        self.wine = MenuItem.objects.create(
+            name='Wine', description='-', ingredients='-', price=Decimal('8.00'), category=drinks,
+        )
+
+    def order(self, *lines, confirmed=True):
+        order = Order.objects.create(
+            customer_name='Test',
+            phone_number='+70000000000',
+            delivery_address='Street 1',
+            total_cost=Decimal('0'),
+            final_cost=Decimal('0'),
+            is_confirmed=confirmed,
+        )
+        for dish, quantity in lines:
+            OrderItem.objects.create(order=order, dish=dish, quantity=quantity, price_at_order=dish.price)
+
+    def test_report_matches_across_chunk_sizes(self):
+        self.order((self.steak, 1), (self.wine, 2))
+        self.order((self.steak, 1), (self.wine, 1), (self.pasta, 1))
+        self.order((self.pasta, 1))
+        self.order((self.steak, 5), confirmed=False)
+
+        report = build_report(chunk_size=10000, min_pair_orders=1)
+        # Порции меньше заказа: последний заказ порции переносится в следующую
+        self.assertEqual(build_report(chunk_size=2, min_pair_orders=1), report)
+
+        dishes = {dish.name: dish for dish in report.dishes}
+        self.assertEqual((report.lines, report.orders), (6, 3))
+        self.assertEqual(dishes['Steak'].quantity, 2)
+        self.assertEqual(dishes['Wine'].orders, 2)
+        self.assertEqual(dishes['Steak'].menu_class, STAR)
+        self.assertEqual(dishes['Pasta'].menu_class, PLOWHORSE)
+        # Себестоимость не указана - берется доля от цены
+        self.assertEqual(dishes['Wine'].unit_cost, 2.8)
+        self.assertEqual(dishes['Steak'].companions[0], ('Wine', 1.0))
+        self.assertEqual(report.pairs[0]['orders'], 2)
+
+    def test_elasticity_from_weekly_prices(self):
+        accumulator = MenuEngineeringAccumulator([1], weeks=4)
+        prices = np.array([10.0, 10.0, 12.5, 12.5, 8.0, 8.0, 11.0, 11.0])
+        # Спрос падает вдвое при росте цены вдвое - эластичность -1
+        quantity = 100 / prices / 2
+        accumulator.add(
+            order_starts=np.ones(8, dtype=bool),
+            dish_ids=np.ones(8, dtype=np.int64),
+            quantity=quantity,
+            price=prices,
+            week=np.array([0, 0, 1, 1, 2, 2, 3, 3]),
+        )
+
+        self.assertAlmostEqual(accumulator.elasticity()[0], -1.0)
+
+    def test_created_at_is_epoch_seconds(self):
+        self.order((self.steak, 1))
+        order = Order.objects.get()
+
+        created = confirmed_order_lines().get()[4]
+        self.assertIsInstance(created, int)
+        self.assertEqual(
+            np.datetime64(created, 's'),
+            np.datetime64(order.created_at.replace(tzinfo=None, microsecond=0), 's'),
+        )
+
+    def test_pairs_are_counted_per_order(self):
+        accumulator = MenuEngineeringAccumulator([1, 2, 3], weeks=1)
+        # Заказы {1, 2, 2}, {3, 1}, {2}; повтор блюда в заказе - одна пара
+        accumulator.add(
+            order_starts=np.array([True, False, False, True, False, True]),
+            dish_ids=np.array([1, 2, 2, 3, 1, 2]),
+            quantity=np.ones(6),
+            price=np.ones(6),
+            week=np.zeros(6, dtype=np.int64),
+        )
+        accumulator.add(
+            order_starts=np.array([True, False]),
+            dish_ids=np.array([3, 1]),
+            quantity=np.ones(2),
+            price=np.ones(2),
+            week=np.zeros(2, dtype=np.int64),
+        )
+
+        first, second, orders = accumulator.pairs()
+        self.assertEqual(
+            sorted(zip(first.tolist(), second.tolist(), orders.tolist())),
+            [(0, 0, 3), (0, 1, 1), (0, 2, 2), (1, 1, 2), (2, 2, 2)],
+        )
+        np.testing.assert_array_equal(accumulator.pair_matrix(), [[3, 1, 2], [1, 2, 0], [2, 0, 2]])
+
+
+@override_settings(RECOMMENDATIONS_MIN_ORDERS=1)
+class RecommendationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Mains')
+        self.burger, self.fries, self.cola, self.salad, self.soup = (
+            MenuItem.objects.create(
+                name=name, description='-', ingredients='-', price=Decimal('5.00'),
+                category=category, is_delivery=True,
+            )
+            for name in ('Burger', 'Fries', 'Cola', 'Salad', 'Soup')
+        )
+
+    def confirmed_order(self, *dishes):
+        order = Order.objects.create(
+            customer_name='Test',
+            phone_number='+70000000000',
+            delivery_address='Street 1',
+            total_cost=Decimal('0'),
+            final_cost=Decimal('0'),
+        )
+        for dish in dishes:
+            OrderItem.objects.create(order=order, dish=dish, price_at_order=dish.price)
+        order.is_confirmed = True
+        order.save()
+        return order
+
+    def test_suggestions_from_history_without_queries(self):
+        self.confirmed_order(self.burger, self.fries, self.cola)
+        self.confirmed_order(self.burger, self.fries)
+        self.confirmed_order(self.salad, self.soup)
+        rebuild_pairs()
+
+        suggest_dishes([self.burger.id])
+        with self.assertNumQueries(0):
+            suggestions = suggest_dishes([self.burger.id])
+        self.assertEqual([dish.name for dish in suggestions], ['Fries', 'Cola'])
+
+        # Флаги меню берутся из текущего снимка
+        MenuItem.objects.filter(pk=self.fries.pk).update(stop_list=True)
+        MenuItem.objects.filter(pk=self.cola.pk).update(is_delivery=False)
+        bump_menu_version()
+        self.assertEqual(suggest_dishes([self.burger.id]), [])
+
+    def test_confirmed_orders_update_index_through_job_queue(self):
+        self.confirmed_order(self.burger, self.fries)
+        self.assertEqual(suggest_dishes([self.burger.id]), [])
+
+        jobs = [claimed for claimed in claim_jobs('test', 10) if claimed.name == 'analytics.dish_pairs']
+        self.assertEqual(run_jobs(jobs), 0)
+
+        self.assertEqual([dish.name for dish in suggest_dishes([self.burger.id])], ['Fries'])
+        self.assertEqual(DishPair.objects.get(first_id=self.burger.id, second_id=self.burger.id).orders_count, 1)
+
+        # Повторный пересчет по истории дает те же пары
+        pairs = set(DishPair.objects.values_list('first_id', 'second_id', 'orders_count'))
+        rebuild_pairs()
+        self.assertEqual(set(DishPair.objects.values_list('first_id', 'second_id', 'orders_count')), pairs)
+
+    def run_pair_jobs(self):
+        jobs = [claimed for claimed in claim_jobs('test', 10) if claimed.name == 'analytics.dish_pairs']
+        self.assertEqual(run_jobs(jobs), 0)
+
+    def pair_count(self, first, second):
+        pair = DishPair.objects.filter(first_id=first.id, second_id=second.id).first()
+        return pair.orders_count if pair else 0
+
+    def test_order_created_confirmed_enqueues_pairs(self):
+        order = Order.objects.create(
+            customer_name='Test', phone_number='+70000000000', delivery_address='Street 1', is_confirmed=True,
+        )
+        self.assertTrue(Job.objects.filter(idempotency_key__startswith=f'order:{order.id}:pairs:+').exists())
+
+    def test_unconfirmed_and_deleted_orders_are_subtracted_from_pairs(self):
+        order = self.confirmed_order(self.burger, self.fries)
+        self.run_pair_jobs()
+        self.assertEqual(self.pair_count(self.burger, self.fries), 1)
+
+        order.is_confirmed = False
+        order.save()
+        self.run_pair_jobs()
+        self.assertEqual(self.pair_count(self.burger, self.fries), 0)
+
+        # Повторное подтверждение снова учитывается
+        order.is_confirmed = True
+        order.save()
+        self.run_pair_jobs()
+        self.assertEqual(self.pair_count(self.burger, self.fries), 1)
+
+        order.delete()
+        self.run_pair_jobs()
+        self.assertEqual(self.pair_count(self.burger, self.fries), 0)
+        self.assertEqual(self.pair_count(self.burger, self.burger), 0)
+
+    def test_edited_lines_are_subtracted_exactly(self):
+        order = self.confirmed_order(self.burger, self.fries)
+        # Прибавление еще в очереди, а состав уже меняют в админке
+        OrderItem.objects.create(order=order, dish=self.cola, price_at_order=self.cola.price)
+        order.items.get(dish=self.fries).delete()
+        self.run_pair_jobs()
+        self.assertEqual(self.pair_count(self.burger, self.cola), 1)
+        self.assertEqual(self.pair_count(self.burger, self.fries), 0)
+
+        order.is_confirmed = False
+        order.save()
+        self.run_pair_jobs()
+        self.assertFalse(DishPair.objects.exclude(orders_count=0).exists())
+
+    def test_cart_page_shows_suggestions(self):
+        self.confirmed_order(self.burger, self.salad)
+        rebuild_pairs()
+
+        self.client.get(reverse('menu:add_to_cart', args=[self.burger.id]), HTTP_REFERER='/orders/cart/')
+        response = self.client.get(reverse('orders:cart_detail'))
+
+        self.assertEqual([dish.name for dish in response.context['recommendations']], ['Salad'])
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'analytics'
+
+urlpatterns = [
+    path('sales/', views.sales_api, name='sales_api'),
+]
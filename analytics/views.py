@@ -0,0 +1,53 @@
+from datetime import date, timedelta
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from orders.stats import order_date
+from .rollups import sales_report
+
+# Длина периода по умолчанию и максимальная (дни)
+DEFAULT_DAYS = 90
+MAX_DAYS = 366
+
+
+def parse_period(params):
+    """
+    Период отчета из параметров запроса
+
+    Поддерживаются ?days=N (последние N дней) и ?start=YYYY-MM-DD&end=YYYY-MM-DD.
+
+    Raises:
+        ValueError: некорректные параметры
+    """
+    # Сегодня - в часовом поясе сайта, как и дни в сводках (order_date)
+    end = date.fromisoformat(params['end']) if params.get('end') else order_date(timezone.now())
+    if params.get('start'):
+        start = date.fromisoformat(params['start'])
+    else:
+        days = int(params.get('days', DEFAULT_DAYS))
+        if days < 1:
+            raise ValueError('days must be positive')
+        start = end - timedelta(days=days - 1)
+
+    if start > end:
+        raise ValueError('start is after end')
+    if (end - start).days >= MAX_DAYS:
+        raise ValueError(f'period is longer than {MAX_DAYS} days')
+    return start, end
+
+
+@staff_member_required
+@require_GET
+def sales_api(request):
+    """Отчет о продажах за период в JSON (только для персонала)"""
+    try:
+        start, end = parse_period(request.GET)
+        limit = int(request.GET.get('limit', 20))
+        if limit < 1:
+            raise ValueError('limit must be positive')
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    return JsonResponse({'success': True, **sales_report(start, end, limit=limit)})
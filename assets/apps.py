@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class AssetsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'assets'
+    verbose_name = 'Сборка статики'
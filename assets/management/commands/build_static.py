@@ -0,0 +1,122 @@
+import os
+import re
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from assets.pipeline import build_bundles, compress_static
+from web_restaurant.page_cache import bump_page_cache_version
+
+DEFAULT_PAGES = ['/', '/menu/', '/blog/', '/events/', '/gallery/', '/reviews/', '/orders/cart/']
+
+LINK_RE = re.compile(r'<link\b[^>]*>', re.I)
+HREF_RE = re.compile(r'\bhref="([^"]+)"')
+SCRIPT_RE = re.compile(r'<script\b[^>]*\bsrc="([^"]+)"', re.I)
+
+
+def page_assets(html):
+    """URL стилей и скриптов страницы по порядку"""
+    urls = []
+    for tag in LINK_RE.findall(html):
+        if 'stylesheet' in tag:
+            match = HREF_RE.search(tag)
+            if match:
+                urls.append(match.group(1))
+    urls.extend(SCRIPT_RE.findall(html))
+    return urls
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает статику для продакшена: бандлы CSS/JS, хэши в именах файлов '
+        '(collectstatic) и сжатые копии .gz/.br. Работает без сети'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--report', action='store_true',
+            help='Сравнить число запросов и объем CSS/JS страниц до и после сборки',
+        )
+        parser.add_argument('--pages', nargs='+', default=DEFAULT_PAGES, help='Страницы для отчета')
+
+    def pipeline_settings(self):
+        dirs = list(settings.STATICFILES_DIRS)
+        if settings.STATIC_BUILD_DIR not in dirs:
+            dirs.append(settings.STATIC_BUILD_DIR)
+        return override_settings(
+            STATIC_PIPELINE=True,
+            STATICFILES_DIRS=dirs,
+            STORAGES=settings.STATIC_PIPELINE_STORAGES,
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        with self.pipeline_settings():
+            for name, sources, source_size, size in build_bundles():
+                self.stdout.write(
+                    f'{name}: {sources} файлов, {source_size / 1024:.0f} KB → {size / 1024:.0f} KB'
+                )
+            call_command('collectstatic', interactive=False, verbosity=0)
+            compressed = compress_static()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Статика собрана в {settings.STATIC_ROOT}: сжато файлов {compressed}, '
+            f'{time.perf_counter() - started:.1f} с'
+        ))
+
+        if options['report']:
+            self.report(options['pages'])
+
+    def render_pages(self, pages):
+        """{страница: [URL стилей и скриптов]} для текущих настроек"""
+        bump_page_cache_version()
+        client = Client()
+        assets = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for page in pages:
+                response = client.get(page)
+                if response.status_code != 200:
+                    self.stdout.write(self.style.WARNING(f'{page}: HTTP {response.status_code}'))
+                    continue
+                assets[page] = page_assets(response.content.decode())
+        return assets
+
+    def measure(self, urls, find):
+        """(запросов к своей статике, внешних запросов, {кодировка: байт})"""
+        local = [url for url in urls if url.startswith(settings.STATIC_URL)]
+        sizes = {'raw': 0, 'gzip': 0, 'br': 0}
+        for url in local:
+            path = find(url[len(settings.STATIC_URL):].split('?')[0])
+            raw = os.path.getsize(path)
+            sizes['raw'] += raw
+            for encoding, suffix in (('gzip', '.gz'), ('br', '.br')):
+                sizes[encoding] += os.path.getsize(path + suffix) if os.path.exists(path + suffix) else raw
+        return len(local), len(urls) - len(local), sizes
+
+    def report(self, pages):
+        with override_settings(STATIC_PIPELINE=False, STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        }):
+            before = self.render_pages(pages)
+        with self.pipeline_settings():
+            after = self.render_pages(pages)
+        bump_page_cache_version()
+
+        self.stdout.write('\nCSS/JS на странице: запросов к /static/ (+ внешних), объем без сжатия / br')
+        for page in pages:
+            if page not in before or page not in after:
+                continue
+            local_before, external, sizes_before = self.measure(before[page], finders.find)
+            local_after, _, sizes_after = self.measure(
+                after[page], lambda name: os.path.join(settings.STATIC_ROOT, name),
+            )
+            self.stdout.write(
+                f'{page:<14} до: {local_before:>2} (+{external}) {sizes_before["raw"] / 1024:>6.0f} KB   '
+                f'после: {local_after:>2} (+{external}) {sizes_after["raw"] / 1024:>6.0f} KB / '
+                f'{sizes_after["br"] / 1024:.0f} KB br'
+            )
@@ -0,0 +1,156 @@
+"""
+Сборка статики для продакшена (manage.py build_static).
+
+1. Стили и скрипты из base.html склеиваются в бандлы (STATIC_BUNDLES) и
+   минифицируются (rcssmin/rjsmin, лицензионные комментарии /*! */
+   сохраняются). Бандлы пишутся в STATIC_BUILD_DIR - одну из папок
+   STATICFILES_DIRS, рядом с исходниками по тем же относительным путям,
+   поэтому url(../fonts/...) внутри CSS остаются верными.
+2. collectstatic с PipelineStaticFilesStorage: в имена файлов
+   добавляется хэш содержимого, ссылки внутри CSS переписываются, а
+   соответствие имен записывается в манифест staticfiles.json.
+3. Рядом с каждым текстовым файлом кладутся .gz и .br, чтобы не сжимать
+   на лету; serve_static (assets/views.py) отдает их с заголовком
+   Cache-Control: immutable.
+
+Все шаги работают без сети.
+"""
+import gzip
+import os
+
+import brotli
+import rcssmin
+import rjsmin
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+# Текстовые форматы, которые имеет смысл сжимать заранее
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.xml', '.map', '.ico', '.eot', '.ttf', '.otf'}
+
+# Сжатая копия сохраняется, только если она заметно меньше оригинала
+MIN_COMPRESSION_RATIO = 0.95
+
+
+class PipelineStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Хэшированные имена, как у ManifestStaticFilesStorage, но битые ссылки
+    в CSS темы (картинки, которых нет в static/) не прерывают сборку
+    """
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def converter_or_original(matchobj):
+            try:
+                return converter(matchobj)
+            except ValueError:
+                return matchobj.group(0)
+
+        return converter_or_original
+
+
+def get_bundles():
+    """{имя бандла: [исходные файлы по порядку подключения]}"""
+    return getattr(settings, 'STATIC_BUNDLES', {})
+
+
+def minify(name, source):
+    if name.endswith('.css'):
+        return rcssmin.cssmin(source, keep_bang_comments=True)
+    if name.endswith('.js'):
+        return rjsmin.jsmin(source, keep_bang_comments=True)
+    return source
+
+
+def read_source(name):
+    path = finders.find(name)
+    if path is None:
+        raise FileNotFoundError(f'Static file {name} not found')
+    with open(path, encoding='utf-8') as source:
+        return source.read()
+
+
+def build_bundle(name, sources):
+    """
+    Склеивает и минифицирует исходники бандла
+
+    Returns:
+        (текст бандла, размер исходников в байтах)
+    """
+    # ";" между скриптами: файл без точки с запятой в конце не должен
+    # слиться со следующим
+    separator = '\n' if name.endswith('.css') else ';\n'
+    parts = []
+    source_size = 0
+    for source_name in sources:
+        text = read_source(source_name)
+        source_size += len(text.encode())
+        parts.append(minify(source_name, text))
+    return separator.join(parts), source_size
+
+
+def build_bundles(build_dir=None):
+    """
+    Пишет все бандлы в STATIC_BUILD_DIR
+
+    Returns:
+        [(имя бандла, число исходников, байт исходников, байт бандла)]
+    """
+    build_dir = build_dir or settings.STATIC_BUILD_DIR
+    report = []
+    for name, sources in get_bundles().items():
+        content, source_size = build_bundle(name, sources)
+        data = content.encode()
+
+        path = os.path.join(build_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as bundle:
+            bundle.write(data)
+        report.append((name, len(sources), source_size, len(data)))
+    return report
+
+
+def compress_file(path):
+    """
+    Кладет рядом с файлом path сжатые копии .gz и .br
+
+    Returns:
+        {'gzip': байт или None, 'br': байт или None}
+    """
+    with open(path, 'rb') as original:
+        data = original.read()
+
+    sizes = {}
+    for encoding, suffix, compress in (
+        ('gzip', '.gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0)),
+        ('br', '.br', lambda raw: brotli.compress(raw, quality=11)),
+    ):
+        compressed = compress(data)
+        if len(compressed) < len(data) * MIN_COMPRESSION_RATIO:
+            with open(path + suffix, 'wb') as target:
+                target.write(compressed)
+            sizes[encoding] = len(compressed)
+        else:
+            # Не оставляем копию от прошлой сборки
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+            sizes[encoding] = None
+    return sizes
+
+
+def compress_static(static_root=None):
+    """
+    Сжимает все текстовые файлы в STATIC_ROOT
+
+    Returns:
+        число обработанных файлов
+    """
+    static_root = static_root or settings.STATIC_ROOT
+    count = 0
+    for directory, _, files in os.walk(static_root):
+        for filename in files:
+            if os.path.splitext(filename)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                compress_file(os.path.join(directory, filename))
+                count += 1
+    return count
@@ -0,0 +1,33 @@
+"""
+Подключение бандлов статики (assets/pipeline.py).
+
+    {% load static_bundles %}
+    {% static_bundle 'css/site.bundle.css' %}
+
+С включенным STATIC_PIPELINE выводится один тег на собранный бандл с
+хэшем в имени, иначе (разработка) - теги исходных файлов по отдельности.
+"""
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from assets.pipeline import get_bundles
+
+register = template.Library()
+
+
+def asset_tag(name):
+    if name.endswith('.css'):
+        return format_html('<link href="{}" rel="stylesheet">', static(name))
+    return format_html('<script src="{}"></script>', static(name))
+
+
+@register.simple_tag
+def static_bundle(name):
+    bundles = get_bundles()
+    if name not in bundles:
+        raise template.TemplateSyntaxError(f'Unknown static bundle {name!r}')
+
+    if getattr(settings, 'STATIC_PIPELINE', False):
+        return asset_tag(name)
+    return format_html_join('\n    ', '{}', ((asset_tag(source),) for source in bundles[name]))
@@ -0,0 +1,166 @@
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import brotli
+from django.http import Http404
+from django.template import Context, Template, TemplateSyntaxError
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from .pipeline import build_bundles, compress_static
+from .views import DEFAULT_CACHE_CONTROL, IMMUTABLE_CACHE_CONTROL, MEDIA_CACHE_CONTROL, hashed_names, serve_static
+
+BUNDLES = {
+    'css/test.bundle.css': ['css/stars.css', 'css/popup.css'],
+    'js/test.bundle.js': ['js/functions.js'],
+}
+
+
+@override_settings(STATIC_BUNDLES=BUNDLES)
+class StaticBundleTagTest(SimpleTestCase):
+
+    def render(self, name):
+        return Template('{% load static_bundles %}{% static_bundle name %}').render(Context({'name': name}))
+
+    @override_settings(STATIC_PIPELINE=False)
+    def test_sources_in_development(self):
+        html = self.render('css/test.bundle.css')
+        self.assertInHTML('<link href="/static/css/stars.css" rel="stylesheet">', html)
+        self.assertInHTML('<link href="/static/css/popup.css" rel="stylesheet">', html)
+
+    @override_settings(STATIC_PIPELINE=True)
+    def test_single_bundle_with_pipeline(self):
+        self.assertHTMLEqual(
+            self.render('js/test.bundle.js'), '<script src="/static/js/test.bundle.js"></script>',
+        )
+
+    def test_unknown_bundle(self):
+        with self.assertRaises(TemplateSyntaxError):
+            self.render('css/missing.css')
+
+
+@override_settings(STATIC_BUNDLES=BUNDLES)
+class StaticPipelineTest(SimpleTestCase):
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root, ignore_errors=True)
+        hashed_names.cache_clear()
+        self.addCleanup(hashed_names.cache_clear)
+
+    def test_bundles_are_minified_and_compressed(self):
+        report = dict((name, sizes) for name, *sizes in build_bundles(self.static_root))
+        sources, source_size, size = report['css/test.bundle.css']
+        self.assertEqual(sources, 2)
+        self.assertLess(size, source_size)
+
+        path = os.path.join(self.static_root, 'css/test.bundle.css')
+        with open(path, 'rb') as bundle:
+            data = bundle.read()
+        self.assertEqual(compress_static(self.static_root), 2)
+        with open(path + '.br', 'rb') as compressed:
+            self.assertEqual(brotli.decompress(compressed.read()), data)
+        with open(path + '.gz', 'rb') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), data)
+
+    def test_serve_static(self):
+        build_bundles(self.static_root)
+        compress_static(self.static_root)
+        hashed = 'css/test.bundle.0123456789ab.css'
+        shutil.copy(os.path.join(self.static_root, 'css/test.bundle.css'), os.path.join(self.static_root, hashed))
+        factory = RequestFactory()
+
+        with override_settings(STATIC_ROOT=self.static_root):
+            response = serve_static(factory.get('/', HTTP_ACCEPT_ENCODING='gzip, br'), 'css/test.bundle.css')
+            response.close()
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertEqual(response['Cache-Control'], DEFAULT_CACHE_CONTROL)
+            self.assertIn('Accept-Encoding', response['Vary'])
+
+            # Повторный запрос с тем же ETag - без тела
+            not_modified = serve_static(
+                factory.get('/', HTTP_ACCEPT_ENCODING='gzip, br', HTTP_IF_NONE_MATCH=response['ETag']),
+                'css/test.bundle.css',
+            )
+            self.assertEqual(not_modified.status_code, 304)
+
+            # Клиент без сжатия получает оригинал
+            plain = serve_static(factory.get('/'), 'css/test.bundle.css')
+            plain.close()
+            self.assertFalse(plain.has_header('Content-Encoding'))
+
+            # Имя с хэшем из манифеста кэшируется навсегда
+            with mock.patch('assets.views.hashed_names', return_value=frozenset([hashed])):
+                immutable = serve_static(factory.get('/'), hashed)
+                immutable.close()
+            self.assertEqual(immutable['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+
+            for path in ('../settings.py', 'css/missing.css'):
+                with self.assertRaises(Http404):
+                    serve_static(factory.get('/'), path)
+
+
+class MediaServeTest(SimpleTestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        os.makedirs(os.path.join(self.media_root, 'gallery_image'))
+        with open(os.path.join(self.media_root, 'gallery_image/photo.jpg'), 'wb') as photo:
+            photo.write(self.content)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def get(self, path='/media/gallery_image/photo.jpg', **headers):
+        response = self.client.get(path, **headers)
+        response.body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response
+
+    def test_full_file_and_conditional_get(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], MEDIA_CACHE_CONTROL)
+
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.get('/media/../settings.py').status_code, 404)
+        self.assertEqual(self.get('/media/gallery_image/missing.jpg').status_code, 404)
+
+    def test_byte_ranges(self):
+        response = self.get(HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.body, self.content[100:200])
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/1024')
+
+        # Последние байты и открытый диапазон
+        self.assertEqual(self.get(HTTP_RANGE='bytes=-24').body, self.content[-24:])
+        self.assertEqual(self.get(HTTP_RANGE='bytes=1000-').body, self.content[1000:])
+
+        unsatisfiable = self.get(HTTP_RANGE='bytes=5000-')
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable['Content-Range'], 'bytes */1024')
+
+        # Файл изменился с If-Range - отдается целиком
+        stale = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(stale.body, self.content)
+
+    def test_sendfile_modes(self):
+        with override_settings(MEDIA_SENDFILE='x-accel-redirect', MEDIA_ACCEL_PREFIX='/protected-media/'):
+            response = self.get()
+            self.assertEqual(response['X-Accel-Redirect'], '/protected-media/gallery_image/photo.jpg')
+            self.assertEqual(response.body, b'')
+            self.assertIn('ETag', response)
+
+        with override_settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.get()
+            self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'gallery_image/photo.jpg'))
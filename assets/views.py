@@ -0,0 +1,214 @@
+import mimetypes
+import os
+import posixpath
+import re
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# Сжатые копии в порядке предпочтения: (Content-Encoding, суффикс файла)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Файлы с хэшем в имени не меняются: кэшировать можно на год
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+
+# Копии изображений лежат по пути с хэшем содержимого (images/derivatives.py)
+IMMUTABLE_MEDIA_PREFIXES = ('derivatives/',)
+MEDIA_CACHE_CONTROL = 'public, max-age=86400'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+@lru_cache(maxsize=1)
+def hashed_names():
+    """Имена файлов с хэшем из манифеста collectstatic (читается один раз за процесс)"""
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def accepted_encodings(request):
+    return {
+        value.split(';')[0].strip().lower()
+        for value in request.headers.get('Accept-Encoding', '').split(',')
+    }
+
+
+@require_safe
+def serve_static(request, path):
+    """
+    Файл из STATIC_ROOT для продакшена без отдельного веб-сервера
+
+    Если клиент принимает br или gzip и рядом лежит сжатая копия
+    (manage.py build_static), отдается она. Файлы с хэшем в имени
+    отдаются с Cache-Control: immutable.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    accepted = accepted_encodings(request)
+    file_path, encoding = full_path, None
+    for candidate, suffix in ENCODINGS:
+        if candidate in accepted and os.path.isfile(full_path + suffix):
+            file_path, encoding = full_path + suffix, candidate
+            break
+
+    stat = os.stat(file_path)
+    etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}{"-" + encoding if encoding else ""}"'
+    cache_control = IMMUTABLE_CACHE_CONTROL if path in hashed_names() else DEFAULT_CACHE_CONTROL
+
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(file_path, 'rb'), content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+class FileRange:
+    """
+    Часть открытого файла для FileResponse
+
+    fileno() отдается как есть: gunicorn передает файл через sendfile с
+    текущей позиции и не больше Content-Length. read() для остальных
+    серверов не выходит за конец диапазона.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    (start, end) включительно для заголовка Range с одним диапазоном
+
+    Returns:
+        None - заголовка нет или диапазонов несколько (отдается весь файл)
+
+    Raises:
+        ValueError: диапазон за пределами файла
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # bytes=-500: последние 500 байт
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def if_range_matches(request, etag, mtime):
+    """Range применяется, только если файл не изменился с If-Range"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def sendfile_response(path, full_path):
+    """Ответ, по которому файл отдает веб-сервер перед Django"""
+    response = HttpResponse()
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+    else:
+        response['X-Sendfile'] = full_path
+    # Тип файла определяет веб-сервер
+    del response['Content-Type']
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Загруженный файл из MEDIA_ROOT
+
+    Заголовки ETag и Last-Modified, ответ 304 на повторный запрос. С
+    MEDIA_SENDFILE файл отдает веб-сервер (X-Accel-Redirect/X-Sendfile),
+    иначе - FileResponse с поддержкой Range (один диапазон).
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    cache_control = IMMUTABLE_CACHE_CONTROL if path.startswith(IMMUTABLE_MEDIA_PREFIXES) else MEDIA_CACHE_CONTROL
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None and getattr(settings, 'MEDIA_SENDFILE', None):
+        response = sendfile_response(path, full_path)
+    elif response is None:
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        try:
+            byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+        if byte_range is not None and if_range_matches(request, etag, stat.st_mtime):
+            start, end = byte_range
+            response = FileResponse(
+                FileRange(open(full_path, 'rb'), start, end - start + 1), status=206, content_type=content_type,
+            )
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        else:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from blog.search import get_backend, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает индекс полнотекстового поиска по постам блога'
+
+    def handle(self, *args, **options):
+        if not get_backend().supported:
+            self.stdout.write(self.style.WARNING('Полнотекстовый поиск для этой базы данных не поддерживается'))
+            return
+
+        posts = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано постов: {posts}'))
@@ -0,0 +1,84 @@
+# Generated by Django 6.0 on 2026-10-18 13:30
+
+import re
+
+import snowballstemmer
+from django.db import migrations
+
+# Копия имен таблиц и стемминга из blog/search.py на момент миграции:
+# миграция не должна ломаться при изменении кода приложения. Если
+# стемминг изменится, индекс пересобирает rebuild_blog_search
+FTS_TABLE = 'blog_post_fts'
+POSTGRES_TABLE = 'blog_post_search'
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+CYRILLIC_RE = re.compile(r'[а-яё]')
+
+
+def normalize(text, stemmers):
+    words = WORD_RE.findall((text or '').lower().replace('ё', 'е'))
+    return ' '.join(
+        stemmers['russian' if CYRILLIC_RE.search(word) else 'english'].stemWord(word) for word in words
+    )
+
+
+def create_search_index(apps, schema_editor):
+    """Индекс полнотекстового поиска (см. blog/search.py) и его заполнение"""
+    stemmers = {language: snowballstemmer.stemmer(language) for language in ('russian', 'english')}
+
+    Post = apps.get_model('blog', 'Post')
+    vendor = schema_editor.connection.vendor
+    rows = [
+        (
+            post.pk,
+            normalize(post.title, stemmers),
+            normalize(post.short_description, stemmers),
+            normalize(post.content, stemmers),
+        )
+        for post in Post.objects.only('id', 'title', 'short_description', 'content')
+    ]
+
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            f"title, short_description, content, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, short_description, content) VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE TABLE {POSTGRES_TABLE} ('
+            f'post_id bigint PRIMARY KEY REFERENCES blog_post (id) ON DELETE CASCADE, '
+            f'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(f'CREATE INDEX {POSTGRES_TABLE}_document ON {POSTGRES_TABLE} USING GIN (document)')
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {POSTGRES_TABLE} (post_id, document) VALUES (%s, "
+                f"setweight(to_tsvector('simple', %s), 'A') || "
+                f"setweight(to_tsvector('simple', %s), 'B') || "
+                f"setweight(to_tsvector('simple', %s), 'C'))",
+                rows,
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {POSTGRES_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_post_is_best_post_blog_post_is_best_43853f_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -36,9 +36,18 @@ class Post(models.Model):
     class Meta:
         verbose_name = 'post'
         verbose_name_plural = 'posts'
-        ordering = ('-created_at',)
+        ordering = ('-created_at', 'id')
         indexes = [
             models.Index(fields=['is_best', '-created_at', 'is_published']),
+            # Постраничный вывод блога по ключу (blog/views.py): частичный
+            # индекс только по опубликованным постам
+            models.Index(
+                fields=['-created_at', 'id'], condition=models.Q(is_published=True), name='blog_post_published_idx',
+            ),
+            # Блок «лучшие посты» в сайдбаре списка
+            models.Index(
+                fields=['-created_at'], condition=models.Q(is_published=True, is_best=True), name='blog_post_best_idx',
+            ),
         ]
 
     def get_absolute_url(self):
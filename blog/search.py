@@ -0,0 +1,254 @@
+"""
+Полнотекстовый поиск по постам блога.
+
+Вместо LIKE '%q%' по трем полям (полный просмотр таблицы с текстом
+статей) запрос идет в индекс: в SQLite это виртуальная таблица FTS5
+blog_post_fts, в PostgreSQL - таблица blog_post_search с tsvector и
+GIN-индексом. Индекс создается миграцией 0007 и обновляется сигналами
+Post (blog/signals.py); rebuild_blog_search пересобирает его целиком.
+
+Слова стеммируются в Python (snowball, русский или английский по
+алфавиту слова) одинаково при индексации и при поиске, поэтому
+«супы» находит «суп», а «recipes» - «recipe», на обеих базах.
+
+Результаты ранжируются (bm25 / ts_rank, заголовок важнее анонса,
+анонс важнее текста). Список id найденных постов кэшируется по
+запросу и тегу; версия кэша растет при изменении постов.
+"""
+import hashlib
+import re
+import threading
+from functools import lru_cache
+
+import snowballstemmer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from web_restaurant.cache_versions import bump_version, get_version
+
+SEARCH_VERSION_KEY = 'blog:search:version'
+SEARCH_RESULTS_KEY = 'blog:search:{version}:{digest}'
+
+FTS_TABLE = 'blog_post_fts'
+POSTGRES_TABLE = 'blog_post_search'
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+CYRILLIC_RE = re.compile(r'[а-яё]')
+
+# Объекты snowball хранят состояние, поэтому у каждого потока свои
+_stemmers = threading.local()
+
+
+@lru_cache(maxsize=100000)
+def _stem(word):
+    if not hasattr(_stemmers, 'russian'):
+        _stemmers.russian = snowballstemmer.stemmer('russian')
+        _stemmers.english = snowballstemmer.stemmer('english')
+
+    stemmer = _stemmers.russian if CYRILLIC_RE.search(word) else _stemmers.english
+    return stemmer.stemWord(word)
+
+
+def stem_words(text):
+    """Основы слов текста в нижнем регистре"""
+    return [_stem(word) for word in WORD_RE.findall((text or '').lower().replace('ё', 'е'))]
+
+
+def normalize(text):
+    return ' '.join(stem_words(text))
+
+
+class SearchBackend:
+    """Поиск не поддерживается: представления используют icontains"""
+
+    supported = False
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def index_many(self, posts):
+        pass
+
+    def search(self, terms, tag_id=None, limit=None):
+        return []
+
+
+class SQLiteBackend(SearchBackend):
+    supported = True
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, short_description, content) VALUES (%s, %s, %s, %s)',
+                [post.pk, normalize(post.title), normalize(post.short_description), normalize(post.content)],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def index_many(self, posts):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, short_description, content) VALUES (%s, %s, %s, %s)',
+                [
+                    (post.pk, normalize(post.title), normalize(post.short_description), normalize(post.content))
+                    for post in posts
+                ],
+            )
+
+    def search(self, terms, tag_id=None, limit=None):
+        # Каждое слово - префикс основы: "суп"* AND "дн"*
+        match = ' AND '.join(f'"{term}"*' for term in terms)
+        sql = (
+            f'SELECT p.id FROM {FTS_TABLE} f JOIN blog_post p ON p.id = f.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND p.is_published'
+        )
+        params = [match]
+        if tag_id is not None:
+            sql += ' AND p.id IN (SELECT post_id FROM blog_post_tags WHERE tag_id = %s)'
+            params.append(tag_id)
+        sql += f' ORDER BY bm25({FTS_TABLE}, 10.0, 4.0, 1.0), p.created_at DESC LIMIT %s'
+        params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresBackend(SearchBackend):
+    supported = True
+
+    DOCUMENT = (
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'C')"
+    )
+
+    def _row(self, post):
+        return [post.pk, normalize(post.title), normalize(post.short_description), normalize(post.content)]
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (post_id, document) VALUES (%s, {self.DOCUMENT}) '
+                f'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document',
+                self._row(post),
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {POSTGRES_TABLE} WHERE post_id = %s', [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {POSTGRES_TABLE}')
+
+    def index_many(self, posts):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {POSTGRES_TABLE} (post_id, document) VALUES (%s, {self.DOCUMENT})',
+                [self._row(post) for post in posts],
+            )
+
+    def search(self, terms, tag_id=None, limit=None):
+        query = ' & '.join(f"'{term}':*" for term in terms)
+        sql = (
+            f"SELECT p.id FROM {POSTGRES_TABLE} s JOIN blog_post p ON p.id = s.post_id "
+            f"WHERE s.document @@ to_tsquery('simple', %s) AND p.is_published"
+        )
+        params = [query]
+        if tag_id is not None:
+            sql += ' AND p.id IN (SELECT post_id FROM blog_post_tags WHERE tag_id = %s)'
+            params.append(tag_id)
+        sql += " ORDER BY ts_rank(s.document, to_tsquery('simple', %s)) DESC, p.created_at DESC LIMIT %s"
+        params += [query, limit]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+def get_backend():
+    """Бэкенд поиска для текущей базы данных"""
+    if connection.vendor == 'sqlite':
+        return SQLiteBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresBackend()
+    return SearchBackend()
+
+
+def bump_search_version():
+    """Сбрасывает закэшированные результаты поиска"""
+    return bump_version(SEARCH_VERSION_KEY)
+
+
+def search_post_ids(query, tag_id=None):
+    """
+    id опубликованных постов по запросу, от самых релевантных
+
+    Returns:
+        список id (не больше BLOG_SEARCH_MAX_RESULTS) или None, если
+        индекс недоступен на этой базе
+    """
+    backend = get_backend()
+    if not backend.supported:
+        return None
+
+    terms = stem_words(query)
+    if not terms:
+        return []
+
+    digest = hashlib.md5(f'{tag_id}:{" ".join(terms)}'.encode()).hexdigest()
+    key = SEARCH_RESULTS_KEY.format(version=get_version(SEARCH_VERSION_KEY), digest=digest)
+    post_ids = cache.get(key)
+    if post_ids is None:
+        post_ids = backend.search(terms, tag_id=tag_id, limit=getattr(settings, 'BLOG_SEARCH_MAX_RESULTS', 1000))
+        cache.set(key, post_ids, getattr(settings, 'BLOG_SEARCH_CACHE_TIMEOUT', 60 * 5))
+    return post_ids
+
+
+def index_post(post):
+    get_backend().index(post)
+    # До коммита другие запросы видят старый индекс - и старый кэш
+    transaction.on_commit(bump_search_version)
+
+
+def remove_post(post_id):
+    get_backend().remove(post_id)
+    transaction.on_commit(bump_search_version)
+
+
+def rebuild_search_index(chunk_size=500):
+    """Пересобирает индекс по всем постам порциями; возвращает число постов"""
+    from .models import Post
+
+    backend = get_backend()
+    posts = Post.objects.only('id', 'title', 'short_description', 'content').order_by('pk')
+    count = 0
+
+    with transaction.atomic():
+        backend.clear()
+        chunk = []
+        for post in posts.iterator(chunk_size=chunk_size):
+            chunk.append(post)
+            if len(chunk) >= chunk_size:
+                backend.index_many(chunk)
+                count += len(chunk)
+                chunk = []
+        backend.index_many(chunk)
+        count += len(chunk)
+        transaction.on_commit(bump_search_version)
+
+    return count
@@ -0,0 +1,26 @@
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from .models import Post
+from .search import index_post, remove_post
+from web_restaurant.pagination import bump_count_version
+
+
+@receiver(post_save, sender=Post)
+def post_saved_index(sender, instance, **kwargs):
+    """
+    Пост переиндексируется при каждом сохранении (поиск - blog/search.py)
+    """
+    index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted_index(sender, instance, **kwargs):
+    remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_changed_counts(sender, **kwargs):
+    """Публикация, удаление или смена тегов меняют число постов в списках"""
+    bump_count_version(Post)
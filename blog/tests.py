@@ -1,3 +1,140 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .models import Post, Tag
+from .search import SEARCH_VERSION_KEY, search_post_ids, stem_words
+from web_restaurant.cache_versions import get_version
+from web_restaurant.pagination import cached_count
 
-# Create your tests here.
+
+class PostSearchTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user('author')
+
+    def create_post(self, title, content='', short_description='', **fields):
+        return Post.objects.create(
+            title=title,
+            content=content,
+            short_description=short_description,
+            author=self.author,
+            image='blog_images/test.jpg',
+            **fields,
+        )
+
+    def test_stemming_russian_and_english(self):
+        self.assertEqual(stem_words('Супы'), stem_words('суп'))
+        self.assertEqual(stem_words('Recipes'), stem_words('recipe'))
+
+        soup = self.create_post('Суп дня', content='Готовим суп из тыквы')
+        recipe = self.create_post('Chef recipe', content='A simple recipe for bread')
+
+        self.assertEqual(search_post_ids('супы'), [soup.id])
+        self.assertEqual(search_post_ids('RECIPES'), [recipe.id])
+        self.assertEqual(search_post_ids('суп recipe'), [])
+
+    def test_title_ranks_above_content(self):
+        in_content = self.create_post('Season news', content='Our new pasta menu')
+        in_title = self.create_post('Pasta week', content='Fresh dishes')
+
+        self.assertEqual(search_post_ids('pasta'), [in_title.id, in_content.id])
+
+    def test_index_follows_post_changes(self):
+        post = self.create_post('Tiramisu', content='Dessert')
+        hidden = self.create_post('Tiramisu secrets', is_published=False)
+        self.assertEqual(search_post_ids('tiramisu'), [post.id])
+
+        version = get_version(SEARCH_VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.title = 'Panna cotta'
+            post.save()
+            # Кэш сбрасывается только после коммита
+            self.assertEqual(get_version(SEARCH_VERSION_KEY), version)
+        self.assertEqual(search_post_ids('tiramisu'), [])
+        self.assertEqual(search_post_ids('panna'), [post.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hidden.is_published = True
+            hidden.save()
+        self.assertEqual(search_post_ids('tiramisu'), [hidden.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hidden.delete()
+        self.assertEqual(search_post_ids('tiramisu'), [])
+
+    def test_list_and_tag_pages_paginate_ranked_results(self):
+        tag = Tag.objects.create(name='Wine')
+        posts = [self.create_post(f'Wine pairing {index}', content='wine') for index in range(8)]
+        other = self.create_post('Wine list', content='wine')
+        for post in posts:
+            post.tags.add(tag)
+
+        response = self.client.get(reverse('blog:list'), {'q': 'wines', 'page': 2})
+        self.assertEqual(response.context['posts'].paginator.count, 9)
+        self.assertEqual(len(response.context['posts']), 3)
+
+        response = self.client.get(reverse('blog:posts_by_tag', args=[tag.slug]), {'q': 'wine'})
+        self.assertEqual(response.context['posts'].paginator.count, 8)
+        self.assertNotIn(other, response.context['posts'])
+
+
+class PostPaginationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user('author')
+        self.tag = Tag.objects.create(name='News')
+        Post.objects.bulk_create([
+            Post(title=f'Post {number}', content='-', short_description='-', author=author, image='blog_images/test.jpg')
+            for number in range(14)
+        ])
+        # Одинаковое время создания: порядок внутри решает id
+        Post.objects.update(created_at=timezone.now())
+        self.expected = list(Post.objects.values_list('title', flat=True))
+
+    def titles(self, response):
+        return [post.title for post in response.context['posts']]
+
+    def test_cursor_pages_forward_and_back(self):
+        url = reverse('blog:list')
+        pages = []
+        while url:
+            response = self.client.get(url)
+            pages.append(self.titles(response))
+            self.assertEqual(response.context['pagination']['count'], 14)
+            url = response.context['pagination']['next_url']
+        self.assertEqual([title for page in pages for title in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [6, 6, 2])
+
+        back = self.client.get(response.context['pagination']['previous_url'])
+        self.assertEqual(self.titles(back), pages[1])
+        first = self.client.get(back.context['pagination']['previous_url'])
+        self.assertEqual(self.titles(first), pages[0])
+        self.assertIsNone(first.context['pagination']['previous_url'])
+
+    def test_page_numbers_redirect_to_cursor(self):
+        url = reverse('blog:list')
+        response = self.client.get(url, {'page': 2})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.titles(self.client.get(response.url)), self.expected[6:12])
+
+        # Номер за пределами - последняя страница, не число - первая
+        self.assertEqual(self.titles(self.client.get(url, {'page': 99}, follow=True)), self.expected[12:])
+        self.assertRedirects(self.client.get(url, {'page': 'x'}), url)
+
+    def test_count_is_cached_until_publish(self):
+        self.client.get(reverse('blog:list'))
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_count(Post.objects.filter(is_published=True)), 14)
+
+        post = Post.objects.first()
+        post.tags.add(self.tag)
+        post.is_published = False
+        post.save()
+        self.assertEqual(cached_count(Post.objects.filter(is_published=True)), 13)
+
+        response = self.client.get(reverse('blog:posts_by_tag', args=[self.tag.slug]))
+        self.assertEqual(response.context['pagination']['count'], 0)
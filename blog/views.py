@@ -1,38 +1,86 @@
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.db.models import Q
+from django.http import HttpResponseRedirect
 from django.shortcuts import render, get_object_or_404
 from .models import Post, Tag
+from .search import search_post_ids
+from web_restaurant.page_cache import anonymous_page_cache
+from web_restaurant.pagination import page_url, paginate, redirect_to_cursor
 
+POSTS_PER_PAGE = 6
 
-def blog_list(request):
-    # Инициализируем переменные
-    posts = Post.objects.filter(is_published=True).select_related('author').prefetch_related('tags').order_by('-created_at')
-
-    query = request.GET.get('q', '')
-    if query:
-        posts = posts.filter(
-            Q(title__icontains=query) |
-            Q(short_description__icontains=query) |
-            Q(content__icontains=query)
-        )
+# Порядок списка постов; совпадает с индексом blog_post_published_idx
+POST_ORDERING = ['-created_at', 'id']
 
-    best_posts = Post.objects.filter(is_published=True, is_best=True).select_related('author').order_by('-created_at')[:3]
-    all_tags = Tag.objects.all()
-    # Пагинация
-    paginator = Paginator(posts, 6)
-    page = request.GET.get('page')
 
+def get_page(paginator, page):
     try:
-        posts = paginator.page(page)
+        return paginator.page(page)
     except PageNotAnInteger:
         # Если page не число, показываем первую страницу
-        posts = paginator.page(1)
+        return paginator.page(1)
     except EmptyPage:
         # Если page вне диапазона, показываем последнюю страницу
-        posts = paginator.page(paginator.num_pages)
+        return paginator.page(paginator.num_pages)
+
+
+def paginate_posts(request, posts, query, tag=None):
+    """
+    Страница постов с учетом поиска
+
+    Поиск идет по полнотекстовому индексу (blog/search.py): пагинируется
+    закэшированный список id по релевантности, из базы загружаются только
+    посты текущей страницы. Без поиска (или если индекс на этой базе
+    недоступен - с прежним фильтром icontains) страница выбирается по
+    курсору (web_restaurant/pagination.py), без COUNT и OFFSET на
+    каждой странице; старые ссылки ?page=N переадресуются на курсор.
+
+    Returns:
+        (страница, ссылки на соседние страницы) или переадресация
+    """
+    post_ids = search_post_ids(query, tag_id=tag.id if tag else None) if query else None
+
+    if post_ids is None:
+        if query:
+            posts = posts.filter(
+                Q(title__icontains=query) |
+                Q(short_description__icontains=query) |
+                Q(content__icontains=query)
+            )
+        redirect = redirect_to_cursor(request, posts, POST_ORDERING, POSTS_PER_PAGE)
+        if redirect is not None:
+            return redirect
+        return paginate(request, posts, POST_ORDERING, POSTS_PER_PAGE)
+
+    page = get_page(Paginator(post_ids, POSTS_PER_PAGE), request.GET.get('page'))
+    by_id = posts.in_bulk(page.object_list)
+    page.object_list = [by_id[post_id] for post_id in page.object_list if post_id in by_id]
+    return page, {
+        'count': page.paginator.count,
+        'previous_url': page_url(request, page=page.previous_page_number()) if page.has_previous() else None,
+        'next_url': page_url(request, page=page.next_page_number()) if page.has_next() else None,
+    }
+
+
+@anonymous_page_cache(params=('q', 'page', 'after', 'before'))
+def blog_list(request):
+    # Инициализируем переменные
+    posts = Post.objects.filter(is_published=True).select_related('author').prefetch_related('tags')
+
+    query = request.GET.get('q', '')
+
+    # Пагинация (и поиск)
+    result = paginate_posts(request, posts, query)
+    if isinstance(result, HttpResponseRedirect):
+        return result
+    posts, pagination = result
+
+    best_posts = Post.objects.filter(is_published=True, is_best=True).select_related('author').order_by('-created_at')[:3]
+    all_tags = Tag.objects.all()
 
     context = {
         'posts': posts,
+        'pagination': pagination,
         'best_posts': best_posts,
         'all_tags': all_tags,
         'query': query,
@@ -51,7 +99,13 @@ def posts_by_tag(request, tag_slug):
     posts = Post.objects.filter(
         is_published=True,
         tags=tag
-    ).select_related('author').prefetch_related('tags').order_by('-created_at')
+    ).select_related('author').prefetch_related('tags')
+
+    # Пагинация с дополнительным фильтром по поиску
+    result = paginate_posts(request, posts, query, tag=tag)
+    if isinstance(result, HttpResponseRedirect):
+        return result
+    posts, pagination = result
 
     best_posts = Post.objects.filter(
         is_published=True,
@@ -60,26 +114,9 @@ def posts_by_tag(request, tag_slug):
 
     all_tags = Tag.objects.all()
 
-    # Дополнительный фильтр по поиску
-    if query:
-        posts = posts.filter(
-            Q(title__icontains=query) |
-            Q(short_description__icontains=query) |
-            Q(content__icontains=query)
-        )
-
-    paginator = Paginator(posts, 6)
-    page = request.GET.get('page')
-
-    try:
-        posts = paginator.page(page)
-    except PageNotAnInteger:
-        posts = paginator.page(1)
-    except EmptyPage:
-        posts = paginator.page(paginator.num_pages)
-
     context = {
         'posts': posts,
+        'pagination': pagination,
         'best_posts': best_posts,
         'all_tags': all_tags,
         'current_tag': tag,  # текущий выбранный тег
@@ -88,6 +125,7 @@ def posts_by_tag(request, tag_slug):
     return render(request, 'blog/list.html', context)
 
 
+@anonymous_page_cache
 def blog_detail(request, post_id):
     # Получаем пост или 404
     post = get_object_or_404(
@@ -15,7 +15,12 @@ class Event(models.Model):
     class Meta:
         verbose_name = "События"
         verbose_name_plural = "События"
-        ordering = ['-date']
+        ordering = ['-date', 'id']
+        indexes = [
+            # Постраничный вывод событий по ключу (events/views.py): частичный
+            # индекс только по активным событиям
+            models.Index(fields=['-date', 'id'], condition=models.Q(is_active=True), name='events_event_active_idx'),
+        ]
 
     def __str__(self):
         return self.title
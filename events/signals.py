@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Event
+from web_restaurant.pagination import bump_count_version
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def event_changed_counts(sender, **kwargs):
+    """Новое, удаленное или скрытое событие меняет число событий в списке"""
+    bump_count_version(Event)
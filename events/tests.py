@@ -1,3 +1,42 @@
+import datetime
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from .models import Event
+
+
+class EventPaginationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        today = datetime.date(2026, 10, 1)
+        Event.objects.bulk_create([
+            Event(
+                title=f'Event {number}', description='-', location='Hall', start_time=datetime.time(19),
+                date=today - datetime.timedelta(days=number // 2), image='event_images/test.jpg',
+                is_active=number != 3,
+            )
+            for number in range(8)
+        ])
+
+    def test_cursor_pages_and_legacy_page_numbers(self):
+        expected = list(Event.objects.filter(is_active=True).values_list('title', flat=True))
+        titles = []
+        url = reverse('events:list')
+        while url:
+            response = self.client.get(url)
+            titles.extend(event.title for event in response.context['events'])
+            url = response.context['pagination']['next_url']
+        self.assertEqual(titles, expected)
+        self.assertEqual(response.context['pagination']['count'], 7)
+
+        # Та же страница по старой ссылке (мимо кэша страниц)
+        cache.clear()
+        response = self.client.get(reverse('events:list'), {'page': 3}, follow=True)
+        self.assertEqual([event.title for event in response.context['events']], expected[6:])
 
-# Create your tests here.
+        # Скрытое событие сбрасывает счетчик
+        Event.objects.filter(is_active=True).first().delete()
+        response = self.client.get(reverse('events:list'))
+        self.assertEqual(response.context['pagination']['count'], 6)
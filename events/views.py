@@ -1,22 +1,25 @@
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.shortcuts import render
 from .models import Event
+from web_restaurant.page_cache import anonymous_page_cache
+from web_restaurant.pagination import paginate, redirect_to_cursor
 
+EVENTS_PER_PAGE = 3
 
+# Порядок списка событий; совпадает с индексом events_event_active_idx
+EVENT_ORDERING = ['-date', 'id']
+
+
+@anonymous_page_cache(params=('page', 'after', 'before'))
 def events_list(request):
-    events = Event.objects.filter(is_active=True).order_by('-date')
+    events = Event.objects.filter(is_active=True)
 
-    paginator = Paginator(events, 3)
-    page = request.GET.get('page')
+    # Старые ссылки ?page=N ведут на ту же страницу с курсором
+    redirect = redirect_to_cursor(request, events, EVENT_ORDERING, EVENTS_PER_PAGE)
+    if redirect is not None:
+        return redirect
 
-    try:
-        events = paginator.page(page)
-    except PageNotAnInteger:
-        events = paginator.page(1)
-    except EmptyPage:
-        events = paginator.page(paginator.num_pages)
+    events, pagination = paginate(request, events, EVENT_ORDERING, EVENTS_PER_PAGE)
 
-    context = {'events': events, 'paginator': paginator}
+    context = {'events': events, 'pagination': pagination}
 
     return render(request, 'events/list.html', context)
-
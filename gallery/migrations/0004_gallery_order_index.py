@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0003_galleryimage_full_image'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='galleryimage',
+            options={'ordering': ['order', '-created_at', 'id'], 'verbose_name': 'Галерея', 'verbose_name_plural': 'Галерея'},
+        ),
+        migrations.AddIndex(
+            model_name='galleryimage',
+            index=models.Index(fields=['order', '-created_at', 'id'], name='gallery_order_created_idx'),
+        ),
+    ]
@@ -12,7 +12,11 @@ class GalleryImage(models.Model):
     class Meta:
         verbose_name = "Галерея"
         verbose_name_plural = "Галерея"
-        ordering = ['order', '-created_at']
+        ordering = ['order', '-created_at', 'id']
+        indexes = [
+            # Постраничный вывод галереи по ключу (gallery/views.py)
+            models.Index(fields=['order', '-created_at', 'id'], name='gallery_order_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
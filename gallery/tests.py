@@ -1,3 +1,65 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .models import GalleryImage
+from .views import GALLERY_ORDERING
+from web_restaurant.pagination import keyset_page
+
+
+@override_settings(GALLERY_PAGE_SIZE=4)
+class GalleryPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        GalleryImage.objects.bulk_create([
+            GalleryImage(title=f'Photo {number}', image=f'gallery_image/{number}.jpg', order=number % 2)
+            for number in range(11)
+        ])
+        # Одинаковые order и created_at: порядок внутри решает id
+        GalleryImage.objects.update(created_at=now)
+        GalleryImage.objects.filter(title__in=['Photo 1', 'Photo 2']).update(
+            created_at=now - datetime.timedelta(microseconds=1),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_follow_model_ordering(self):
+        expected = list(GalleryImage.objects.values_list('id', flat=True))
+        seen = []
+        cursor = None
+        while True:
+            page = keyset_page(GalleryImage.objects.all(), GALLERY_ORDERING, cursor, per_page=3)
+            seen.extend(image.id for image in page.items)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+
+    def test_first_page_and_json_endpoint(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('gallery:list'))
+        self.assertEqual(len(response.context['images']), 4)
+        cursor = response.context['next_cursor']
+        self.assertContains(response, f'data-cursor="{cursor}"')
+
+        titles = [image.title for image in response.context['images']]
+        while cursor:
+            data = self.client.get(reverse('gallery:images'), {'cursor': cursor}).json()
+            self.assertTrue(data['success'])
+            titles.extend(image['title'] for image in data['images'])
+            cursor = data['next_cursor']
+
+        self.assertEqual(titles, list(GalleryImage.objects.values_list('title', flat=True)))
+        image = data['images'][0]
+        self.assertEqual(image['thumbnail']['src'], f'/media/{GalleryImage.objects.get(title=image["title"]).image}')
+        self.assertEqual(image['full'], '/media/gallery_image/default.png')
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-a-cursor', 'WzFd'):
+            response = self.client.get(reverse('gallery:images'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
@@ -5,4 +5,5 @@ app_name = 'gallery'
 
 urlpatterns = [
     path('', views.gallery_list, name='list'),
+    path('images/', views.gallery_images, name='images'),
 ]
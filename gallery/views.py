@@ -1,8 +1,67 @@
+from django.conf import settings
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_GET
 from .models import GalleryImage
+from images.derivatives import picture_data
+from images.templatetags.responsive_images import DEFAULT_SRC_WIDTH, image_url
+from web_restaurant.page_cache import anonymous_page_cache
+from web_restaurant.pagination import keyset_page
 
+# Порядок вывода; совпадает с индексом gallery_order_created_idx
+GALLERY_ORDERING = ['order', '-created_at', 'id']
 
+# Ширина миниатюры в сетке галереи (атрибут sizes)
+THUMBNAIL_SIZES = '(max-width: 767px) 50vw, (max-width: 991px) 33vw, 20vw'
+
+
+def gallery_page(cursor=None):
+    """
+    Страница галереи после курсора - один запрос с LIMIT по индексу
+
+    Raises:
+        ValueError: поврежденный курсор
+    """
+    images = GalleryImage.objects.only('id', 'title', 'image', 'full_image', 'order', 'created_at')
+    return keyset_page(images, GALLERY_ORDERING, cursor, getattr(settings, 'GALLERY_PAGE_SIZE', 15))
+
+
+@anonymous_page_cache
 def gallery_list(request):
-    images = GalleryImage.objects.all()
-    context = {'images': images}
+    page = gallery_page()
+    context = {
+        'images': page.items,
+        'next_cursor': page.next_cursor,
+        'thumbnail_sizes': THUMBNAIL_SIZES,
+    }
     return render(request, 'gallery/list.html', context)
+
+
+@require_GET
+@anonymous_page_cache(params=('cursor',))
+def gallery_images(request):
+    """
+    Следующая страница галереи для подгрузки при прокрутке (JSON)
+
+    URL миниатюр и полноразмерных копий берутся из манифеста копий
+    (images/derivatives.py), ответ кэшируется как страница.
+    """
+    try:
+        page = gallery_page(request.GET.get('cursor'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'sizes': THUMBNAIL_SIZES,
+        'images': [
+            {
+                'id': image.id,
+                'title': image.title,
+                'thumbnail': picture_data(image.image, DEFAULT_SRC_WIDTH),
+                'full': image_url(image.full_image, 1600),
+            }
+            for image in page.items
+        ],
+        'next_cursor': page.next_cursor,
+    })
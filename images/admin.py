@@ -0,0 +1,25 @@
+from django.contrib import admin
+from django.utils.html import format_html
+from .derivatives import get_image_info
+from .models import ResponsiveImage
+
+
+@admin.register(ResponsiveImage)
+class ResponsiveImageAdmin(admin.ModelAdmin):
+    """Копии создаются фоновой задачей и командой generate_image_derivatives - только просмотр"""
+    list_display = ['preview', 'source', 'width', 'height', 'widths', 'formats', 'source_size', 'updated_at']
+    search_fields = ['source', 'content_hash']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def preview(self, obj):
+        info = get_image_info(obj.source)
+        if info is None:
+            return None
+        return format_html('<img src="{}" alt="" width="50">', info.url(info.widths[0], info.fallback_format))
+
+    preview.short_description = 'Превью'
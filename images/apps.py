@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class ImagesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'images'
+    verbose_name = 'Адаптивные изображения'
+
+    def ready(self):
+        # Импортируем signals при запуске приложения
+        import images.signals  # noqa
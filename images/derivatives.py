@@ -0,0 +1,339 @@
+"""
+Уменьшенные копии загруженных изображений для srcset.
+
+Для каждого исходника (фото блюд, галерея, повара, события, отзывы,
+блог) один раз создаются копии фиксированных ширин
+(IMAGE_DERIVATIVE_WIDTHS, не больше ширины оригинала) в форматах
+IMAGE_DERIVATIVE_FORMATS: AVIF и WebP для современных браузеров и JPEG
+(PNG для картинок с прозрачностью) как запасной вариант.
+
+Копии лежат по пути с хэшем содержимого:
+derivatives/<хэш[:2]>/<хэш>/<ширина>.<формат>. Содержимое файла по
+такому пути определяется исходником, поэтому его можно кэшировать
+надолго, а один и тот же исходник под разными именами (default.png у
+многих блюд) кодируется один раз.
+
+Копии создает фоновая задача (images/signals.py) или команда
+generate_image_derivatives. Шаблоны узнают о готовых копиях из
+манифеста: {имя исходника: ImageInfo}, который хранится в общем кэше
+и в памяти процесса с версией, как снимок меню.
+"""
+import hashlib
+import io
+import threading
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models
+from PIL import Image, ImageOps
+from web_restaurant.cache_versions import bump_version, get_version
+
+DERIVATIVES_DIR = 'derivatives'
+
+MANIFEST_VERSION_KEY = 'images:manifest:version'
+MANIFEST_KEY = 'images:manifest:{version}'
+
+# Формат → (формат Pillow, MIME-тип, расширение файла)
+FORMATS = {
+    'avif': ('AVIF', 'image/avif', 'avif'),
+    'webp': ('WEBP', 'image/webp', 'webp'),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+    'png': ('PNG', 'image/png', 'png'),
+}
+
+DEFAULT_WIDTHS = (160, 320, 480, 768, 1024, 1600)
+DEFAULT_FORMATS = ('avif', 'webp', 'jpeg')
+DEFAULT_QUALITY = {'avif': 55, 'webp': 78, 'jpeg': 80}
+
+EXIF_ORIENTATION = 0x0112
+
+# Копия манифеста в памяти процесса: (версия, манифест)
+_local_manifest = None
+_build_lock = threading.Lock()
+
+# Один поток на одно содержимое: одинаковые исходники в пуле потоков
+# команды не пишут одни и те же файлы одновременно
+_content_locks = {}
+_content_locks_guard = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ImageInfo:
+    content_hash: str
+    width: int
+    height: int
+    widths: tuple
+    formats: tuple
+
+    @property
+    def fallback_format(self):
+        """Формат для <img>: последний в списке (JPEG или PNG)"""
+        return self.formats[-1]
+
+    def url(self, width, fmt):
+        return default_storage.url(derivative_name(self.content_hash, width, fmt))
+
+    def srcset(self, fmt):
+        return ', '.join(f'{self.url(width, fmt)} {width}w' for width in self.widths)
+
+    def closest_width(self, width):
+        """Наименьшая копия не уже width (или самая широкая)"""
+        for candidate in self.widths:
+            if candidate >= width:
+                return candidate
+        return self.widths[-1]
+
+    def height_for(self, width):
+        return round(self.height * width / self.width)
+
+
+def derivative_name(content_hash, width, fmt):
+    return f'{DERIVATIVES_DIR}/{content_hash[:2]}/{content_hash}/{width}.{FORMATS[fmt][2]}'
+
+
+def target_widths(original_width):
+    """Ширины копий: все настроенные меньше оригинала плюс сам оригинал (не шире максимума)"""
+    widths = sorted(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', DEFAULT_WIDTHS))
+    largest = min(original_width, widths[-1])
+    return [width for width in widths if width < largest] + [largest]
+
+
+def target_formats(image):
+    """Форматы копий; у картинок с прозрачностью запасной формат - PNG"""
+    formats = list(getattr(settings, 'IMAGE_DERIVATIVE_FORMATS', DEFAULT_FORMATS))
+    if has_alpha(image) and 'jpeg' in formats:
+        formats[formats.index('jpeg')] = 'png'
+    return formats
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def encode(image, fmt):
+    """Копия в байтах; JPEG без прозрачности, остальные форматы сохраняют альфа-канал"""
+    pillow_format = FORMATS[fmt][0]
+    quality = getattr(settings, 'IMAGE_DERIVATIVE_QUALITY', DEFAULT_QUALITY)
+    options = {}
+    if fmt == 'jpeg':
+        image = image.convert('RGB')
+        options = {'quality': quality.get(fmt, 80), 'optimize': True, 'progressive': True}
+    elif fmt == 'webp':
+        options = {'quality': quality.get(fmt, 78), 'method': 6}
+    elif fmt == 'avif':
+        options = {'quality': quality.get(fmt, 55)}
+    elif fmt == 'png':
+        options = {'optimize': True}
+
+    buffer = io.BytesIO()
+    image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def _content_lock(content_hash):
+    with _content_locks_guard:
+        return _content_locks.setdefault(content_hash, threading.Lock())
+
+
+def render_derivatives(name, storage=default_storage, force=False):
+    """
+    Создает недостающие файлы копий исходника name (без обращения к базе)
+
+    Копии с тем же содержимым уже могли появиться от другого исходника:
+    такие файлы не создаются заново, а исходник декодируется, только
+    если какой-то копии не хватает.
+
+    Args:
+        force: перезаписать существующие копии (после смены настроек)
+
+    Returns:
+        поля ResponsiveImage
+
+    Raises:
+        FileNotFoundError: исходника нет в хранилище
+        PIL.UnidentifiedImageError: файл не является изображением
+    """
+    with storage.open(name, 'rb') as source:
+        data = source.read()
+    content_hash = hashlib.sha256(data).hexdigest()[:32]
+
+    with _content_lock(content_hash), Image.open(io.BytesIO(data)) as original:
+        # Размер известен без декодирования; поворот из EXIF меняет стороны местами
+        width, height = original.size
+        if original.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+            width, height = height, width
+
+        widths = target_widths(width)
+        formats = target_formats(original)
+        missing = {
+            (target_width, fmt)
+            for target_width in widths
+            for fmt in formats
+            if force or not storage.exists(derivative_name(content_hash, target_width, fmt))
+        }
+
+        if missing:
+            # Фото с телефона хранят поворот в EXIF; копии делаем уже повернутыми
+            image = ImageOps.exif_transpose(original)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if has_alpha(image) else 'RGB')
+
+            for target_width in widths:
+                resized = image
+                if target_width < width:
+                    resized = image.resize(
+                        (target_width, round(height * target_width / width)),
+                        Image.Resampling.LANCZOS,
+                        reducing_gap=3.0,
+                    )
+                for fmt in formats:
+                    if (target_width, fmt) not in missing:
+                        continue
+                    path = derivative_name(content_hash, target_width, fmt)
+                    if storage.exists(path):
+                        storage.delete(path)
+                    storage.save(path, ContentFile(encode(resized, fmt)))
+
+    return {
+        'source': name,
+        'content_hash': content_hash,
+        'source_size': len(data),
+        'width': width,
+        'height': height,
+        'widths': widths,
+        'formats': formats,
+    }
+
+
+def save_responsive_image(fields):
+    """Запоминает копии исходника в ResponsiveImage"""
+    from .models import ResponsiveImage
+
+    fields = dict(fields)
+    responsive, _ = ResponsiveImage.objects.update_or_create(source=fields.pop('source'), defaults=fields)
+    return responsive
+
+
+def generate_derivatives(name, storage=default_storage, force=False):
+    """Создает копии исходника name и запоминает их; возвращает ResponsiveImage"""
+    return save_responsive_image(render_derivatives(name, storage, force))
+
+
+def build_manifest():
+    """Манифест из базы одним запросом: {имя исходника: ImageInfo}"""
+    from .models import ResponsiveImage
+
+    return {
+        source: ImageInfo(
+            content_hash=content_hash,
+            width=width,
+            height=height,
+            widths=tuple(widths),
+            formats=tuple(formats),
+        )
+        for source, content_hash, width, height, widths, formats in ResponsiveImage.objects.values_list(
+            'source', 'content_hash', 'width', 'height', 'widths', 'formats',
+        )
+    }
+
+
+def bump_manifest_version():
+    """Новые или удаленные копии: манифест нужно перечитать"""
+    return bump_version(MANIFEST_VERSION_KEY)
+
+
+def get_manifest():
+    """
+    Текущий манифест копий
+
+    Порядок поиска: память процесса → общий кэш → сборка из базы.
+    """
+    global _local_manifest
+
+    version = get_version(MANIFEST_VERSION_KEY)
+    local = _local_manifest
+    if local is not None and local[0] == version:
+        return local[1]
+
+    with _build_lock:
+        local = _local_manifest
+        if local is not None and local[0] == version:
+            return local[1]
+
+        key = MANIFEST_KEY.format(version=version)
+        manifest = cache.get(key)
+        if manifest is None:
+            manifest = build_manifest()
+            cache.set(key, manifest, getattr(settings, 'IMAGE_MANIFEST_TIMEOUT', 60 * 60 * 24))
+
+        _local_manifest = (version, manifest)
+        return manifest
+
+
+def source_name(image):
+    """
+    Имя файла в хранилище для FieldFile, ImageRef из снимка меню, URL
+    из MEDIA_URL или самого имени
+    """
+    if not image:
+        return None
+    name = getattr(image, 'name', None)
+    if name:
+        return name
+
+    url = str(getattr(image, 'url', image))
+    return url[len(settings.MEDIA_URL):] if url.startswith(settings.MEDIA_URL) else url
+
+
+def get_image_info(image):
+    """ImageInfo готовых копий изображения или None"""
+    name = source_name(image)
+    return get_manifest().get(name) if name else None
+
+
+def original_url(image):
+    try:
+        return image.url
+    except (AttributeError, ValueError):
+        return str(image or '')
+
+
+def picture_data(image, src_width):
+    """
+    URL копий изображения для <picture>, собираемого на клиенте (JSON)
+
+    Returns:
+        {'src', 'srcset', 'sources': [{'type', 'srcset'}]}; пока копий
+        нет - только src оригинала
+    """
+    info = get_image_info(image)
+    if info is None:
+        return {'src': original_url(image), 'srcset': '', 'sources': []}
+
+    fallback = info.fallback_format
+    return {
+        'src': info.url(info.closest_width(int(src_width)), fallback),
+        'srcset': info.srcset(fallback),
+        'sources': [
+            {'type': FORMATS[fmt][1], 'srcset': info.srcset(fmt)}
+            for fmt in info.formats if fmt != fallback
+        ],
+    }
+
+
+def image_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, models.ImageField)]
+
+
+def referenced_images(models):
+    """Имена всех изображений, на которые ссылаются записи models"""
+    names = set()
+    for model in models:
+        for field in image_fields(model):
+            names.update(
+                name for name in model.objects.values_list(field.attname, flat=True).distinct() if name
+            )
+    return names
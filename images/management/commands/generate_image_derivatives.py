@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from PIL import UnidentifiedImageError
+from images.derivatives import (
+    bump_manifest_version, get_manifest, referenced_images, render_derivatives, save_responsive_image,
+)
+from images.models import ResponsiveImage
+from images.signals import IMAGE_MODELS
+from web_restaurant.page_cache import bump_page_cache_version
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии (AVIF/WebP/JPEG) для всех изображений сайта'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать копии и для уже обработанных файлов')
+        parser.add_argument('--workers', type=int, default=4, help='Потоков (Pillow кодирует без GIL)')
+
+    def handle(self, *args, **options):
+        names = sorted(referenced_images(apps.get_model(label) for label in IMAGE_MODELS))
+        if not options['force']:
+            manifest = get_manifest()
+            names = [name for name in names if name not in manifest]
+
+        started = time.perf_counter()
+        failed = 0
+        # Кодирование в потоках, запись в базу - в основном потоке
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            results = executor.map(lambda name: self.render(name, options['force']), names)
+            for name, fields, error in results:
+                if error:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'{name}: {error}'))
+                else:
+                    save_responsive_image(fields)
+
+        bump_manifest_version()
+        bump_page_cache_version()
+
+        images = ResponsiveImage.objects.filter(source__in=names)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {len(names) - failed} из {len(names)} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
+        if images:
+            self.stdout.write(f'Уникальных по содержимому: {len({image.content_hash for image in images})}')
+
+    def render(self, name, force):
+        try:
+            return name, render_derivatives(name, force=force), None
+        except (FileNotFoundError, UnidentifiedImageError) as e:
+            return name, None, e
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResponsiveImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True, verbose_name='Исходный файл')),
+                ('content_hash', models.CharField(db_index=True, max_length=64, verbose_name='Хэш содержимого')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+                ('widths', models.JSONField(default=list, verbose_name='Ширины копий')),
+                ('formats', models.JSONField(default=list, verbose_name='Форматы')),
+                ('source_size', models.PositiveIntegerField(default=0, verbose_name='Размер исходника (байт)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Адаптивное изображение',
+                'verbose_name_plural': 'Адаптивные изображения',
+                'ordering': ['source'],
+            },
+        ),
+    ]
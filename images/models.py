@@ -0,0 +1,26 @@
+from django.db import models
+
+
+class ResponsiveImage(models.Model):
+    """
+    Готовые уменьшенные копии одного загруженного изображения
+
+    Файлы лежат в derivatives/<хэш>/<ширина>.<формат> (см. images/derivatives.py),
+    поэтому одинаковые исходники используют одни и те же копии.
+    """
+    source = models.CharField('Исходный файл', max_length=255, unique=True)
+    content_hash = models.CharField('Хэш содержимого', max_length=64, db_index=True)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    widths = models.JSONField('Ширины копий', default=list)
+    formats = models.JSONField('Форматы', default=list)
+    source_size = models.PositiveIntegerField('Размер исходника (байт)', default=0)
+    updated_at = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Адаптивное изображение'
+        verbose_name_plural = 'Адаптивные изображения'
+        ordering = ['source']
+
+    def __str__(self):
+        return self.source
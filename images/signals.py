@@ -0,0 +1,68 @@
+import logging
+
+from django.apps import apps
+from django.db.models.signals import post_save
+from notifications.jobs import enqueue, job, make_job
+from PIL import UnidentifiedImageError
+from web_restaurant.page_cache import bump_page_cache_version
+from .derivatives import bump_manifest_version, generate_derivatives, get_manifest, image_fields
+
+logger = logging.getLogger(__name__)
+
+# Модели, для изображений которых создаются уменьшенные копии
+IMAGE_MODELS = (
+    'menu.MenuItem',
+    'menu.Category',
+    'gallery.GalleryImage',
+    'chefs.Chef',
+    'events.Event',
+    'reviews.Review',
+    'blog.Post',
+)
+
+
+@job('images.derivatives', batch=True)
+def generate_image_derivatives(payloads):
+    """
+    Задача очереди: копии новых изображений, затем сброс манифеста и
+    кэша страниц (один раз на пачку)
+    """
+    for name in sorted({payload['source'] for payload in payloads}):
+        try:
+            generate_derivatives(name)
+        except (FileNotFoundError, UnidentifiedImageError) as e:
+            # Повторять бессмысленно: файла нет или это не изображение
+            logger.warning('Не удалось создать копии %s: %s', name, e)
+
+    bump_manifest_version()
+    bump_page_cache_version()
+
+
+def enqueue_derivatives(names):
+    """Ставит в очередь изображения, для которых еще нет копий"""
+    manifest = get_manifest()
+    jobs = [
+        make_job('images.derivatives', f'image:{name}', source=name)
+        for name in names
+        if name and name not in manifest
+    ]
+    if jobs:
+        enqueue(*jobs)
+
+
+def image_saved(sender, instance, **kwargs):
+    """
+    Загружено новое изображение: копии создаст run_jobs
+
+    Пока копий нет, шаблоны выводят оригинал. Картинки по умолчанию
+    (default.png) не загружаются, их обрабатывает generate_image_derivatives.
+    """
+    enqueue_derivatives(
+        getattr(instance, field.attname).name
+        for field in image_fields(sender)
+        if getattr(instance, field.attname).name != field.default
+    )
+
+
+for label in IMAGE_MODELS:
+    post_save.connect(image_saved, sender=apps.get_model(label), dispatch_uid=f'images:{label}')
@@ -0,0 +1,62 @@
+"""
+Вывод изображений с уменьшенными копиями (images/derivatives.py).
+
+    {% load responsive_images %}
+    {% responsive_image item.image_dish alt=item.name sizes="(max-width: 767px) 100vw, 370px" %}
+    <a href="{{ image.full_image|image_url:1600 }}">
+
+Пока копий нет (новая картинка еще в очереди), выводится оригинал.
+"""
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+from images.derivatives import FORMATS, get_image_info, original_url
+
+register = template.Library()
+
+# Ширина копии для src у <img> (браузеры без srcset)
+DEFAULT_SRC_WIDTH = 480
+
+
+@register.simple_tag
+def responsive_image(image, sizes='100vw', src_width=DEFAULT_SRC_WIDTH, **attrs):
+    """
+    <picture> с AVIF/WebP/JPEG в srcset
+
+    Args:
+        image: FieldFile, ImageRef из снимка меню или URL из MEDIA_URL
+        sizes: атрибут sizes - ширина картинки в макете
+        src_width: ширина копии для src у <img>
+        attrs: атрибуты <img> (alt, class, style...); loading="lazy" по умолчанию
+    """
+    attrs.setdefault('alt', '')
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+
+    info = get_image_info(image)
+    if info is None:
+        return format_html('<img src="{}"{}>', original_url(image), flatatt(attrs))
+
+    fallback = info.fallback_format
+    sources = format_html_join(
+        '',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        ((FORMATS[fmt][1], info.srcset(fmt), sizes) for fmt in info.formats if fmt != fallback),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        sources,
+        info.url(info.closest_width(int(src_width)), fallback),
+        info.srcset(fallback),
+        sizes,
+        flatatt(attrs),
+    )
+
+
+@register.filter
+def image_url(image, width=DEFAULT_SRC_WIDTH):
+    """URL копии не уже width в запасном формате (или оригинала, если копий нет)"""
+    info = get_image_info(image)
+    if info is None:
+        return original_url(image)
+    return info.url(info.closest_width(int(width)), info.fallback_format)
@@ -0,0 +1,116 @@
+import io
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from menu.models import Category, MenuItem
+from notifications.jobs import claim_jobs, run_jobs
+from PIL import Image
+from .derivatives import derivative_name, generate_derivatives, get_image_info
+from .models import ResponsiveImage
+
+
+def image_file(width, height, mode='RGB', color=(200, 80, 40)):
+    buffer = io.BytesIO()
+    image = Image.new(mode, (width, height), color if mode == 'RGB' else color + (128,))
+    image.save(buffer, 'PNG' if mode == 'RGBA' else 'JPEG')
+    return ContentFile(buffer.getvalue())
+
+
+@override_settings(IMAGE_DERIVATIVE_WIDTHS=(160, 320, 640), IMAGE_DERIVATIVE_FORMATS=('webp', 'jpeg'))
+class ImageDerivativesTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def render(self, source, image):
+        return Template('{% load responsive_images %}' + source).render(Context({'image': image}))
+
+    def test_widths_formats_and_shared_content(self):
+        photo = default_storage.save('menu_images/photo.jpg', image_file(500, 250))
+        logo = default_storage.save('menu_images/logo.png', image_file(200, 200, mode='RGBA'))
+
+        responsive = generate_derivatives(photo)
+        # Копии не шире оригинала, последняя - сам оригинал
+        self.assertEqual(responsive.widths, [160, 320, 500])
+        self.assertEqual(responsive.formats, ['webp', 'jpeg'])
+        with default_storage.open(derivative_name(responsive.content_hash, 160, 'webp')) as copy:
+            self.assertEqual(Image.open(copy).size, (160, 80))
+
+        # Прозрачность: запасной формат PNG вместо JPEG
+        self.assertEqual(generate_derivatives(logo).formats, ['webp', 'png'])
+
+        # Тот же файл под другим именем использует готовые копии
+        duplicate = default_storage.save('gallery_image/photo-copy.jpg', default_storage.open(photo))
+        self.assertEqual(generate_derivatives(duplicate).content_hash, responsive.content_hash)
+        self.assertEqual(ResponsiveImage.objects.count(), 3)
+
+    def test_upload_enqueues_job_and_template_switches_to_srcset(self):
+        category = Category.objects.create(name='Soups')
+        dish = MenuItem(name='Soup', description='Soup', ingredients='Soup', price=Decimal('10.00'), category=category)
+        dish.image.save('soup.jpg', image_file(800, 600), save=False)
+        dish.image_dish.save('soup-dish.jpg', image_file(400, 300), save=False)
+        dish.save()
+
+        # Пока копий нет - оригинал
+        html = self.render('{% responsive_image image alt="Soup" %}', dish.image_dish)
+        self.assertHTMLEqual(
+            html, f'<img src="{dish.image_dish.url}" alt="Soup" loading="lazy" decoding="async">',
+        )
+
+        jobs = [claimed for claimed in claim_jobs('test', 10) if claimed.name == 'images.derivatives']
+        self.assertEqual(len(jobs), 2)
+        self.assertEqual(run_jobs(jobs), 0)
+
+        info = get_image_info(dish.image_dish)
+        self.assertEqual(info.widths, (160, 320, 400))
+        html = self.render('{% responsive_image image alt="Soup" sizes="50vw" src_width=300 %}', dish.image_dish)
+        self.assertInHTML(
+            f'<source type="image/webp" srcset="{info.srcset("webp")}" sizes="50vw">', html,
+        )
+        self.assertIn(f'<img src="{info.url(320, "jpeg")}" srcset="{info.srcset("jpeg")}"', html)
+
+        # Снимок меню хранит только URL - тег находит копии и по нему
+        self.assertEqual(
+            self.render('{{ image|image_url:100 }}', dish.image_dish.url), info.url(160, 'jpeg'),
+        )
+
+        # Повторное сохранение не ставит задачу заново
+        dish.save()
+        self.assertFalse([claimed for claimed in claim_jobs('test', 10) if claimed.name == 'images.derivatives'])
+
+    def test_backfill_command(self):
+        category = Category.objects.create(name='Soups')
+        MenuItem.objects.bulk_create([
+            MenuItem(
+                name=f'Dish {number}', description='-', ingredients='-', price=Decimal('10.00'), category=category,
+                image=default_storage.save(f'menu_images/{number}.jpg', image_file(300, 200)),
+                image_dish=default_storage.save(f'menu_images/{number}-dish.jpg', image_file(300, 200)),
+            )
+            for number in range(3)
+        ])
+        MenuItem.objects.create(
+            name='Missing', description='-', ingredients='-', price=Decimal('10.00'), category=category,
+            image='menu_images/missing.jpg', image_dish='menu_images/missing.jpg',
+        )
+
+        out = io.StringIO()
+        call_command('generate_image_derivatives', workers=2, stdout=out)
+
+        self.assertIn('Обработано изображений: 6 из 7', out.getvalue())
+        self.assertIn('Уникальных по содержимому: 1', out.getvalue())
+        self.assertEqual(ResponsiveImage.objects.count(), 6)
+        self.assertIsNotNone(get_image_info('menu_images/0.jpg'))
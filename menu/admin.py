@@ -1,6 +1,7 @@
 from django.contrib import admin
 from menu.models import MenuItem, Category, MealType
-from django.utils.safestring import mark_safe
+from django.utils.html import format_html
+from images.templatetags.responsive_images import image_url
 
 
 @admin.register(MenuItem)
@@ -13,7 +14,7 @@ class MenuItemAdmin(admin.ModelAdmin):
     # Группировка полей в форме редактирования
     fieldsets = (
         ('Основная информация', {
-            'fields': ('name', 'category', 'price', 'description', 'ingredients')
+            'fields': ('name', 'category', 'price', 'cost_price', 'description', 'ingredients')
         }),
         ('Изображения', {
             'fields': ('image', 'image_dish')
@@ -26,7 +27,8 @@ class MenuItemAdmin(admin.ModelAdmin):
 
     def view_image(self, obj):
         if obj.image_dish:
-            return mark_safe(f"<img src='{obj.image_dish.url}' alt='{obj.name}' width='50'/>")
+            # Маленькая копия вместо полноразмерного файла
+            return format_html("<img src='{}' alt='{}' width='50'/>", image_url(obj.image_dish, 160), obj.name)
         return None
 
     view_image.short_description = 'Photo'
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MenuConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'menu'
+
+    def ready(self):
+        # Сбрасываем снимок меню при изменениях блюд и категорий
+        import menu.signals  # noqa
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0011_menuitem_is_delivery_alter_menuitem_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='cost_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='Себестоимость'),
+        ),
+    ]
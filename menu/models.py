@@ -28,6 +28,8 @@ class MenuItem(models.Model):
     description = models.TextField()
     ingredients = models.TextField()
     price = models.DecimalField(max_digits=8, decimal_places=2)
+    # Себестоимость порции для отчета menu engineering (analytics/menu_engineering.py)
+    cost_price = models.DecimalField('Себестоимость', max_digits=8, decimal_places=2, blank=True, null=True)
     category = models.ForeignKey('Category', on_delete=models.CASCADE)
 
     meal_types = models.ManyToManyField(
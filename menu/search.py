@@ -0,0 +1,332 @@
+"""
+Поиск и фильтры по меню для подсказок при вводе (/menu/search/).
+
+Индекс строится по снимку меню (menu/snapshot.py) и живет в памяти
+процесса, поэтому запрос не обращается к базе. Каждому блюду выделяется
+слот - номер бита; множества блюд хранятся как целые-битовые маски, так
+что пересечение условий поиска и фильтров - это несколько операций &
+над int.
+
+Инвертированный индекс: префикс слова → маска блюд, в которых есть
+слово с таким префиксом. Отдельно индексируются названия (совпадения
+по названию идут первыми) и весь текст блюда: название, описание и
+состав. Фасеты (категория, тип блюда, доставка, стоп-лист, калории) -
+тоже маски.
+
+При смене версии меню индекс не собирается заново: новая копия
+получает изменения только тех блюд, которые отличаются от прошлого
+снимка. Пока читатели работают со старой копией, она не меняется.
+"""
+import re
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+
+from .snapshot import get_menu_snapshot
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Префиксы длиннее не индексируются: длинное слово в запросе обрезается
+MAX_PREFIX = 15
+
+# Копия индекса в памяти процесса: (версия меню, индекс)
+_local_index = None
+_build_lock = threading.Lock()
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре (ё → е)"""
+    return WORD_RE.findall((text or '').lower().replace('ё', 'е'))
+
+
+@lru_cache(maxsize=100000)
+def word_prefixes(word):
+    return tuple(word[:length] for length in range(1, min(len(word), MAX_PREFIX) + 1))
+
+
+def prefixes(text):
+    """Все префиксы слов текста длиной до MAX_PREFIX"""
+    keys = set()
+    for word in set(tokenize(text)):
+        keys.update(word_prefixes(word))
+    return keys
+
+
+def iter_slots(mask):
+    """Номера установленных битов маски по возрастанию"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    count: int
+    dishes: tuple
+    # {id категории: число блюд}, {код типа блюда: число блюд}
+    category_counts: dict
+    meal_type_counts: dict
+
+
+class MenuSearchIndex:
+    """
+    Инвертированный индекс и фасеты по одному снимку меню
+
+    Экземпляр не меняется после сборки: update() возвращает новую копию.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.slots = {}
+        self.dishes = []
+        self.name_postings = {}
+        self.text_postings = {}
+
+    @classmethod
+    def build(cls, snapshot):
+        return cls().update(snapshot)
+
+    def update(self, snapshot):
+        """
+        Индекс для нового снимка меню
+
+        Переиндексируются только добавленные, удаленные и измененные
+        блюда; фасеты пересчитываются целиком (это несколько проходов
+        по списку блюд без разбора текста).
+        """
+        # Много освободившихся слотов: маски зря длинные, проще собрать заново
+        if self.dishes and len(self.slots) * 2 < len(self.dishes):
+            return MenuSearchIndex.build(snapshot)
+
+        index = MenuSearchIndex()
+        index.version = snapshot.version
+        index.slots = dict(self.slots)
+        index.dishes = list(self.dishes)
+        index.name_postings = dict(self.name_postings)
+        index.text_postings = dict(self.text_postings)
+
+        current = {dish.id: dish for dish in snapshot.dishes}
+        for dish_id, slot in self.slots.items():
+            if dish_id not in current:
+                index._remove_text(slot, self.dishes[slot])
+                index.dishes[slot] = None
+                del index.slots[dish_id]
+
+        changed = []
+        for dish in snapshot.dishes:
+            slot = index.slots.get(dish.id)
+            if slot is None:
+                slot = index.slots[dish.id] = len(index.dishes)
+                index.dishes.append(dish)
+                changed.append(slot)
+                continue
+
+            old = index.dishes[slot]
+            if (old.name, old.description, old.ingredients) != (dish.name, dish.description, dish.ingredients):
+                index._remove_text(slot, old)
+                changed.append(slot)
+            index.dishes[slot] = dish
+
+        index._add_text(changed)
+
+        index._build_facets()
+        return index
+
+    @staticmethod
+    def _text_keys(dish):
+        name_keys = prefixes(dish.name)
+        return name_keys, name_keys | prefixes(dish.description) | prefixes(dish.ingredients)
+
+    def _add_text(self, slots):
+        # Биты сначала собираются в bytearray по каждому префиксу: при
+        # полной сборке это намного быстрее, чем OR длинных int на каждое блюдо
+        size = len(self.dishes) // 8 + 1
+        name_bits = {}
+        text_bits = {}
+        for slot in slots:
+            byte, bit = divmod(slot, 8)
+            bit = 1 << bit
+            name_keys, text_keys = self._text_keys(self.dishes[slot])
+            for bits, keys in ((name_bits, name_keys), (text_bits, text_keys)):
+                for key in keys:
+                    buffer = bits.get(key)
+                    if buffer is None:
+                        buffer = bits[key] = bytearray(size)
+                    buffer[byte] |= bit
+
+        for postings, bits in ((self.name_postings, name_bits), (self.text_postings, text_bits)):
+            for key, buffer in bits.items():
+                postings[key] = postings.get(key, 0) | int.from_bytes(buffer, 'little')
+
+    def _remove_text(self, slot, dish):
+        bit = 1 << slot
+        name_keys, text_keys = self._text_keys(dish)
+        for postings, keys in ((self.name_postings, name_keys), (self.text_postings, text_keys)):
+            for key in keys:
+                mask = postings.get(key, 0) & ~bit
+                if mask:
+                    postings[key] = mask
+                else:
+                    postings.pop(key, None)
+
+    def _build_facets(self):
+        self.all_mask = 0
+        self.delivery_mask = 0
+        self.stop_list_mask = 0
+        self.category_masks = {}
+        self.meal_type_masks = {}
+
+        calories = []
+        for slot, dish in enumerate(self.dishes):
+            if dish is None:
+                continue
+            bit = 1 << slot
+            self.all_mask |= bit
+            if dish.is_delivery:
+                self.delivery_mask |= bit
+            if dish.stop_list:
+                self.stop_list_mask |= bit
+            self.category_masks[dish.category_id] = self.category_masks.get(dish.category_id, 0) | bit
+            for code in dish.meal_type_codes:
+                self.meal_type_masks[code] = self.meal_type_masks.get(code, 0) | bit
+            if dish.calories is not None:
+                calories.append((dish.calories, slot))
+
+        # Накопленные маски: calorie_masks[i] - блюда с калорийностью
+        # не больше calorie_values[i - 1], calorie_masks[0] - пустая маска
+        calories.sort()
+        self.calorie_values = []
+        self.calorie_masks = [0]
+        for value, slot in calories:
+            if self.calorie_values and self.calorie_values[-1] == value:
+                self.calorie_masks[-1] |= 1 << slot
+            else:
+                self.calorie_values.append(value)
+                self.calorie_masks.append(self.calorie_masks[-1] | 1 << slot)
+
+    def _calories_up_to(self, value):
+        return self.calorie_masks[bisect_right(self.calorie_values, value)]
+
+    def calories_mask(self, minimum=None, maximum=None):
+        """Блюда с калорийностью в диапазоне [minimum, maximum]"""
+        mask = self.calorie_masks[-1] if maximum is None else self._calories_up_to(maximum)
+        if minimum is not None:
+            mask &= ~self._calories_up_to(minimum - 1)
+        return mask
+
+    def text_mask(self, query):
+        """
+        Блюда, где каждое слово запроса - префикс какого-то слова
+
+        Returns:
+            (все совпадения, совпадения по названию)
+        """
+        mask = name_mask = self.all_mask
+        for word in tokenize(query):
+            key = word[:MAX_PREFIX]
+            mask &= self.text_postings.get(key, 0)
+            name_mask &= self.name_postings.get(key, 0)
+            if not mask:
+                return 0, 0
+        return mask, name_mask
+
+    def search(self, query='', categories=(), meal_types=(), calories_min=None, calories_max=None,
+               delivery=None, include_stop_list=False, limit=20):
+        """
+        Поиск с фильтрами
+
+        Args:
+            query: строка поиска, слова ищутся по префиксу
+            categories: id категорий (любая из них)
+            meal_types: коды типов блюд (любой из них)
+            calories_min, calories_max: диапазон калорийности; блюда без
+                калорийности при заданном диапазоне не попадают
+            delivery: True/False - только с доставкой / только без, None - все
+            include_stop_list: показывать ли блюда из стоп-листа
+            limit: сколько блюд вернуть
+
+        Returns:
+            SearchResult: совпадения по названию идут первыми, дальше
+            в порядке меню (блюда, добавленные после сборки индекса, -
+            в конце). Число блюд по категориям считается без
+            фильтра по категории, по типам блюд - без фильтра по типу.
+        """
+        mask, name_mask = self.text_mask(query)
+
+        if calories_min is not None or calories_max is not None:
+            mask &= self.calories_mask(calories_min, calories_max)
+        if delivery is not None:
+            mask &= self.delivery_mask if delivery else ~self.delivery_mask
+        if not include_stop_list:
+            mask &= ~self.stop_list_mask
+
+        category_mask = self.all_mask
+        if categories:
+            category_mask = 0
+            for category_id in categories:
+                category_mask |= self.category_masks.get(category_id, 0)
+
+        meal_type_mask = self.all_mask
+        if meal_types:
+            meal_type_mask = 0
+            for code in meal_types:
+                meal_type_mask |= self.meal_type_masks.get(code, 0)
+
+        category_counts = {
+            category_id: count
+            for category_id, category in self.category_masks.items()
+            if (count := (mask & meal_type_mask & category).bit_count())
+        }
+        meal_type_counts = {
+            code: count
+            for code, meal_type in self.meal_type_masks.items()
+            if (count := (mask & category_mask & meal_type).bit_count())
+        }
+
+        mask &= category_mask & meal_type_mask
+        name_mask &= mask
+
+        dishes = []
+        for part in (name_mask, mask & ~name_mask):
+            for slot in iter_slots(part):
+                if len(dishes) >= limit:
+                    break
+                dishes.append(self.dishes[slot])
+
+        return SearchResult(
+            count=mask.bit_count(),
+            dishes=tuple(dishes),
+            category_counts=category_counts,
+            meal_type_counts=meal_type_counts,
+        )
+
+
+def get_search_index():
+    """
+    Индекс для текущей версии меню
+
+    При смене версии индекс процесса обновляется по новому снимку;
+    первый вызов в процессе собирает его целиком.
+    """
+    global _local_index
+
+    snapshot = get_menu_snapshot()
+    local = _local_index
+    if local is not None and local[0] == snapshot.version:
+        return local[1]
+
+    with _build_lock:
+        local = _local_index
+        if local is not None and local[0] == snapshot.version:
+            return local[1]
+
+        index = local[1].update(snapshot) if local is not None else MenuSearchIndex.build(snapshot)
+        _local_index = (snapshot.version, index)
+        return index
+
+
+def search_dishes(query='', **filters):
+    """Поиск по текущему меню; параметры как у MenuSearchIndex.search"""
+    return get_search_index().search(query, **filters)
@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import MenuItem, Category, MealType
+from .snapshot import bump_menu_version
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=MealType)
+@receiver(post_delete, sender=MealType)
+def menu_changed(sender, **kwargs):
+    """
+    Любое изменение меню делает текущий снимок устаревшим
+
+    Версия меняется после коммита: иначе параллельный запрос успел бы
+    собрать снимок из старых строк и сохранить его под новой версией.
+    """
+    transaction.on_commit(bump_menu_version)
+
+
+@receiver(m2m_changed, sender=MenuItem.meal_types.through)
+def menu_meal_types_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(bump_menu_version)
@@ -0,0 +1,237 @@
+"""
+Снимок меню: неизменяемая, полностью собранная структура категорий и блюд.
+
+Снимок строится одним проходом по базе, кладется в общий кэш (CACHES)
+и дополнительно держится в памяти процесса. Актуальность определяется
+версией меню, которая монотонно растет при каждом изменении MenuItem,
+Category или MealType (см. menu/signals.py). В установившемся режиме
+страница меню не делает ни одного запроса к базе.
+"""
+import threading
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from web_restaurant.cache_versions import get_version, bump_version
+
+MENU_VERSION_KEY = 'menu:snapshot:version'
+MENU_SNAPSHOT_KEY = 'menu:snapshot:{version}'
+
+# Копия снимка в памяти процесса: (версия, снимок)
+_local_snapshot = None
+_build_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ImageRef:
+    """Ссылка на изображение с тем же интерфейсом, что и у FieldFile в шаблонах"""
+    url: str
+
+    def __bool__(self):
+        return bool(self.url)
+
+    def __str__(self):
+        return self.url
+
+
+@dataclass(frozen=True)
+class MealTypeSnapshot:
+    code: str
+    name: str
+
+    def __str__(self):
+        return self.name
+
+
+@dataclass(frozen=True)
+class CategorySnapshot:
+    id: int
+    name: str
+    order: int
+    image: ImageRef
+    image_background: ImageRef
+    items: tuple = ()
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def menu_items(self):
+        """Первые блюда категории для превью на главной странице"""
+        return self.items[:6]
+
+
+@dataclass(frozen=True)
+class DishSnapshot:
+    id: int
+    name: str
+    description: str
+    ingredients: str
+    price: Decimal
+    category_id: int
+    category_name: str
+    image: ImageRef
+    image_dish: ImageRef
+    calories: int | None
+    cooking_time: int
+    is_special: bool
+    is_new: bool
+    is_delivery: bool
+    stop_list: bool
+    meal_types: tuple = ()
+
+    def __str__(self):
+        return f"{self.name} - {self.price}"
+
+    @property
+    def meal_type_codes(self):
+        return frozenset(meal_type.code for meal_type in self.meal_types)
+
+    @property
+    def is_available(self):
+        """Можно ли заказать блюдо с доставкой прямо сейчас"""
+        return self.is_delivery and not self.stop_list
+
+
+@dataclass(frozen=True)
+class MenuSnapshot:
+    version: int
+    categories: tuple
+    dishes: tuple
+    meal_types: tuple
+
+    def __post_init__(self):
+        # Индекс по id и подборки страницы меню строятся один раз вместе со снимком
+        object.__setattr__(self, '_by_id', {dish.id: dish for dish in self.dishes})
+        object.__setattr__(self, '_sections', {
+            'breakfast_items': self.dishes_for_meal_type('breakfast'),
+            'drinks_items': self.dishes_in_category('drinks'),
+            'desserts_items': self.dishes_in_category('desserts'),
+        })
+
+    def get_dish(self, dish_id):
+        try:
+            return self._by_id.get(int(dish_id))
+        except (TypeError, ValueError):
+            return None
+
+    def dishes_in_category(self, name):
+        name = name.lower()
+        return tuple(dish for dish in self.dishes if dish.category_name.lower() == name)
+
+    def dishes_for_meal_type(self, code):
+        return tuple(dish for dish in self.dishes if code in dish.meal_type_codes)
+
+    def as_context(self):
+        """Контекст страницы меню (те же ключи, что и у dish_category)"""
+        return {'categories': self.categories, **self._sections}
+
+
+def _image_ref(field_file):
+    if not field_file:
+        return ImageRef('')
+    try:
+        return ImageRef(field_file.url)
+    except ValueError:
+        return ImageRef('')
+
+
+def build_menu_snapshot(version=0):
+    """
+    Собирает снимок меню из базы: четыре запроса независимо от числа блюд
+    """
+    from .models import Category, MenuItem, MealType
+
+    meal_types = {
+        meal_type.id: MealTypeSnapshot(code=meal_type.code, name=meal_type.get_name())
+        for meal_type in MealType.objects.all()
+    }
+
+    # Связи блюдо ↔ тип блюда одним запросом к промежуточной таблице
+    dish_meal_types = {}
+    through = MenuItem.meal_types.through
+    for dish_id, meal_type_id in through.objects.values_list('menuitem_id', 'mealtype_id'):
+        dish_meal_types.setdefault(dish_id, []).append(meal_types[meal_type_id])
+
+    categories = list(Category.objects.all())
+    category_names = {category.id: category.name for category in categories}
+
+    dishes = []
+    items_by_category = {}
+    for item in MenuItem.objects.all():
+        dish = DishSnapshot(
+            id=item.id,
+            name=item.name,
+            description=item.description,
+            ingredients=item.ingredients,
+            price=item.price,
+            category_id=item.category_id,
+            category_name=category_names.get(item.category_id, ''),
+            image=_image_ref(item.image),
+            image_dish=_image_ref(item.image_dish),
+            calories=item.calories,
+            cooking_time=item.cooking_time,
+            is_special=item.is_special,
+            is_new=item.is_new,
+            is_delivery=item.is_delivery,
+            stop_list=item.stop_list,
+            meal_types=tuple(dish_meal_types.get(item.id, ())),
+        )
+        dishes.append(dish)
+        items_by_category.setdefault(item.category_id, []).append(dish)
+
+    return MenuSnapshot(
+        version=version,
+        categories=tuple(
+            CategorySnapshot(
+                id=category.id,
+                name=category.name,
+                order=category.order,
+                image=_image_ref(category.image),
+                image_background=_image_ref(category.image_background),
+                items=tuple(items_by_category.get(category.id, ())),
+            )
+            for category in categories
+        ),
+        dishes=tuple(dishes),
+        meal_types=tuple(meal_types.values()),
+    )
+
+
+def get_menu_version():
+    """Текущая версия меню из общего кэша"""
+    return get_version(MENU_VERSION_KEY)
+
+
+def bump_menu_version():
+    """Увеличивает версию меню; старые снимки перестают использоваться"""
+    return bump_version(MENU_VERSION_KEY)
+
+
+def get_menu_snapshot():
+    """
+    Возвращает актуальный снимок меню
+
+    Порядок поиска: память процесса → общий кэш → сборка из базы.
+    """
+    global _local_snapshot
+
+    version = get_menu_version()
+    local = _local_snapshot
+    if local is not None and local[0] == version:
+        return local[1]
+
+    with _build_lock:
+        local = _local_snapshot
+        if local is not None and local[0] == version:
+            return local[1]
+
+        key = MENU_SNAPSHOT_KEY.format(version=version)
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = build_menu_snapshot(version)
+            cache.set(key, snapshot, getattr(settings, 'MENU_SNAPSHOT_TIMEOUT', 60 * 60 * 24))
+
+        _local_snapshot = (version, snapshot)
+        return snapshot
@@ -1,3 +1,171 @@
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from .models import Category, MealType, MenuItem
+from .search import MenuSearchIndex, get_search_index
+from . import snapshot as snapshot_module
+from .snapshot import build_menu_snapshot, get_menu_snapshot
+
+
+class MenuSearchTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.soups = Category.objects.create(name='Супы', order=1)
+        self.desserts = Category.objects.create(name='Десерты', order=2)
+        self.lunch = MealType.objects.create(code='lunch')
+
+        self.borscht = self.create_dish(
+            'Борщ', self.soups, description='Наваристый суп со сметаной', ingredients='Свекла, говядина',
+            calories=350,
+        )
+        self.borscht.meal_types.add(self.lunch)
+        self.mushroom = self.create_dish(
+            'Грибной суп', self.soups, description='Суп из лесных грибов', ingredients='Грибы, сливки',
+            calories=220,
+        )
+        self.cake = self.create_dish(
+            'Торт «Наполеон»', self.desserts, description='Слоеный торт со сметанным кремом',
+            ingredients='Мука, сливки', calories=450,
+        )
+        self.sorbet = self.create_dish(
+            'Сорбет', self.desserts, description='Ягодный сорбет', ingredients='Ягоды', calories=120,
+            stop_list=True,
+        )
+
+    def create_dish(self, name, category, calories=None, is_delivery=True, stop_list=False, **fields):
+        return MenuItem.objects.create(
+            name=name,
+            price=Decimal('100.00'),
+            category=category,
+            calories=calories,
+            is_delivery=is_delivery,
+            stop_list=stop_list,
+            **fields,
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse('menu:search'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, data):
+        return [dish['name'] for dish in data['results']]
+
+    def test_prefix_search_ranks_name_matches_first(self):
+        data = self.search(q='суп')
+
+        self.assertEqual(data['count'], 2)
+        # «Грибной суп» совпадает по названию, «Борщ» - только по описанию
+        self.assertEqual(self.names(data), ['Грибной суп', 'Борщ'])
+        self.assertEqual(self.names(self.search(q='сливк гриб')), ['Грибной суп'])
+        self.assertEqual(self.names(self.search(q='наполеон')), ['Торт «Наполеон»'])
+
+    def test_facets_and_filters(self):
+        data = self.search(q='сметан')
+        self.assertEqual(
+            data['facets']['categories'],
+            [{'id': self.soups.id, 'name': 'Супы', 'count': 1}, {'id': self.desserts.id, 'name': 'Десерты', 'count': 1}],
+        )
+
+        self.assertEqual(self.names(self.search(q='сметан', category=self.desserts.id)), ['Торт «Наполеон»'])
+        self.assertEqual(self.names(self.search(meal_type='lunch')), ['Борщ'])
+        self.assertEqual(
+            self.names(self.search(calories_min=200, calories_max=400)), ['Борщ', 'Грибной суп'],
+        )
+        # Стоп-лист скрыт по умолчанию
+        self.assertEqual(self.search(q='сорбет')['count'], 0)
+        self.assertEqual(self.names(self.search(q='сорбет', include_stop_list=1)), ['Сорбет'])
+
+    def test_invalid_params(self):
+        response = self.client.get(reverse('menu:search'), {'calories_min': 'много'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+
+        response = self.client.get(reverse('menu:search'), {'limit': 1000})
+        self.assertEqual(response.status_code, 400)
+
+    def test_index_follows_menu_changes(self):
+        self.assertEqual(self.search(q='окрошка')['count'], 0)
+        index = get_search_index()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            okroshka = self.create_dish('Окрошка', self.soups, calories=150)
+        self.assertEqual(self.names(self.search(q='окрошка')), ['Окрошка'])
+        self.assertIsNot(get_search_index(), index)
+
+        okroshka.name = 'Холодник'
+        with self.captureOnCommitCallbacks(execute=True):
+            okroshka.save()
+        self.assertEqual(self.search(q='окрошка')['count'], 0)
+        self.assertEqual(self.names(self.search(q='холодн')), ['Холодник'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            okroshka.delete()
+        self.assertEqual(self.search(q='холодн')['count'], 0)
+
+    def test_incremental_update_matches_full_build(self):
+        index = MenuSearchIndex.build(build_menu_snapshot(version=1))
+
+        self.cake.description = 'Торт с заварным кремом'
+        self.cake.save()
+        self.sorbet.delete()
+        self.create_dish('Солянка', self.soups, description='Суп', ingredients='Копчености')
+        snapshot = build_menu_snapshot(version=2)
+
+        updated = index.update(snapshot)
+        rebuilt = MenuSearchIndex.build(snapshot)
+        for query in ('суп', 'сметан', 'крем', 'сорбет', 'солянк', 'сливки'):
+            # Порядок может отличаться: новые блюда получают слоты в конце
+            self.assertEqual(
+                {dish.id for dish in updated.search(query, include_stop_list=True).dishes},
+                {dish.id for dish in rebuilt.search(query, include_stop_list=True).dishes},
+                query,
+            )
+
+
+class MenuSnapshotTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.drinks = Category.objects.create(name='Drinks', order=1)
+        self.breakfast = MealType.objects.create(code='breakfast')
+        self.tea = MenuItem.objects.create(name='Tea', price=Decimal('50.00'), category=self.drinks)
+
+    def names(self, dishes):
+        return [dish.name for dish in dishes]
+
+    def test_snapshot_is_rebuilt_after_menu_changes(self):
+        snapshot = get_menu_snapshot()
+        self.assertEqual(self.names(snapshot.as_context()['drinks_items']), ['Tea'])
+        with self.assertNumQueries(0):
+            self.assertIs(get_menu_snapshot(), snapshot)
+
+        # post_save блюда → новая версия после коммита → новый снимок
+        self.tea.price = Decimal('60.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tea.save()
+            # До коммита версия прежняя: снимок из старых строк не попадет под новую
+            self.assertIs(get_menu_snapshot(), snapshot)
+        updated = get_menu_snapshot()
+        self.assertGreater(updated.version, snapshot.version)
+        self.assertEqual(updated.get_dish(self.tea.id).price, Decimal('60.00'))
+
+        # m2m_changed типов блюд
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tea.meal_types.add(self.breakfast)
+        self.assertEqual(self.names(get_menu_snapshot().as_context()['breakfast_items']), ['Tea'])
+
+        # Другой процесс берет снимок из общего кэша вместе с подборками
+        current = get_menu_snapshot()
+        snapshot_module._local_snapshot = None
+        with self.assertNumQueries(0):
+            cached = get_menu_snapshot()
+        self.assertEqual(cached.version, current.version)
+        self.assertEqual(self.names(cached.as_context()['breakfast_items']), ['Tea'])
 
-# Create your tests here.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tea.delete()
+        self.assertEqual(get_menu_snapshot().as_context()['drinks_items'], ())
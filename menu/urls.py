@@ -5,6 +5,7 @@ app_name = 'menu'
 
 urlpatterns = [
     path('', views.menu_list, name='list'),
+    path('search/', views.dish_search, name='search'),
     path('add-to-cart/<int:dish_id>/', views.add_to_cart, name='add_to_cart'),
     path('remove-from-cart/<int:dish_id>/', views.remove_from_cart, name='remove_from_cart'),
 ]
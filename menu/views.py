@@ -1,50 +1,123 @@
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import MenuItem, Category
+from django.views.decorators.http import require_GET
+from .models import MenuItem
 from django.contrib import messages
 from orders.cart import Cart
+from .search import search_dishes
+from .snapshot import get_menu_snapshot
+from analytics.recommendations import suggest_dishes
+from web_restaurant.page_cache import anonymous_page_cache
 
 
+@anonymous_page_cache
 def menu_list(request):
-    categories = Category.objects.all()
-    context = {
-        'categories': categories,
-    }
+    context = get_menu_snapshot().as_context()
     return render(request, 'menu/list.html', context)
 
 
 def dish_category(request):
+    # Категории, блюда и подборки (завтраки, напитки, десерты) берем
+    # из снимка меню — без запросов к базе, пока меню не менялось
+    context = get_menu_snapshot().as_context()
+    return render(request, 'menu/list.html', context)
+
+
+# Сколько блюд поиск возвращает по умолчанию и максимум
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+
 
-    # Получаем все категории
-    categories = Category.objects.prefetch_related('menuitem_set').all()
-
-    breakfast_items = MenuItem.objects.filter(
-        meal_types__code='breakfast',
-        stop_list=False
-    ).select_related('category').prefetch_related('meal_types').distinct()
-
-    drinks_items = MenuItem.objects.filter(
-        category__name='drinks',
-        stop_list=False
-    ).select_related('category').prefetch_related('meal_types').distinct()
-
-    desserts_items = MenuItem.objects.filter(
-        category__name='desserts',
-        stop_list=False
-    ).select_related('category').prefetch_related('meal_types').distinct()
-
-    context = {
-        'categories': categories,
-        'breakfast_items': breakfast_items,
-        'drinks_items': drinks_items,
-        'desserts_items': desserts_items,
+def parse_search_filters(params):
+    """
+    Фильтры поиска по меню из параметров запроса
+
+    ?category=<id> и ?meal_type=<код> можно повторять; ?calories_min,
+    ?calories_max - целые; ?delivery=1|0; ?include_stop_list=1 - показывать
+    блюда из стоп-листа; ?limit - число блюд в ответе.
+
+    Raises:
+        ValueError: некорректные параметры
+    """
+    def optional_int(name):
+        value = params.get(name)
+        return int(value) if value not in (None, '') else None
+
+    def flag(name):
+        value = params.get(name)
+        if value in (None, ''):
+            return None
+        if value not in ('0', '1'):
+            raise ValueError(f'{name} must be 0 or 1')
+        return value == '1'
+
+    limit = optional_int('limit') or SEARCH_LIMIT
+    if not 1 <= limit <= MAX_SEARCH_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_SEARCH_LIMIT}')
+
+    return {
+        'categories': [int(category_id) for category_id in params.getlist('category')],
+        'meal_types': params.getlist('meal_type'),
+        'calories_min': optional_int('calories_min'),
+        'calories_max': optional_int('calories_max'),
+        'delivery': flag('delivery'),
+        'include_stop_list': bool(flag('include_stop_list')),
+        'limit': limit,
     }
-    return render(request, 'menu/list.html', context)
 
 
-def add_to_cart(request, dish_id):
+@require_GET
+def dish_search(request):
+    """
+    Поиск блюд по названию, описанию и составу с фильтрами (JSON)
+
+    Работает по индексу в памяти процесса (menu/search.py), без
+    запросов к базе, пока меню не менялось.
+    """
+    try:
+        filters = parse_search_filters(request.GET)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    query = request.GET.get('q', '').strip()
+    result = search_dishes(query, **filters)
+    snapshot = get_menu_snapshot()
+
+    return JsonResponse({
+        'success': True,
+        'query': query,
+        'count': result.count,
+        'results': [
+            {
+                'id': dish.id,
+                'name': dish.name,
+                'price': str(dish.price),
+                'category_id': dish.category_id,
+                'category': dish.category_name,
+                'calories': dish.calories,
+                'meal_types': sorted(dish.meal_type_codes),
+                'is_delivery': dish.is_delivery,
+                'stop_list': dish.stop_list,
+                'image': dish.image_dish.url,
+            }
+            for dish in result.dishes
+        ],
+        'facets': {
+            'categories': [
+                {'id': category.id, 'name': category.name, 'count': result.category_counts[category.id]}
+                for category in snapshot.categories
+                if category.id in result.category_counts
+            ],
+            'meal_types': [
+                {'code': meal_type.code, 'name': meal_type.name, 'count': result.meal_type_counts[meal_type.code]}
+                for meal_type in snapshot.meal_types
+                if meal_type.code in result.meal_type_counts
+            ],
+        },
+    })
 
-    from .models import MenuItem
 
+def add_to_cart(request, dish_id):
     dish = get_object_or_404(MenuItem, id=dish_id)
 
     # Проверяем, доступно ли блюдо для доставки
@@ -64,6 +137,14 @@ def add_to_cart(request, dish_id):
     cart = Cart(request)
     cart.add(dish, quantity)
 
+    # Подсказка «с этим часто заказывают» (индекс в памяти, без запросов к базе)
+    suggestions = suggest_dishes([dish.id])
+    if suggestions:
+        messages.info(
+            request,
+            f'С блюдом "{dish.name}" часто заказывают: ' + ', '.join(suggestion.name for suggestion in suggestions),
+        )
+
     # Перенаправляем обратно на страницу, откуда пришел запрос
     scroll_to = request.GET.get('scroll_to', '')
 
@@ -82,8 +163,6 @@ def remove_from_cart(request, dish_id):
     """
     Удалить блюдо из корзины
     """
-    from .models import MenuItem
-
     dish = get_object_or_404(MenuItem, id=dish_id)
     cart = Cart(request)
     cart.remove(dish)
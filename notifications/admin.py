@@ -0,0 +1,25 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'idempotency_key', 'status', 'attempts', 'run_at', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('idempotency_key', 'last_error')
+    readonly_fields = (
+        'name', 'payload', 'idempotency_key', 'attempts', 'locked_at',
+        'locked_by', 'last_error', 'created_at', 'finished_at',
+    )
+    actions = ['retry_jobs']
+
+    @admin.action(description='Повторить выбранные задачи')
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status=Job.STATUS_RUNNING).update(
+            status=Job.STATUS_PENDING,
+            attempts=0,
+            run_at=timezone.now(),
+            finished_at=None,
+        )
+        self.message_user(request, f'Задач поставлено в очередь: {updated}')
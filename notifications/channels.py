@@ -0,0 +1,40 @@
+"""
+Каналы уведомлений администратора.
+
+Каждый канал - отдельная задача в очереди: если Telegram недоступен,
+повторяется только отправка в Telegram, а письмо не дублируется.
+"""
+from .email import send_admin_email
+from .jobs import enqueue, make_job
+from .telegram import escape_markdown, send_telegram_message
+
+CHANNEL_EMAIL = 'email'
+CHANNEL_TELEGRAM = 'telegram'
+
+ADMIN_CHANNELS = (CHANNEL_EMAIL, CHANNEL_TELEGRAM)
+
+
+def enqueue_admin_notification(job_name, key, **payload):
+    """Ставит задачу job_name для каждого канала администратора"""
+    enqueue(*(
+        make_job(job_name, f'{key}:{channel}', channel=channel, **payload)
+        for channel in ADMIN_CHANNELS
+    ))
+
+
+def escape_for_channel(channel):
+    """
+    Функция для подстановки пользовательского текста в сообщение канала:
+    в Telegram экранируется разметка Markdown, письмо остается как есть
+    """
+    return escape_markdown if channel == CHANNEL_TELEGRAM else str
+
+
+def send_to_admin(channel, subject, text):
+    """Отправка в один канал; ошибка пробрасывается, чтобы задачу повторили"""
+    if channel == CHANNEL_EMAIL:
+        send_admin_email(subject=subject, message=text, fail_silently=False)
+    elif channel == CHANNEL_TELEGRAM:
+        send_telegram_message(text, fail_silently=False)
+    else:
+        raise ValueError(f'Unknown notification channel: {channel}')
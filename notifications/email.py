@@ -2,14 +2,19 @@
 
 import logging
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
+from .outbox import get_outbox
 
 logger = logging.getLogger(__name__)
 
 
-def send_admin_email(subject: str, message: str) -> None:
+def send_admin_email(subject: str, message: str, fail_silently: bool = True) -> None:
     """
     Отправка email администратору
+
+    Письмо уходит через почтовый ящик процесса (notifications/outbox.py)
+    по общему SMTP-соединению. С fail_silently=False ошибка
+    пробрасывается (для повтора задачи).
     """
 
     admin_email = getattr(settings, 'ADMIN_EMAIL', None)
@@ -19,12 +24,13 @@ def send_admin_email(subject: str, message: str) -> None:
         return
 
     try:
-        send_mail(
+        get_outbox().send(EmailMessage(
             subject=subject,
-            message=message,
+            body=message,
             from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[admin_email],
-            fail_silently=False,
-        )
+            to=[admin_email],
+        ))
     except Exception as e:
         logger.error(f'Email notification error: {e}')
+        if not fail_silently:
+            raise
@@ -0,0 +1,331 @@
+"""
+Очередь фоновых задач в базе данных.
+
+Сигналы не запускают потоки, а только добавляют строку Job (в той же
+транзакции, что и само событие). Задачи выполняет отдельный процесс
+`manage.py run_jobs` пулом из JOB_WORKERS потоков. Упавшая задача
+повторяется с экспоненциальной задержкой, пока не исчерпает
+max_attempts. Ключ идемпотентности не дает поставить одно и то же
+уведомление дважды; у окончательно упавшей задачи ключ освобождается,
+и событие можно поставить в очередь снова. Выполненные и упавшие задачи
+старше JOB_RETENTION_DAYS воркер удаляет (purge_jobs).
+
+Обработчик регистрируется декоратором:
+
+    @job('orders.order_confirmed')
+    def notify_order_confirmed(order_id, channel):
+        ...
+
+и ставится в очередь вызовом enqueue(make_job('orders.order_confirmed',
+key, order_id=..., channel=...)).
+
+Обработчик с batch=True получает список параметров всех захваченных
+одновременно задач с этим именем (например, письма клиентам отправляются
+пачкой через одно SMTP-соединение). Такая пачка занимает один поток, и
+за раз берется до JOB_BATCH_SIZE ее задач независимо от числа потоков.
+"""
+import logging
+import random
+import socket
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Имя задачи → функция-обработчик
+_registry = {}
+
+# Длина Job.idempotency_key
+MAX_KEY_LENGTH = 200
+
+# Сколько задач удалять одним запросом в purge_jobs
+PURGE_BATCH_SIZE = 1000
+
+
+def job(name, batch=False):
+    """
+    Декоратор: регистрирует функцию как обработчик задачи name
+
+    Args:
+        batch: обработчик принимает список параметров нескольких задач
+    """
+    def decorator(func):
+        _registry[name] = func
+        func.job_name = name
+        func.job_batch = batch
+        return func
+    return decorator
+
+
+def get_handler(name):
+    return _registry.get(name)
+
+
+def make_job(name, key, **payload):
+    """Несохраненная задача; параметры должны сериализоваться в JSON"""
+    from .models import Job
+
+    return Job(
+        name=name,
+        idempotency_key=key,
+        payload=payload,
+        max_attempts=getattr(settings, 'JOB_MAX_ATTEMPTS', 5),
+    )
+
+
+def enqueue(*jobs):
+    """
+    Ставит задачи в очередь одним INSERT
+
+    Задачи с уже существующим ключом идемпотентности пропускаются.
+    """
+    from .models import Job
+
+    Job.objects.bulk_create(jobs, ignore_conflicts=True)
+
+
+def retry_delay(attempts):
+    """Задержка перед следующей попыткой: удваивается, с небольшим разбросом"""
+    base = getattr(settings, 'JOB_RETRY_BASE_DELAY', 30)
+    limit = getattr(settings, 'JOB_RETRY_MAX_DELAY', 60 * 60)
+    delay = min(base * 2 ** max(attempts - 1, 0), limit)
+    return timedelta(seconds=delay * random.uniform(1, 1.1))
+
+
+def _claimable(now):
+    """Задачи, которые можно взять: готовые к запуску и брошенные упавшим воркером"""
+    from .models import Job
+
+    stale = now - timedelta(seconds=getattr(settings, 'JOB_LOCK_TIMEOUT', 60 * 10))
+    return (
+        Q(status=Job.STATUS_PENDING, run_at__lte=now)
+        | Q(status=Job.STATUS_RUNNING, locked_at__lt=stale)
+    )
+
+
+def claim_jobs(worker_id, limit, batch_size=None):
+    """
+    Забирает задачи для воркера worker_id
+
+    Каждая задача захватывается условным UPDATE, поэтому несколько
+    процессов run_jobs могут работать с одной очередью одновременно.
+
+    Args:
+        limit: сколько потоков занять; обычная задача занимает поток,
+            задачи batch-обработчика с одним именем - один поток на всех
+        batch_size: сколько задач одного batch-обработчика взять
+            (по умолчанию JOB_BATCH_SIZE)
+    """
+    from .models import Job
+
+    batch_size = batch_size or getattr(settings, 'JOB_BATCH_SIZE', 100)
+    now = timezone.now()
+    claimable = _claimable(now)
+    candidates = (
+        Job.objects.filter(claimable)
+        .order_by('run_at')
+        .values_list('pk', 'name')[:limit * (batch_size + 1)]
+    )
+
+    claimed = []
+    slots = 0
+    # Имя batch-обработчика → сколько его задач уже взято
+    batches = {}
+    for pk, name in candidates:
+        handler = get_handler(name)
+        batch = handler is not None and handler.job_batch
+        if batch and name in batches:
+            if batches[name] >= batch_size:
+                continue
+        elif slots >= limit:
+            if all(count >= batch_size for count in batches.values()):
+                break
+            continue
+
+        updated = Job.objects.filter(claimable, pk=pk).update(
+            status=Job.STATUS_RUNNING,
+            locked_at=now,
+            locked_by=worker_id,
+            attempts=F('attempts') + 1,
+        )
+        if not updated:
+            continue
+        claimed.append(pk)
+        if not batch or name not in batches:
+            slots += 1
+        if batch:
+            batches[name] = batches.get(name, 0) + 1
+
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_at'))
+
+
+def _finish(job, error=None):
+    """Записывает результат задачи: выполнена, повтор с задержкой или ошибка"""
+    from .models import Job
+
+    now = timezone.now()
+    # Результат пишем, только если задачу не перехватил другой воркер
+    own = Job.objects.filter(pk=job.pk, locked_by=job.locked_by, locked_at=job.locked_at)
+
+    if error is None:
+        own.update(status=Job.STATUS_DONE, finished_at=now, locked_at=None, last_error='')
+    elif job.attempts >= job.max_attempts:
+        logger.error('Job %s failed permanently: %s', job.idempotency_key, error)
+        # Освобождаем ключ: то же уведомление можно поставить снова
+        suffix = f':failed:{job.pk}'
+        own.update(
+            status=Job.STATUS_FAILED,
+            finished_at=now,
+            locked_at=None,
+            last_error=error,
+            idempotency_key=job.idempotency_key[:MAX_KEY_LENGTH - len(suffix)] + suffix,
+        )
+    else:
+        logger.warning('Job %s failed, will retry: %s', job.idempotency_key, error)
+        own.update(
+            status=Job.STATUS_PENDING,
+            run_at=now + retry_delay(job.attempts),
+            locked_at=None,
+            last_error=error,
+        )
+
+
+def run_jobs(jobs):
+    """
+    Выполняет захваченные задачи с одним именем и записывает результат
+
+    Обычный обработчик вызывается для каждой задачи, batch-обработчик -
+    один раз для всех. Возвращает число задач, завершившихся ошибкой.
+    """
+    handler = get_handler(jobs[0].name)
+
+    if handler is not None and handler.job_batch:
+        calls = [(jobs, lambda: handler([job.payload for job in jobs]))]
+    else:
+        calls = [([job], lambda job=job: handler(**job.payload)) for job in jobs]
+
+    failed = 0
+    for call_jobs, call in calls:
+        try:
+            if handler is None:
+                raise LookupError(f'Обработчик задачи {jobs[0].name} не зарегистрирован')
+            call()
+        except Exception:
+            error = traceback.format_exc()
+            failed += len(call_jobs)
+        else:
+            error = None
+
+        for call_job in call_jobs:
+            _finish(call_job, error)
+
+    return failed
+
+
+def purge_jobs(days=None):
+    """
+    Удаляет выполненные и окончательно упавшие задачи старше days дней
+    (по умолчанию JOB_RETENTION_DAYS) небольшими пачками
+
+    Returns:
+        число удаленных задач
+    """
+    from .models import Job
+
+    days = getattr(settings, 'JOB_RETENTION_DAYS', 30) if days is None else days
+    finished = Job.objects.filter(
+        status__in=[Job.STATUS_DONE, Job.STATUS_FAILED],
+        finished_at__lt=timezone.now() - timedelta(days=days),
+    )
+
+    deleted = 0
+    while True:
+        pks = list(finished.values_list('pk', flat=True)[:PURGE_BATCH_SIZE])
+        if not pks:
+            return deleted
+        deleted += Job.objects.filter(pk__in=pks).delete()[0]
+
+
+def run_job(job):
+    """Выполняет одну захваченную задачу; True, если успешно"""
+    return run_jobs([job]) == 0
+
+
+class Worker:
+    """
+    Выполняет задачи пулом из workers потоков
+
+    Из базы берется ровно столько задач, сколько потоков свободно (пачка
+    batch-обработчика - одна задача), так что всплеск событий растягивает
+    очередь, а не число потоков.
+    """
+
+    def __init__(self, workers=None, poll_interval=None, worker_id=None):
+        self.workers = workers or getattr(settings, 'JOB_WORKERS', 4)
+        self.poll_interval = poll_interval or getattr(settings, 'JOB_POLL_INTERVAL', 2)
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.purge_interval = getattr(settings, 'JOB_PURGE_INTERVAL', 60 * 60)
+        self.processed = 0
+        self.failed = 0
+        self.purged = 0
+        self._purged_at = None
+
+    def _execute(self, jobs):
+        try:
+            return run_jobs(jobs)
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def _group(jobs):
+        """Задачи batch-обработчиков с одним именем выполняются вместе"""
+        groups = {}
+        for claimed in jobs:
+            handler = get_handler(claimed.name)
+            key = claimed.name if handler is not None and handler.job_batch else claimed.pk
+            groups.setdefault(key, []).append(claimed)
+        return groups.values()
+
+    def _purge(self):
+        """Очистка старых задач при запуске и раз в purge_interval секунд"""
+        now = time.monotonic()
+        if self._purged_at is not None and now - self._purged_at < self.purge_interval:
+            return
+        self._purged_at = now
+        self.purged += purge_jobs()
+
+    def run(self, once=False):
+        """
+        Основной цикл
+
+        Args:
+            once: выйти, когда очередь опустеет (для cron и тестов)
+        """
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job') as pool:
+            while True:
+                self._purge()
+                free = self.workers - len(in_flight)
+                jobs = claim_jobs(self.worker_id, free) if free else []
+                for group in self._group(jobs):
+                    in_flight[pool.submit(self._execute, group)] = len(group)
+
+                if not in_flight:
+                    if once:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+
+                done, _ = wait(in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.processed += in_flight.pop(future)
+                    self.failed += future.result()
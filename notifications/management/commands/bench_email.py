@@ -0,0 +1,156 @@
+import datetime
+import socketserver
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template, render_to_string
+from notifications.outbox import MailOutbox
+from reservations.models import Reservation
+
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Минимальный SMTP-сервер: принимает письма и отбрасывает их"""
+
+    def reply(self, text):
+        self.wfile.write(text.encode() + b'\r\n')
+
+    def handle(self):
+        # Задержка приветствия имитирует TLS-рукопожатие и сетевую задержку
+        time.sleep(self.server.handshake_delay)
+        self.reply('220 localhost SMTP sink')
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+
+            command = line.strip().split(b' ', 1)[0].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250 localhost')
+            elif command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b'.\r\n', b'.\n'):
+                        break
+                with self.server.lock:
+                    self.server.received += 1
+                self.reply('250 OK')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP
+                self.reply('250 OK')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_delay=0.0):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.handshake_delay = handshake_delay
+        self.received = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+def build_reservations(count):
+    """Несохраненные брони для рендера письма"""
+    return [
+        Reservation(
+            id=index + 1,
+            name=f'Guest {index}',
+            email=f'guest{index}@example.com',
+            phone='+70000000000',
+            guests=2,
+            visit_date=datetime.date.today(),
+            visit_time=datetime.time(19, 0),
+        )
+        for index in range(count)
+    ]
+
+
+def build_email(reservation, html_content, connection=None):
+    email = EmailMultiAlternatives(
+        subject='Подтверждение бронирования столика | Saffron',
+        body='Ваше бронирование подтверждено!',
+        from_email=settings.DEFAULT_FROM_EMAIL or 'bench@example.com',
+        to=[reservation.email],
+        connection=connection,
+    )
+    email.attach_alternative(html_content, 'text/html')
+    return email
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает отправку писем по одному соединению на письмо и через MailOutbox (локальный SMTP)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help='Количество писем')
+        parser.add_argument(
+            '--handshake-ms', type=float, default=0,
+            help='Задержка установки соединения на стороне сервера (имитация STARTTLS), мс',
+        )
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        sink = SMTPSink(handshake_delay=options['handshake_ms'] / 1000)
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+
+        connection_factory = partial(
+            get_connection,
+            SMTP_BACKEND,
+            host='127.0.0.1',
+            port=sink.server_address[1],
+            username='',
+            password='',
+            use_tls=False,
+            use_ssl=False,
+        )
+        reservations = build_reservations(count)
+
+        try:
+            # До: рендер шаблона и новое соединение на каждое письмо
+            started = time.perf_counter()
+            for reservation in reservations:
+                html_content = render_to_string('emails/reservation_client.html', {'reservation': reservation})
+                build_email(reservation, html_content, connection=connection_factory()).send()
+            before = time.perf_counter() - started
+            before_connections = sink.connections
+
+            # После: шаблон загружается один раз, одно соединение, send_messages пачками
+            outbox = MailOutbox(window=0, batch_size=50, connection_factory=connection_factory)
+            started = time.perf_counter()
+            template = get_template('emails/reservation_client.html')
+            errors = outbox.send_many([
+                build_email(reservation, template.render({'reservation': reservation}))
+                for reservation in reservations
+            ])
+            after = time.perf_counter() - started
+            outbox.close()
+        finally:
+            sink.shutdown()
+            sink.server_close()
+
+        failed = sum(error is not None for error in errors)
+        self.stdout.write(f'Писем: {count}, принято сервером за оба прогона: {sink.received}, ошибок: {failed}')
+        self.stdout.write(
+            f'По одному соединению: {count / before:.0f} писем/с '
+            f'({before_connections} соединений)'
+        )
+        self.stdout.write(
+            f'MailOutbox:           {count / after:.0f} писем/с '
+            f'({sink.connections - before_connections} соединений, пачек: {outbox.batches})'
+        )
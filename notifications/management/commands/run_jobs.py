@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from notifications.jobs import Worker
+from notifications.outbox import get_outbox_metrics
+from notifications.telegram import get_dispatcher_metrics
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди (уведомления администратору и клиентам)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Количество потоков (по умолчанию JOB_WORKERS)')
+        parser.add_argument('--poll-interval', type=float, help='Пауза между опросами пустой очереди, сек')
+        parser.add_argument('--once', action='store_true', help='Выйти, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        worker = Worker(workers=options['workers'], poll_interval=options['poll_interval'])
+        self.stdout.write(f'Воркер {worker.worker_id}: потоков {worker.workers}')
+
+        try:
+            worker.run(once=options['once'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(
+            f'Выполнено задач: {worker.processed}, с ошибкой: {worker.failed}, '
+            f'удалено старых: {worker.purged}'
+        )
+
+        telegram = get_dispatcher_metrics()
+        if telegram:
+            self.stdout.write(f'Telegram: {telegram}')
+
+        email = get_outbox_metrics()
+        if email:
+            self.stdout.write(f'Email: {email}')
@@ -0,0 +1,51 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди (см. notifications/jobs.py)"""
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Выполнена'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField('Задача', max_length=100)
+    payload = models.JSONField('Параметры', default=dict, blank=True)
+    # Например order:<id>:confirmed:email - повторная постановка игнорируется
+    idempotency_key = models.CharField('Ключ идемпотентности', max_length=200, unique=True)
+
+    status = models.CharField(
+        'Статус',
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING
+    )
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveIntegerField('Максимум попыток', default=5)
+    run_at = models.DateTimeField('Запустить не раньше', default=timezone.now)
+
+    locked_at = models.DateTimeField('Взята в работу', null=True, blank=True)
+    locked_by = models.CharField('Воркер', max_length=100, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    finished_at = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.name} [{self.idempotency_key}] - {self.get_status_display()}'
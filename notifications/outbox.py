@@ -0,0 +1,194 @@
+"""
+Почтовый ящик исходящих писем.
+
+Вместо нового SMTP-соединения (и STARTTLS) на каждое письмо процесс
+держит одно соединение: письма копятся EMAIL_BATCH_WINDOW секунд (не
+больше EMAIL_BATCH_SIZE) и уходят одним вызовом send_messages().
+При ошибке соединение пересоздается, и пачка отправляется повторно
+по одному письму, чтобы ошибка одного адреса не задела остальные.
+Простаивающее дольше EMAIL_CONNECTION_IDLE_TIMEOUT соединение
+закрывается.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Сколько ждать результата отправки из очереди (секунды)
+SEND_RESULT_TIMEOUT = 120
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+class MailOutbox:
+    """
+    Очередь писем с фоновым потоком и долгоживущим соединением
+
+    submit() возвращает Future: задача очереди ждет результат, и ошибка
+    отправки приводит к повтору задачи.
+    """
+
+    def __init__(self, window=0.5, batch_size=50, idle_timeout=60, connection_factory=get_connection):
+        self.window = window
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self.connection_factory = connection_factory
+        self.connection = None
+
+        self.queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+        self.sent_messages = 0
+        self.batches = 0
+        self.reconnects = 0
+
+    def submit(self, message):
+        """Ставит письмо (EmailMessage) в очередь; возвращает Future"""
+        future = Future()
+        self.queue.put((message, future))
+        self._ensure_thread()
+        return future
+
+    def send(self, message):
+        """Отправка с ожиданием результата"""
+        return self.submit(message).result(timeout=SEND_RESULT_TIMEOUT)
+
+    def send_many(self, messages):
+        """
+        Отправляет письма одной пачкой
+
+        Returns:
+            список ошибок по письмам (None - письмо отправлено)
+        """
+        futures = [self.submit(message) for message in messages]
+        errors = []
+        for future in futures:
+            try:
+                future.result(timeout=SEND_RESULT_TIMEOUT)
+            except Exception as e:
+                errors.append(e)
+            else:
+                errors.append(None)
+        return errors
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='mail-outbox', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                item = self.queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._close_connection()
+                continue
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._deliver(batch)
+
+        self._close_connection()
+
+    def _get_connection(self):
+        if self.connection is None:
+            self.connection = self.connection_factory(fail_silently=False)
+            # Открытое заранее соединение send_messages() не закрывает
+            self.connection.open()
+        return self.connection
+
+    def _close_connection(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+    def _deliver(self, batch):
+        messages = [message for message, _ in batch]
+        self.batches += 1
+
+        try:
+            self._get_connection().send_messages(messages)
+        except Exception as e:
+            logger.warning(f'Email batch failed, reconnecting: {e}')
+        else:
+            self.sent_messages += len(batch)
+            for _, future in batch:
+                future.set_result(True)
+            return
+
+        # Соединение могло оборваться: новое соединение и по одному письму
+        for message, future in batch:
+            try:
+                self._close_connection()
+                self.reconnects += 1
+                self._get_connection().send_messages([message])
+            except Exception as e:
+                self._close_connection()
+                future.set_exception(e)
+            else:
+                self.sent_messages += 1
+                future.set_result(True)
+
+    def metrics(self):
+        return {
+            'queue_depth': self.queue.qsize(),
+            'sent_messages': self.sent_messages,
+            'batches': self.batches,
+            'reconnects': self.reconnects,
+        }
+
+    def close(self):
+        """Отправляет накопленное и закрывает соединение"""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(timeout=SEND_RESULT_TIMEOUT)
+        self._close_connection()
+
+
+def get_outbox():
+    """Почтовый ящик процесса"""
+    global _outbox
+
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = MailOutbox(
+                window=getattr(settings, 'EMAIL_BATCH_WINDOW', 0.5),
+                batch_size=getattr(settings, 'EMAIL_BATCH_SIZE', 50),
+                idle_timeout=getattr(settings, 'EMAIL_CONNECTION_IDLE_TIMEOUT', 60),
+            )
+            atexit.register(_outbox.close)
+        return _outbox
+
+
+def get_outbox_metrics():
+    """Метрики почтового ящика или None, если в этом процессе он не запускался"""
+    return _outbox.metrics() if _outbox is not None else None
@@ -1,33 +1,350 @@
+"""
+Отправка уведомлений администратору в Telegram.
+
+Все сообщения процесса идут через один TelegramDispatcher:
+- постоянная requests.Session с пулом соединений (без TLS-рукопожатия
+  на каждое событие);
+- сообщения, пришедшие в пределах TELEGRAM_COALESCE_WINDOW секунд,
+  склеиваются в одну сводку (с учетом лимита длины сообщения);
+- частота запросов ограничена «ведром токенов» (TELEGRAM_RATE_LIMIT
+  в секунду, запас TELEGRAM_RATE_BURST), ответ 429 учитывает retry_after;
+- metrics() показывает глубину очереди и задержку отправки.
+
+Если Telegram не может разобрать разметку сводки (ответ 400 «can't parse
+entities»), сообщения из нее отправляются по одному, а сообщение со
+сломанной разметкой - простым текстом: одна ошибка не роняет остальные.
+Пользовательский текст перед подстановкой экранируется (escape_markdown).
+
+Адрес API задается TELEGRAM_API_URL, поэтому диспетчер можно проверить
+на локальном тестовом HTTP-сервере.
+"""
+import atexit
 import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
+# Максимальная длина сообщения Bot API
+MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = '\n\n———\n\n'
+
+# Сколько раз повторять запрос после ответа 429
+RATE_LIMIT_RETRIES = 3
+
+# Сколько ждать результата отправки из очереди диспетчера (секунды)
+SEND_RESULT_TIMEOUT = 120
+
+# Символы разметки Markdown (legacy) Bot API
+MARKDOWN_SPECIAL = '_*`['
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+class TelegramMarkupError(Exception):
+    """Bot API не смог разобрать разметку сообщения"""
+
+
+def escape_markdown(text):
+    """Экранирует разметку в пользовательском тексте (имя, отзыв, пожелания)"""
+    text = str(text)
+    for char in MARKDOWN_SPECIAL:
+        text = text.replace(char, f'\\{char}')
+    return text
+
+
+class TokenBucket:
+    """Ограничение частоты: rate запросов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Ждет, пока появится токен, и забирает его"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Не выдавать токены ближайшие seconds секунд (ответ 429)"""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
 
-def send_telegram_message(text: str) -> None:
+
+def build_digests(texts, limit=MESSAGE_LIMIT):
     """
-    Отправка сообщения администратору в Telegram
+    Склеивает сообщения в сводки не длиннее limit
+
+    Returns:
+        список (текст сводки, индексы исходных сообщений)
     """
+    digests = []
+    current, indexes, length = [], [], 0
+
+    for index, text in enumerate(texts):
+        text = text[:limit]
+        extra = len(text) + (len(DIGEST_SEPARATOR) if current else 0)
+        if current and length + extra > limit:
+            digests.append((DIGEST_SEPARATOR.join(current), indexes))
+            current, indexes, length = [], [], 0
+            extra = len(text)
+        current.append(text)
+        indexes.append(index)
+        length += extra
+
+    if current:
+        digests.append((DIGEST_SEPARATOR.join(current), indexes))
+
+    return digests
+
+
+def build_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class TelegramDispatcher:
+    """
+    Очередь сообщений в один чат с фоновым потоком отправки
+
+    submit() возвращает Future: задача очереди ждет результат, и ошибка
+    отправки приводит к повтору задачи.
+    """
+
+    def __init__(self, token, chat_id, api_url='https://api.telegram.org', window=2.0,
+                 rate=1.0, burst=3, timeout=5, pool_size=4):
+        self.url = f'{api_url.rstrip("/")}/bot{token}/sendMessage'
+        self.chat_id = chat_id
+        self.window = window
+        self.timeout = timeout
+        self.session = build_session(pool_size)
+        self.bucket = TokenBucket(rate, burst)
+
+        self.queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+        self._latencies = deque(maxlen=500)
+        self.sent_messages = 0
+        self.sent_requests = 0
+        self.failed_requests = 0
+
+    def submit(self, text):
+        """Ставит сообщение в очередь; возвращает Future с результатом отправки"""
+        future = Future()
+        self.queue.put((text, future))
+        self._ensure_thread()
+        return future
+
+    def send(self, text):
+        """Отправка с ожиданием результата"""
+        return self.submit(text).result(timeout=SEND_RESULT_TIMEOUT)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='telegram-dispatcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            # Собираем всё, что придет в течение окна после первого сообщения
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._flush(batch)
+
+    def _flush(self, batch):
+        for text, indexes in build_digests([text for text, _ in batch]):
+            items = [batch[index] for index in indexes]
+            if len(items) == 1:
+                self._send_alone(*items[0])
+                continue
+
+            try:
+                result = self._post(text)
+            except TelegramMarkupError:
+                # Разметку сломало одно из сообщений - отправляем по одному
+                self.failed_requests += 1
+                for message, future in items:
+                    self._send_alone(message, future)
+            except Exception as e:
+                self.failed_requests += 1
+                for _, future in items:
+                    future.set_exception(e)
+            else:
+                self.sent_requests += 1
+                self.sent_messages += len(items)
+                for _, future in items:
+                    future.set_result(result)
+
+    def _send_alone(self, text, future):
+        """Отдельное сообщение; со сломанной разметкой - простым текстом"""
+        text = text[:MESSAGE_LIMIT]
+        try:
+            try:
+                result = self._post(text)
+            except TelegramMarkupError:
+                self.failed_requests += 1
+                result = self._post(text, markdown=False)
+        except Exception as e:
+            self.failed_requests += 1
+            future.set_exception(e)
+        else:
+            self.sent_requests += 1
+            self.sent_messages += 1
+            future.set_result(result)
+
+    def _post(self, text, markdown=True):
+        """
+        Raises:
+            TelegramMarkupError: ответ 400 «can't parse entities»
+            requests.RequestException: прочие ошибки
+        """
+        payload = {
+            'chat_id': self.chat_id,
+            'text': text,
+            'disable_web_page_preview': True,
+        }
+        if markdown:
+            payload['parse_mode'] = 'Markdown'
+
+        for _ in range(RATE_LIMIT_RETRIES + 1):
+            self.bucket.acquire()
+            started = time.perf_counter()
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            self._latencies.append(time.perf_counter() - started)
+
+            if response.status_code != 429:
+                break
+
+            # Bot API сообщает, сколько подождать
+            try:
+                retry_after = response.json()['parameters']['retry_after']
+            except (ValueError, KeyError, TypeError):
+                retry_after = 1
+            self.bucket.pause(retry_after)
+
+        if response.status_code == 400:
+            try:
+                description = response.json().get('description', '')
+            except (ValueError, AttributeError):
+                description = ''
+            if "can't parse entities" in description:
+                raise TelegramMarkupError(description)
+
+        response.raise_for_status()
+        return response.json()
+
+    def metrics(self):
+        """Глубина очереди, счетчики и задержка отправки (мс)"""
+        latencies = sorted(self._latencies)
+        return {
+            'queue_depth': self.queue.qsize(),
+            'sent_messages': self.sent_messages,
+            'sent_requests': self.sent_requests,
+            'failed_requests': self.failed_requests,
+            'latency_avg_ms': round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+            'latency_p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1) if latencies else None,
+        }
+
+    def close(self):
+        """Отправляет накопленное и останавливает поток"""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(timeout=SEND_RESULT_TIMEOUT)
+        self.session.close()
+
+
+def get_dispatcher():
+    """Диспетчер процесса (None, если Telegram не настроен)"""
+    global _dispatcher
 
     token = getattr(settings, 'TELEGRAM_BOT_TOKEN', None)
     chat_id = getattr(settings, 'TELEGRAM_CHAT_ID', None)
-
     if not token or not chat_id:
-        logger.warning('Telegram settings are not configured')
-        return
+        return None
 
-    url = f'https://api.telegram.org/bot{token}/sendMessage'
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = TelegramDispatcher(
+                token,
+                chat_id,
+                api_url=getattr(settings, 'TELEGRAM_API_URL', 'https://api.telegram.org'),
+                window=getattr(settings, 'TELEGRAM_COALESCE_WINDOW', 2),
+                rate=getattr(settings, 'TELEGRAM_RATE_LIMIT', 1),
+                burst=getattr(settings, 'TELEGRAM_RATE_BURST', 3),
+            )
+            atexit.register(_dispatcher.close)
+        return _dispatcher
 
-    payload = {
-        'chat_id': chat_id,
-        'text': text,
-        'parse_mode': 'Markdown',
-        'disable_web_page_preview': True,
-    }
+
+def get_dispatcher_metrics():
+    """Метрики диспетчера или None, если в этом процессе он не запускался"""
+    return _dispatcher.metrics() if _dispatcher is not None else None
+
+
+def send_telegram_message(text: str, fail_silently: bool = True) -> None:
+    """
+    Отправка сообщения администратору в Telegram
+
+    С fail_silently=False ошибка пробрасывается (для повтора задачи).
+    """
+
+    dispatcher = get_dispatcher()
+
+    if dispatcher is None:
+        logger.warning('Telegram settings are not configured')
+        return
 
     try:
-        response = requests.post(url, json=payload, timeout=5)
-        response.raise_for_status()
+        dispatcher.send(text)
     except Exception as e:
         logger.error(f'Telegram notification error: {e}')
+        if not fail_silently:
+            raise
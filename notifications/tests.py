@@ -0,0 +1,290 @@
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from reviews.models import Review
+from .jobs import Worker, claim_jobs, enqueue, job, make_job, purge_jobs, run_job
+from .models import Job
+from .outbox import MailOutbox
+from .telegram import DIGEST_SEPARATOR, TelegramDispatcher, TokenBucket, build_digests, escape_markdown
+
+calls = []
+
+
+@job('tests.flaky')
+def flaky_job(fail):
+    calls.append(fail)
+    if fail:
+        raise RuntimeError('temporary error')
+
+
+class JobQueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_signal_enqueues_one_job_per_channel(self):
+        review = Review.objects.create(author='Author', text='Text')
+
+        keys = set(Job.objects.values_list('idempotency_key', flat=True))
+        self.assertEqual(keys, {f'review:{review.id}:created:email', f'review:{review.id}:created:telegram'})
+
+    def test_enqueue_is_idempotent(self):
+        enqueue(make_job('tests.flaky', 'flaky:1', fail=False))
+        enqueue(make_job('tests.flaky', 'flaky:1', fail=False))
+
+        self.assertEqual(Job.objects.filter(idempotency_key='flaky:1').count(), 1)
+
+    @override_settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_BASE_DELAY=30)
+    def test_failed_job_is_retried_with_backoff_then_failed(self):
+        enqueue(make_job('tests.flaky', 'flaky:2', fail=True))
+
+        claimed, = claim_jobs('test', 1)
+        self.assertFalse(run_job(claimed))
+
+        retried = Job.objects.get(idempotency_key='flaky:2')
+        self.assertEqual(retried.status, Job.STATUS_PENDING)
+        self.assertEqual(retried.attempts, 1)
+        self.assertGreaterEqual(retried.run_at, timezone.now() + timedelta(seconds=29))
+        self.assertIn('temporary error', retried.last_error)
+
+        # Пока не подошло время повтора, задачу никто не берет
+        self.assertEqual(claim_jobs('test', 1), [])
+
+        Job.objects.filter(pk=retried.pk).update(run_at=timezone.now())
+        claimed, = claim_jobs('test', 1)
+        self.assertFalse(run_job(claimed))
+
+        self.assertEqual(Job.objects.get(pk=retried.pk).status, Job.STATUS_FAILED)
+        self.assertEqual(calls, [True, True])
+
+        # Ключ упавшей задачи освобожден - событие можно поставить снова
+        enqueue(make_job('tests.flaky', 'flaky:2', fail=False))
+        self.assertEqual(Job.objects.get(idempotency_key='flaky:2').status, Job.STATUS_PENDING)
+        self.assertEqual(Job.objects.get(pk=retried.pk).idempotency_key, f'flaky:2:failed:{retried.pk}')
+
+    @override_settings(JOB_RETENTION_DAYS=7)
+    def test_old_finished_jobs_are_purged(self):
+        now = timezone.now()
+        for key, status, age in (
+            ('old-done', Job.STATUS_DONE, 8),
+            ('old-failed', Job.STATUS_FAILED, 8),
+            ('recent-done', Job.STATUS_DONE, 1),
+            ('pending', Job.STATUS_PENDING, None),
+        ):
+            job = make_job('tests.flaky', key, fail=False)
+            job.status = status
+            job.finished_at = now - timedelta(days=age) if age else None
+            enqueue(job)
+
+        self.assertEqual(purge_jobs(), 2)
+        self.assertEqual(set(Job.objects.values_list('idempotency_key', flat=True)), {'recent-done', 'pending'})
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_job_of_dead_worker_is_reclaimed(self):
+        enqueue(make_job('tests.flaky', 'flaky:3', fail=False))
+        claim_jobs('dead', 1)
+        self.assertEqual(claim_jobs('alive', 1), [])
+
+        Job.objects.update(locked_at=timezone.now() - timedelta(minutes=5))
+        claimed, = claim_jobs('alive', 1)
+
+        self.assertEqual(claimed.locked_by, 'alive')
+        self.assertEqual(claimed.attempts, 2)
+
+
+@override_settings(ADMIN_EMAIL='admin@example.com', DEFAULT_FROM_EMAIL='site@example.com')
+class WorkerTest(TransactionTestCase):
+
+    def test_worker_sends_review_notifications(self):
+        review = Review.objects.create(author='Author', text='Text')
+
+        worker = Worker(workers=2, poll_interval=0.1)
+        worker.run(once=True)
+
+        self.assertEqual(worker.processed, 2)
+        self.assertEqual(worker.failed, 0)
+        self.assertFalse(Job.objects.exclude(status=Job.STATUS_DONE).exists())
+        self.assertEqual(len(mail.outbox), 1)
+        review.refresh_from_db()
+        self.assertTrue(review.admin_notified)
+
+
+class StubBotAPI(BaseHTTPRequestHandler):
+    """Локальная замена Bot API: запоминает запросы, отвечает заданным кодом"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append((self.path, body))
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        payload = {'ok': status == 200}
+        if status == 429:
+            payload['parameters'] = {'retry_after': 0.1}
+        if status == 200 and body.get('parse_mode') and body['text'].replace('\\*', '').count('*') % 2:
+            status = 400
+            payload = {'ok': False, 'description': "Bad Request: can't parse entities: Can't find end of the entity"}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class TelegramDispatcherTest(TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubBotAPI)
+        self.server.requests = []
+        self.server.statuses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def make_dispatcher(self, **kwargs):
+        options = {'window': 0.2, 'rate': 100, 'burst': 10}
+        options.update(kwargs)
+        dispatcher = TelegramDispatcher(
+            'TOKEN', '42', api_url=f'http://127.0.0.1:{self.server.server_port}', **options
+        )
+        self.addCleanup(dispatcher.close)
+        return dispatcher
+
+    def test_burst_is_sent_as_one_digest(self):
+        dispatcher = self.make_dispatcher()
+
+        futures = [dispatcher.submit(f'message {index}') for index in range(5)]
+        for future in futures:
+            future.result(timeout=5)
+
+        self.assertEqual(len(self.server.requests), 1)
+        path, body = self.server.requests[0]
+        self.assertEqual(path, '/botTOKEN/sendMessage')
+        self.assertEqual(body['chat_id'], '42')
+        self.assertEqual(body['text'].split(DIGEST_SEPARATOR), [f'message {index}' for index in range(5)])
+
+        metrics = dispatcher.metrics()
+        self.assertEqual(metrics['sent_requests'], 1)
+        self.assertEqual(metrics['sent_messages'], 5)
+        self.assertEqual(metrics['queue_depth'], 0)
+        self.assertIsNotNone(metrics['latency_avg_ms'])
+
+    def test_rate_limited_request_is_retried(self):
+        self.server.statuses = [429, 200]
+        dispatcher = self.make_dispatcher(window=0)
+
+        dispatcher.send('message')
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(dispatcher.metrics()['failed_requests'], 0)
+
+    def test_error_is_propagated_to_every_message(self):
+        self.server.statuses = [500]
+        dispatcher = self.make_dispatcher()
+
+        futures = [dispatcher.submit('first'), dispatcher.submit('second')]
+
+        for future in futures:
+            with self.assertRaises(Exception):
+                future.result(timeout=5)
+        self.assertEqual(dispatcher.metrics()['failed_requests'], 1)
+
+    def test_malformed_message_does_not_fail_its_digest(self):
+        dispatcher = self.make_dispatcher()
+
+        futures = [dispatcher.submit(text) for text in ('*first*', 'broken *markup', '*third*')]
+        for future in futures:
+            future.result(timeout=5)
+
+        texts = [(body['text'], body.get('parse_mode')) for _, body in self.server.requests]
+        # Сводка отклонена, затем по одному; сломанное - простым текстом
+        self.assertEqual(texts[1:], [
+            ('*first*', 'Markdown'),
+            ('broken *markup', 'Markdown'),
+            ('broken *markup', None),
+            ('*third*', 'Markdown'),
+        ])
+        self.assertEqual(dispatcher.metrics()['sent_messages'], 3)
+
+    def test_user_text_is_escaped(self):
+        self.assertEqual(escape_markdown('snake_case *bold* `code` [link]'), r'snake\_case \*bold\* \`code\` \[link]')
+
+    def test_digests_respect_message_limit(self):
+        digests = build_digests(['a' * 60, 'b' * 60, 'c' * 60], limit=130)
+
+        self.assertEqual([indexes for _, indexes in digests], [[0, 1], [2]])
+        self.assertTrue(all(len(text) <= 130 for text, _ in digests))
+
+    def test_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=20, capacity=1)
+
+        started = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+
+class FlakyConnection:
+    """Соединение, которое рвется на первой пачке"""
+
+    opened = 0
+    failures = 1
+    sent = []
+
+    def __init__(self, fail_silently=False):
+        pass
+
+    def open(self):
+        FlakyConnection.opened += 1
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        if FlakyConnection.failures:
+            FlakyConnection.failures -= 1
+            raise ConnectionResetError('connection lost')
+        FlakyConnection.sent.extend(messages)
+        return len(messages)
+
+
+class MailOutboxTest(TestCase):
+
+    def setUp(self):
+        FlakyConnection.opened = 0
+        FlakyConnection.failures = 0
+        FlakyConnection.sent = []
+
+    def make_outbox(self):
+        outbox = MailOutbox(window=0.2, connection_factory=FlakyConnection)
+        self.addCleanup(outbox.close)
+        return outbox
+
+    def test_batch_uses_one_connection(self):
+        outbox = self.make_outbox()
+
+        errors = outbox.send_many([EmailMessage(f'Subject {index}', 'Body', to=['a@example.com']) for index in range(5)])
+
+        self.assertEqual(errors, [None] * 5)
+        self.assertEqual(FlakyConnection.opened, 1)
+        self.assertEqual(outbox.metrics()['batches'], 1)
+
+    def test_reconnects_after_failure(self):
+        FlakyConnection.failures = 1
+        outbox = self.make_outbox()
+
+        errors = outbox.send_many([EmailMessage('Subject', 'Body', to=['a@example.com']) for _ in range(3)])
+
+        self.assertEqual(errors, [None] * 3)
+        self.assertEqual(len(FlakyConnection.sent), 3)
+        self.assertGreater(outbox.metrics()['reconnects'], 0)
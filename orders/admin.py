@@ -1,7 +1,21 @@
 from django.contrib import admin
-from .models import Order, OrderItem, Coupon
+from django.contrib.admin.views.main import IGNORED_PARAMS, PAGE_VAR, SEARCH_VAR
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from .models import Order, OrderItem, Coupon, DeliveryRule, OrderDailyStat
+from .stats import counted_orders, status_totals
 from django.utils.formats import date_format
 
+# Параметры списка заказов, которые не фильтруют записи
+CHANGELIST_PARAMS = {PAGE_VAR, *IGNORED_PARAMS} - {SEARCH_VAR}
+# Фильтры, по которым число заказов есть в OrderDailyStat
+STAT_FILTERS = {
+    'status__exact': 'status',
+    'created_at__year': 'year',
+    'created_at__month': 'month',
+    'created_at__day': 'day',
+}
+
 
 class OrderItemInline(admin.TabularInline):
     """Встроенное отображение позиций заказа"""
@@ -16,6 +30,43 @@ class OrderItemInline(admin.TabularInline):
     total_price.short_description = 'Total Cost'
 
 
+class CountedPaginator(Paginator):
+    """Пагинатор с заранее известным числом записей (None - обычный COUNT(*))"""
+
+    def __init__(self, object_list, per_page, counted=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.counted = counted
+
+    @cached_property
+    def count(self):
+        if self.counted is None:
+            return super().count
+        return self.counted
+
+
+def stat_filters(params):
+    """
+    Фильтры списка заказов в виде аргументов counted_orders()
+
+    Returns:
+        dict или None, если есть поиск или другие фильтры
+    """
+    filters = {}
+    for name, value in params.items():
+        if name in CHANGELIST_PARAMS or (name == SEARCH_VAR and not value):
+            continue
+        if name not in STAT_FILTERS:
+            return None
+        if name == 'status__exact':
+            filters['status'] = value
+            continue
+        try:
+            filters[STAT_FILTERS[name]] = int(value)
+        except ValueError:
+            return None
+    return filters
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     """Админка для заказов"""
@@ -30,6 +81,10 @@ class OrderAdmin(admin.ModelAdmin):
     ]
     list_filter = ['status', 'delivery_method', 'payment_method', 'created_at']
     search_fields = ['customer_name', 'phone_number', 'delivery_address', 'id']
+    date_hierarchy = 'created_at'
+    # Число заказов берется из счетчиков, а не из COUNT(*) по таблице
+    # (get_paginator); второй счетчик «всего» не показываем
+    show_full_result_count = False
     readonly_fields = [
         'id',
         'created_at',
@@ -84,8 +139,33 @@ class OrderAdmin(admin.ModelAdmin):
 
     id_short.short_description = 'Order ID'
 
+    def changelist_view(self, request, extra_context=None):
+        # Количество заказов по статусам из OrderDailyStat (orders/stats.py)
+        totals = status_totals()
+        extra_context = extra_context or {}
+        extra_context['status_counters'] = [
+            {
+                'status': status,
+                'label': label,
+                'count': totals.get(status, (0, 0))[0],
+                'amount': totals.get(status, (0, 0))[1],
+            }
+            for status, label in Order.STATUS_CHOICES
+        ]
+        return super().changelist_view(request, extra_context=extra_context)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        # Без поиска и фильтров кроме статуса и даты число берется из OrderDailyStat
+        filters = stat_filters(request.GET)
+        return CountedPaginator(
+            queryset, per_page,
+            counted=counted_orders(**filters) if filters is not None else None,
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+        )
+
     def save_model(self, request, obj, form, change):
-        # Пересчитываем стоимость доставки при сохранении в админке
+        # Пересчитываем стоимость доставки по общим правилам цен (orders/pricing.py)
         obj.delivery_cost = obj.calculate_delivery_cost()
         super().save_model(request, obj, form, change)
 
@@ -102,11 +182,32 @@ class CouponAdmin(admin.ModelAdmin):
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     """Админка для позиций заказа (отдельно)"""
-    list_display = ['order', 'dish', 'quantity', 'price_at_order', 'total_price']
+    list_display = ['order', 'dish', 'quantity', 'price_at_order', 'line_total']
     list_filter = ['order__status']
     search_fields = ['order__id', 'dish__name']
+    list_select_related = ['order', 'dish']
 
-    def total_price(self, obj):
-        return obj.total_price
 
-    total_price.short_description = 'Total Cost'
+@admin.register(DeliveryRule)
+class DeliveryRuleAdmin(admin.ModelAdmin):
+    """Админка для тарифов доставки"""
+    list_display = ['delivery_method', 'min_order_amount', 'fee', 'is_active']
+    list_filter = ['delivery_method', 'is_active']
+    list_editable = ['fee', 'is_active']
+
+
+@admin.register(OrderDailyStat)
+class OrderDailyStatAdmin(admin.ModelAdmin):
+    """Счетчики заказов по дням (только просмотр)"""
+    list_display = ['date', 'status', 'orders_count', 'final_cost_sum']
+    list_filter = ['status']
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -1,5 +1,71 @@
 from decimal import Decimal
 from django.conf import settings
+from .pricing import PriceQuote, get_pricing_rules
+
+# Версия формата корзины в сессии:
+#   1 - {'<id>': {'quantity', 'price', 'name', 'image', 'description', 'cooking_time'}}
+#   2 - {'v': 2, 'items': [[id, quantity, price_cents], ...]}
+CART_SCHEMA_VERSION = 2
+
+
+def price_to_cents(price):
+    return int((Decimal(str(price)) * 100).to_integral_value())
+
+
+def cents_to_price(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def decode_cart(data):
+    """
+    Разбирает корзину из сессии в словарь {id блюда: {'quantity', 'price'}}
+
+    Корзины старого формата (без версии) переводятся в текущий формат.
+    """
+    if not data:
+        return {}
+
+    if data.get('v') == CART_SCHEMA_VERSION:
+        return {
+            dish_id: {'quantity': quantity, 'price': cents_to_price(price_cents)}
+            for dish_id, quantity, price_cents in data['items']
+        }
+
+    # Формат 1: ключи - строковые id, цена - строка
+    return {
+        int(dish_id): {'quantity': item['quantity'], 'price': Decimal(item['price'])}
+        for dish_id, item in data.items()
+        if dish_id.isdigit()
+    }
+
+
+def encode_cart(cart):
+    """Компактное представление корзины для сессии: только целые числа"""
+    return {
+        'v': CART_SCHEMA_VERSION,
+        'items': [
+            [dish_id, item['quantity'], price_to_cents(item['price'])]
+            for dish_id, item in cart.items()
+        ],
+    }
+
+
+class CartSummary(PriceQuote):
+    """
+    Итоги корзины: сумма, скидка, доставка и количество товаров
+
+    Считается один раз за запрос (см. Cart.get_summary) и передается во
+    все представления и шаблоны вместо повторных вызовов get_total_price().
+    """
+
+    def __init__(self, quote, item_count, unique_item_count):
+        super().__init__(quote.subtotal, quote.discount, quote.delivery_cost)
+        self.item_count = item_count
+        self.unique_item_count = unique_item_count
+
+    @property
+    def is_empty(self):
+        return self.unique_item_count == 0
 
 
 class Cart:
@@ -10,12 +76,18 @@ class Cart:
         self.request = request
         self.session = request.session
 
-        # Получаем корзину из сессии или создаем новую
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            # Сохраняем пустую корзину в сессии
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        # Получаем корзину из сессии. Пустую корзину в сессию не пишем:
+        # иначе каждый анонимный просмотр страницы создавал бы сессию
+        data = self.session.get(settings.CART_SESSION_ID)
+        self.cart = decode_cart(data)
+
+        # Итоги считаются лениво и сбрасываются при любом изменении корзины
+        self._totals = None
+        self._summaries = {}
+
+        # Корзину старого формата сразу переписываем в компактном виде
+        if data and data.get('v') != CART_SCHEMA_VERSION:
+            self.save()
 
     def add(self, dish, quantity=1, override_quantity=False):
         """
@@ -26,16 +98,13 @@ class Cart:
             quantity: количество (по умолчанию 1)
             override_quantity: заменить количество (True) или добавить к существующему (False)
         """
-        dish_id = str(dish.id)
+        dish_id = dish.id
 
         if dish_id not in self.cart:
+            # Храним только цену на момент добавления, остальное берется из снимка меню
             self.cart[dish_id] = {
                 'quantity': 0,
-                'price': str(dish.price),  # Сохраняем как строку для Decimal
-                'name': dish.name,
-                'image': dish.image.url if dish.image else '',
-                'description': dish.description[:100] if dish.description else '',  # Сохраняем краткое описание
-                'cooking_time': dish.cooking_time,
+                'price': dish.price,
             }
 
         if override_quantity:
@@ -49,11 +118,24 @@ class Cart:
 
         self.save()
 
+    @staticmethod
+    def _dish_key(dish_id):
+        """Ключ корзины - целый id блюда (None, если id некорректный)"""
+        try:
+            return int(dish_id)
+        except (TypeError, ValueError):
+            return None
+
     def save(self):
         """Сохранить корзину в сессии"""
-        self.session[settings.CART_SESSION_ID] = self.cart
+        self._invalidate()
+        self.session[settings.CART_SESSION_ID] = encode_cart(self.cart)
         self.session.modified = True
 
+    def _invalidate(self):
+        self._totals = None
+        self._summaries = {}
+
     def remove(self, dish):
         """
         Удалить блюдо из корзины
@@ -61,7 +143,7 @@ class Cart:
         Args:
             dish: объект MenuItem или ID блюда
         """
-        dish_id = str(dish.id) if hasattr(dish, 'id') else str(dish)
+        dish_id = self._dish_key(dish.id if hasattr(dish, 'id') else dish)
 
         if dish_id in self.cart:
             del self.cart[dish_id]
@@ -79,7 +161,7 @@ class Cart:
             dish_id: ID блюда
             quantity: новое количество
         """
-        dish_id = str(dish_id)
+        dish_id = self._dish_key(dish_id)
 
         if dish_id in self.cart:
             if quantity > 0:
@@ -94,22 +176,51 @@ class Cart:
     def clear(self):
         """Очистить корзину"""
         # Удаляем корзину и купон из сессии
-        del self.session[settings.CART_SESSION_ID]
+        self.cart = {}
+        self._invalidate()
+        self.session.pop(settings.CART_SESSION_ID, None)
         self.session.pop('applied_coupon', None)
         self.session.modified = True
 
+    def _get_totals(self):
+        """Сумма и количество товаров за один проход по корзине"""
+        if self._totals is None:
+            subtotal = Decimal('0')
+            item_count = 0
+            for item in self.cart.values():
+                subtotal += item['price'] * item['quantity']
+                item_count += item['quantity']
+            self._totals = (subtotal, item_count)
+        return self._totals
+
+    def get_summary(self, coupon=None, delivery_method='courier'):
+        """
+        Получить итоги корзины с учетом купона и способа доставки
+
+        Результат кэшируется до следующего изменения корзины.
+
+        Args:
+            coupon: объект Coupon или None
+            delivery_method: способ доставки
+        """
+        key = (coupon.code if coupon else None, delivery_method)
+        summary = self._summaries.get(key)
+
+        if summary is None:
+            subtotal, item_count = self._get_totals()
+            # Скидка, доставка (от суммы ПОСЛЕ скидки) и округление - в pricing
+            quote = get_pricing_rules().quote(subtotal, [coupon] if coupon else [], delivery_method)
+            summary = CartSummary(quote, item_count=item_count, unique_item_count=len(self.cart))
+            self._summaries[key] = summary
+
+        return summary
+
     def get_total_price(self):
         """Получить общую стоимость всех товаров в корзине"""
-        return sum(
-            Decimal(item['price']) * item['quantity']
-            for item in self.cart.values()
-        )
+        return self._get_totals()[0]
 
     def get_cart_subtotal(self):
-        return sum(
-            Decimal(item['price']) * item['quantity']
-            for item in self.cart.values()
-        )
+        return self._get_totals()[0]
 
     def get_delivery_cost(self, delivery_method='courier', cart_total=None):
         """
@@ -118,17 +229,7 @@ class Cart:
         if cart_total is None:
             cart_total = self.get_total_price()
 
-        # Константы доставки
-        FIXED_DELIVERY_COST = 5  # Фиксированная стоимость доставки
-        FREE_DELIVERY_THRESHOLD = 100  # Порог бесплатной доставки
-
-        if delivery_method == 'pickup':
-            return Decimal('0')
-
-        if cart_total >= FREE_DELIVERY_THRESHOLD:
-            return Decimal('0')
-
-        return Decimal(str(FIXED_DELIVERY_COST))
+        return get_pricing_rules().delivery_cost(cart_total, delivery_method)
 
     def get_final_price(self, discount=0, delivery_method='courier'):
         """
@@ -138,9 +239,8 @@ class Cart:
             discount: сумма скидки
             delivery_method: способ доставки
         """
-        total = self.get_total_price()
-        delivery_cost = self.get_delivery_cost(delivery_method, total)
-        return total - Decimal(str(discount)) + delivery_cost
+        subtotal = max(self.get_total_price() - Decimal(str(discount)), Decimal('0'))
+        return subtotal + get_pricing_rules().delivery_cost(subtotal, delivery_method)
 
     def get_items_with_details(self):
         """
@@ -148,28 +248,26 @@ class Cart:
 
         Возвращает список словарей с полной информацией о каждом блюде
         """
-        from menu.models import MenuItem  # Импортируем здесь, чтобы избежать циклического импорта
+        from menu.snapshot import get_menu_snapshot  # Импортируем здесь, чтобы избежать циклического импорта
 
         items = []
-        dish_ids = self.cart.keys()
 
-        # Получаем все блюда из базы данных одним запросом
-        dishes = MenuItem.objects.filter(id__in=dish_ids)
-        dish_dict = {str(dish.id): dish for dish in dishes}
+        # Название, картинку и описание берем из снимка меню - без запросов к базе
+        snapshot = get_menu_snapshot()
 
         for dish_id, item_data in self.cart.items():
-            dish = dish_dict.get(dish_id)
+            dish = snapshot.get_dish(dish_id)
             if dish:
                 item = {
                     'dish': dish,
                     'dish_id': dish_id,
                     'quantity': item_data['quantity'],
-                    'price': Decimal(item_data['price']),
-                    'name': item_data['name'],
-                    'image': item_data.get('image', ''),
-                    'description': item_data.get('description', ''),
-                    'cooking_time': item_data.get('cooking_time', 15),
-                    'total_price': Decimal(item_data['price']) * item_data['quantity'],
+                    'price': item_data['price'],
+                    'name': dish.name,
+                    'image': dish.image.url,
+                    'description': dish.description[:100],
+                    'cooking_time': dish.cooking_time,
+                    'total_price': item_data['price'] * item_data['quantity'],
                 }
                 items.append(item)
 
@@ -177,7 +275,23 @@ class Cart:
 
     def get_item_count(self):
         """Получить общее количество товаров в корзине"""
-        return sum(item['quantity'] for item in self.cart.values())
+        return self._get_totals()[1]
+
+    def get_line(self, dish_id):
+        """
+        Получить одну позицию корзины без обхода всех остальных
+
+        Возвращает словарь с количеством, ценой и суммой или None.
+        """
+        item = self.cart.get(self._dish_key(dish_id))
+        if item is None:
+            return None
+        return {
+            'dish_id': self._dish_key(dish_id),
+            'quantity': item['quantity'],
+            'price': item['price'],
+            'total_price': item['price'] * item['quantity'],
+        }
 
     def get_unique_item_count(self):
         """Получить количество уникальных товаров в корзине"""
@@ -187,6 +301,10 @@ class Cart:
         """Проверка, пуста ли корзина"""
         return len(self.cart) == 0
 
+    def __contains__(self, dish_id):
+        """Есть ли блюдо в корзине"""
+        return self._dish_key(dish_id) in self.cart
+
     def __len__(self):
         """Возвращает общее количество товаров в корзине"""
         return self.get_item_count()
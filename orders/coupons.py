@@ -0,0 +1,39 @@
+"""
+Кэшированный индекс купонов по коду.
+
+Проверка купона в корзине не ходит в базу: активные купоны загружаются
+одним запросом в словарь {код: купон}, который живет в общем кэше
+COUPON_CACHE_TIMEOUT секунд и сбрасывается при изменении купонов.
+Счетчик использований в индексе может немного отставать - окончательная
+проверка лимита делается атомарным UPDATE в Coupon.mark_as_used().
+"""
+from django.conf import settings
+from django.core.cache import cache
+from web_restaurant.cache_versions import get_version, bump_version
+
+COUPON_INDEX_VERSION_KEY = 'orders:coupons:version'
+COUPON_INDEX_KEY = 'orders:coupons:{version}'
+
+
+def get_coupon_index():
+    """Словарь активных купонов {код: Coupon}"""
+    from .models import Coupon
+
+    key = COUPON_INDEX_KEY.format(version=get_version(COUPON_INDEX_VERSION_KEY))
+    index = cache.get(key)
+    if index is None:
+        index = {coupon.code: coupon for coupon in Coupon.objects.filter(is_active=True)}
+        cache.set(key, index, getattr(settings, 'COUPON_CACHE_TIMEOUT', 60))
+    return index
+
+
+def get_coupon(code):
+    """Активный купон по коду или None"""
+    if not code:
+        return None
+    return get_coupon_index().get(code)
+
+
+def bump_coupon_version():
+    """Сбрасывает индекс купонов во всех процессах"""
+    return bump_version(COUPON_INDEX_VERSION_KEY)
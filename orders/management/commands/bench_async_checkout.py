@@ -0,0 +1,110 @@
+import asyncio
+import time
+from decimal import Decimal
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from menu.models import Category, MenuItem
+from orders.cart import CART_SCHEMA_VERSION
+from orders.models import Order
+from orders.sms import get_sms_provider
+
+CUSTOMER_NAME = 'Async checkout load test'
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест async checkout: одновременные оформления заказа в одном '
+        'процессе при медленном SMS-шлюзе (созданные данные удаляются)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=200, help='Одновременных оформлений заказа')
+        parser.add_argument('--latency', type=float, default=0.5, help='Задержка SMS-шлюза, секунды')
+        parser.add_argument('--db-threads', type=int, default=8, help='Потоков для запросов к базе')
+        parser.add_argument(
+            '--sync-threads', type=int, default=8,
+            help='Потоков синхронного воркера для сравнения (WSGI: поток на запрос)',
+        )
+
+    def handle(self, *args, **options):
+        checkouts = options['checkouts']
+        latency = options['latency']
+
+        overrides = override_settings(
+            # Сессии в кэше: нагрузка на SQLite создается только заказами
+            SESSION_ENGINE='django.contrib.sessions.backends.cache',
+            SMS_PROVIDER='orders.sms.FakeSMSProvider',
+            SMS_PROVIDER_OPTIONS={'latency': latency},
+            ASYNC_DB_THREADS=options['db_threads'],
+        )
+
+        setup_test_environment()
+        category = Category.objects.create(name='Load test')
+        dish = MenuItem.objects.create(
+            name='Load test dish',
+            description='Load test',
+            ingredients='Load test',
+            price=Decimal('10.00'),
+            category=category,
+            is_delivery=True,
+        )
+
+        try:
+            with overrides:
+                clients = [self.client_with_cart(dish) for _ in range(checkouts)]
+                elapsed, results = asyncio.run(self.run_checkouts(clients))
+                provider = get_sms_provider()
+        finally:
+            Order.objects.filter(customer_name=CUSTOMER_NAME).delete()
+            dish.delete()
+            category.delete()
+            teardown_test_environment()
+
+        succeeded = sum(results)
+        sync_threads = options['sync_threads']
+        # Синхронный воркер держит поток на всё время ответа шлюза
+        sync_estimate = -(-checkouts // sync_threads) * latency
+
+        self.stdout.write(f'Оформлений заказа: {checkouts}, успешно: {succeeded}')
+        self.stdout.write(f'Задержка SMS-шлюза: {latency * 1000:.0f} мс, потоков для базы: {options["db_threads"]}')
+        self.stdout.write(f'Время: {elapsed:.2f} с, {checkouts / elapsed:.1f} оформлений/с')
+        self.stdout.write(f'Одновременно ожидали SMS-шлюз: {provider.max_in_flight}')
+        self.stdout.write(
+            f'Синхронный воркер с {sync_threads} потоками: не меньше {sync_estimate:.2f} с '
+            f'({checkouts / sync_estimate:.1f} оформлений/с)'
+        )
+
+    def client_with_cart(self, dish):
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        store[settings.CART_SESSION_ID] = {
+            'v': CART_SCHEMA_VERSION,
+            'items': [[dish.id, 1, int(dish.price * 100)]],
+        }
+        store.save()
+
+        client = AsyncClient()
+        client.cookies[settings.SESSION_COOKIE_NAME] = store.session_key
+        return client
+
+    async def run_checkouts(self, clients):
+        data = {
+            'agree': 'on',
+            'customer_name': CUSTOMER_NAME,
+            'phone_number': '+70000000000',
+            'delivery_address': 'Load test street 1',
+            'payment_method': Order.PAYMENT_CASH,
+        }
+        url = reverse('orders:checkout')
+
+        async def checkout(client):
+            response = await client.post(url, data)
+            return response.status_code == 200 and response.json()['success']
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(checkout(client) for client in clients))
+        return time.perf_counter() - started, results
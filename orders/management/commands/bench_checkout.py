@@ -0,0 +1,119 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from menu.models import Category, MenuItem
+from orders.cart import Cart
+from orders.models import Order, OrderItem
+from orders.services import place_order
+
+DEFAULT_LINES = [1, 10, 100]
+
+CUSTOMER = {
+    'customer_name': 'Benchmark',
+    'phone_number': '+70000000000',
+    'delivery_address': 'Benchmark street 1',
+    'payment_method': Order.PAYMENT_CASH,
+}
+
+
+def legacy_place_order(cart, summary):
+    """Прежний путь: заказ, по запросу на каждую позицию и повторное сохранение"""
+    order = Order.objects.create(
+        total_cost=summary.subtotal,
+        discount=summary.discount,
+        delivery_cost=summary.delivery_cost,
+        final_cost=summary.final_price,
+        status=Order.STATUS_NEW,
+        **CUSTOMER,
+    )
+    for item in cart.get_items_with_details():
+        OrderItem.objects.create(
+            order=order,
+            dish_id=item['dish_id'],
+            quantity=item['quantity'],
+            price_at_order=item['price'],
+            dish_name=item['name'],
+        )
+    order.sms_code = 'x' * 64
+    order.save()
+    return order
+
+
+class Command(BaseCommand):
+    help = 'Замеряет оформление заказа на 1, 10 и 100 позиций (изменения в базе откатываются)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, action='append', help='Количество позиций (можно несколько)')
+        parser.add_argument('--repeat', type=int, default=20, help='Повторов на каждый размер заказа')
+        parser.add_argument('--legacy', action='store_true', help='Замерить также прежний путь с create() в цикле')
+
+    def handle(self, *args, **options):
+        lines = options['lines'] or DEFAULT_LINES
+        repeat = options['repeat']
+
+        with transaction.atomic():
+            dishes = self.create_dishes(max(lines))
+
+            paths = [('bulk', lambda cart, summary: place_order(cart, summary, **CUSTOMER))]
+            if options['legacy']:
+                paths.append(('legacy', legacy_place_order))
+
+            self.stdout.write(f'{"путь":<8}{"позиций":>9}{"запросов":>10}{"медиана, мс":>14}{"p95, мс":>10}')
+            for name, place in paths:
+                for count in lines:
+                    cart = self.build_cart(dishes[:count])
+                    summary = cart.get_summary()
+                    queries, timings = self.measure(place, cart, summary, repeat)
+                    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+                    self.stdout.write(
+                        f'{name:<8}{count:>9}{queries:>10}'
+                        f'{statistics.median(timings):>14.2f}{p95:>10.2f}'
+                    )
+
+            transaction.set_rollback(True)
+
+    def create_dishes(self, count):
+        category = Category.objects.create(name='Benchmark')
+        MenuItem.objects.bulk_create(
+            MenuItem(
+                name=f'Benchmark dish {index}',
+                description='Benchmark',
+                ingredients='Benchmark',
+                price=Decimal('10.00') + index,
+                category=category,
+                is_delivery=True,
+            )
+            for index in range(count)
+        )
+        # bulk_create не отправляет сигналы - сбрасываем снимок меню вручную
+        from menu.snapshot import bump_menu_version
+        bump_menu_version()
+        return list(MenuItem.objects.filter(category=category).order_by('id'))
+
+    def build_cart(self, dishes):
+        request = RequestFactory().post('/orders/checkout/')
+        request.session = SessionBase()
+        cart = Cart(request)
+        for dish in dishes:
+            cart.add(dish, quantity=2)
+        return cart
+
+    def measure(self, place, cart, summary, repeat):
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                with transaction.atomic():
+                    place(cart, summary)
+                    transaction.set_rollback(True)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = len(captured)
+        timings.sort()
+        return queries, timings
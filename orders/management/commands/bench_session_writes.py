@@ -0,0 +1,47 @@
+from importlib import import_module
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+DEFAULT_URLS = ['/', '/menu/', '/blog/', '/events/', '/gallery/']
+
+
+class Command(BaseCommand):
+    help = 'Считает записи сессий на анонимные просмотры страниц (изменения в базе откатываются)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', type=int, default=1000, help='Количество просмотров страниц')
+        parser.add_argument('--url', action='append', dest='urls', help='Страница для просмотра (можно несколько)')
+
+    def handle(self, *args, **options):
+        views = options['views']
+        urls = options['urls'] or DEFAULT_URLS
+
+        store_class = import_module(settings.SESSION_ENGINE).SessionStore
+        original_save = store_class.save
+        writes = 0
+
+        def counting_save(session, *save_args, **save_kwargs):
+            nonlocal writes
+            writes += 1
+            return original_save(session, *save_args, **save_kwargs)
+
+        setup_test_environment()
+        try:
+            with mock.patch.object(store_class, 'save', counting_save), transaction.atomic():
+                for index in range(views):
+                    # Каждый просмотр - новый анонимный посетитель без cookie
+                    response = Client().get(urls[index % len(urls)])
+                    if response.status_code != 200:
+                        self.stderr.write(f'{urls[index % len(urls)]}: HTTP {response.status_code}')
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(f'Просмотров страниц: {views}')
+        self.stdout.write(f'Записей сессии: {writes}')
+        self.stdout.write(f'Записей сессии на 1000 просмотров: {writes * 1000 / views:.0f}')
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from orders.stats import rebuild_order_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики заказов по дням и статусам (OrderDailyStat) по таблице заказов'
+
+    def handle(self, *args, **options):
+        rows = rebuild_order_stats()
+        self.stdout.write(self.style.SUCCESS(f'Счетчики пересчитаны: {rows} строк'))
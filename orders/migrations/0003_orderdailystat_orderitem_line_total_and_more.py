@@ -0,0 +1,82 @@
+# Generated by Django 6.0 on 2026-10-18 10:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_line_total(apps, schema_editor):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    OrderItem.objects.update(line_total=F('price_at_order') * F('quantity'))
+
+
+def fill_order_stats(apps, schema_editor):
+    from django.db.models import Count, Sum
+    from django.db.models.functions import TruncDate
+
+    Order = apps.get_model('orders', 'Order')
+    OrderDailyStat = apps.get_model('orders', 'OrderDailyStat')
+
+    rows = (
+        Order.objects
+        .annotate(date=TruncDate('created_at'))
+        .values('date', 'status')
+        .annotate(orders_count=Count('id'), final_cost_sum=Sum('final_cost'))
+        .order_by()
+    )
+    OrderDailyStat.objects.bulk_create(
+        OrderDailyStat(
+            date=row['date'],
+            status=row['status'],
+            orders_count=row['orders_count'],
+            final_cost_sum=row['final_cost_sum'] or 0,
+        )
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_deliveryrule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('status', models.CharField(choices=[('new', 'Новый'), ('confirmed', 'Подтвержден'), ('preparing', 'Готовится'), ('delivering', 'В доставке'), ('completed', 'Выполнен'), ('cancelled', 'Отменен')], max_length=20, verbose_name='Статус')),
+                ('orders_count', models.IntegerField(default=0, verbose_name='Заказов')),
+                ('final_cost_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма заказов')),
+            ],
+            options={
+                'verbose_name': 'Статистика заказов за день',
+                'verbose_name_plural': 'Статистика заказов по дням',
+                'ordering': ['-date', 'status'],
+            },
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Сумма позиции'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='orders_orde_status_25e057_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='orders_orde_created_0e92de_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['order', 'dish'], name='orders_orde_order_i_3c45e9_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderdailystat',
+            constraint=models.UniqueConstraint(fields=('date', 'status'), name='orders_dailystat_date_status_uniq'),
+        ),
+        migrations.RunPython(fill_line_total, migrations.RunPython.noop),
+        migrations.RunPython(fill_order_stats, migrations.RunPython.noop),
+    ]
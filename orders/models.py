@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 import uuid
@@ -109,6 +110,12 @@ class Order(models.Model):
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ['-created_at']
+        indexes = [
+            # Список заказов в админке: фильтр по статусу + сортировка по дате
+            models.Index(fields=['status', 'created_at']),
+            # Сортировка и date_hierarchy без фильтра по статусу
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return f"Заказ #{self.id.hex[:8]} от {self.created_at.strftime('%d.%m.%Y %H:%M')}"
@@ -124,23 +131,15 @@ class Order(models.Model):
         super().save(*args, **kwargs)
 
     def calculate_delivery_cost(self):
-        """Рассчитывает стоимость доставки"""
-        # Фиксированная стоимость доставки
-        FIXED_DELIVERY_COST = 5
-        # Порог бесплатной доставки
-        FREE_DELIVERY_THRESHOLD = 100
+        """Рассчитывает стоимость доставки (от суммы после скидки)"""
+        from .pricing import get_pricing_rules
 
-        if self.delivery_method == self.DELIVERY_PICKUP:
-            return 0
-
-        if self.total_cost >= FREE_DELIVERY_THRESHOLD:
-            return 0
-
-        return FIXED_DELIVERY_COST
+        amount = max(self.total_cost - self.discount, 0)
+        return get_pricing_rules().delivery_cost(amount, self.delivery_method)
 
     def update_delivery_cost(self):
         """Обновляет поле delivery_cost"""
-        self.delivery_cost = self.get_delivery_cost()
+        self.delivery_cost = self.calculate_delivery_cost()
         self.save(update_fields=['delivery_cost', 'final_cost'])
 
     # Трекер для отслеживания изменений полей
@@ -180,9 +179,20 @@ class OrderItem(models.Model):
     # Дополнительные поля из MenuItem для сохранения на момент заказа
     dish_name = models.CharField('Название блюда', max_length=200, blank=True)
 
+    # Сумма позиции хранится, чтобы админка и отчеты не считали ее по строкам
+    line_total = models.DecimalField(
+        'Сумма позиции',
+        max_digits=10,
+        decimal_places=2,
+        default=0
+    )
+
     class Meta:
         verbose_name = 'Позиция заказа'
         verbose_name_plural = 'Позиции заказа'
+        indexes = [
+            models.Index(fields=['order', 'dish']),
+        ]
 
     def __str__(self):
         return f"{self.dish.name} x {self.quantity}"
@@ -201,8 +211,12 @@ class OrderItem(models.Model):
         if not self.price_at_order and self.dish:
             self.price_at_order = self.dish.price
 
+        self.line_total = self.total_price
         super().save(*args, **kwargs)
 
+    # Правки позиций подтвержденного заказа переносятся в сводки продаж
+    tracker = FieldTracker(fields=['dish', 'quantity', 'line_total'])
+
 
 class Coupon(models.Model):
     """Модель купона на скидку"""
@@ -252,20 +266,108 @@ class Coupon(models.Model):
 
     def calculate_discount(self, total_amount):
         """Рассчитывает сумму скидки для заданной суммы"""
-        if not self.is_valid(total_amount):
-            return 0
-
-        discount = 0
-        if self.discount_amount > 0:
-            discount = min(self.discount_amount, total_amount)
-        elif self.discount_percent > 0:
-            discount = total_amount * (self.discount_percent / 100)
+        from .pricing import get_pricing_rules
 
-        return discount
+        return get_pricing_rules().coupon_discount(self, total_amount)
 
     def mark_as_used(self):
-        """Отмечает купон как использованный"""
-        self.times_used += 1
-        if self.times_used >= self.max_uses:
-            self.is_active = False
-        self.save()
+        """
+        Отмечает купон как использованный
+
+        Один условный UPDATE: счетчик увеличивается, только если купон
+        активен, действует по дате и лимит еще не исчерпан. Поэтому
+        параллельные заказы не могут использовать купон сверх max_uses.
+        Вызывается внутри транзакции оформления заказа: если заказ не
+        создан, использование откатывается вместе с ним.
+
+        Returns:
+            True, если купон удалось использовать
+        """
+        from .coupons import bump_coupon_version
+
+        now = timezone.now()
+        updated = Coupon.objects.filter(
+            pk=self.pk,
+            is_active=True,
+            valid_from__lte=now,
+            valid_until__gte=now,
+            times_used__lt=F('max_uses'),
+        ).update(
+            times_used=F('times_used') + 1,
+            # В SET используются значения строки до обновления
+            is_active=Case(
+                When(times_used__gte=F('max_uses') - 1, then=Value(False)),
+                default=Value(True),
+            ),
+        )
+
+        if updated:
+            self.refresh_from_db(fields=['times_used', 'is_active'])
+            transaction.on_commit(bump_coupon_version)
+
+        return bool(updated)
+
+
+class DeliveryRule(models.Model):
+    """
+    Ступень тарифа доставки: от какой суммы заказа какая стоимость
+
+    Правила собираются в набор в orders/pricing.py и кэшируются до
+    следующего изменения. Ступень со стоимостью 0 задает порог
+    бесплатной доставки.
+    """
+
+    delivery_method = models.CharField(
+        'Способ доставки',
+        max_length=20,
+        choices=Order.DELIVERY_CHOICES,
+        default=Order.DELIVERY_COURIER
+    )
+    min_order_amount = models.DecimalField(
+        'Сумма заказа от',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        validators=[MinValueValidator(0)]
+    )
+    fee = models.DecimalField(
+        'Стоимость доставки',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        validators=[MinValueValidator(0)]
+    )
+    is_active = models.BooleanField('Активно', default=True)
+
+    class Meta:
+        verbose_name = 'Тариф доставки'
+        verbose_name_plural = 'Тарифы доставки'
+        ordering = ['delivery_method', 'min_order_amount']
+
+    def __str__(self):
+        return f"{self.get_delivery_method_display()}: от {self.min_order_amount} — {self.fee}"
+
+
+class OrderDailyStat(models.Model):
+    """
+    Счетчики заказов по дням и статусам
+
+    Ведутся сигналами при сохранении и удалении заказов (orders/stats.py),
+    пересобираются командой rebuild_order_stats.
+    """
+
+    date = models.DateField('Дата')
+    status = models.CharField('Статус', max_length=20, choices=Order.STATUS_CHOICES)
+    orders_count = models.IntegerField('Заказов', default=0)
+    final_cost_sum = models.DecimalField('Сумма заказов', max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Статистика заказов за день'
+        verbose_name_plural = 'Статистика заказов по дням'
+        ordering = ['-date', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'status'], name='orders_dailystat_date_status_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.get_status_display()}: {self.orders_count}"
@@ -0,0 +1,158 @@
+"""
+Правила цен: тарифы доставки, порог бесплатной доставки, купоны и округление.
+
+Корзина, оформление заказа и админка считают деньги только здесь.
+Тарифы из DeliveryRule собираются в неизменяемый набор PricingRules,
+который живет в памяти процесса и перечитывается из базы лишь после
+изменения правил (версия в общем кэше, см. orders/signals.py). Для
+способа доставки без активных тарифов курьер стоит FIXED_DELIVERY_COST
+до порога FREE_DELIVERY_THRESHOLD из настроек, самовывоз бесплатен.
+"""
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from web_restaurant.cache_versions import get_version, bump_version
+
+PRICING_VERSION_KEY = 'orders:pricing:version'
+
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+
+# Как сочетать несколько купонов
+STACKING_BEST = 'best'  # действует один купон с наибольшей скидкой
+STACKING_SUM = 'sum'  # скидки складываются
+
+# Копия правил в памяти процесса: (версия, правила)
+_local_rules = None
+_rules_lock = threading.Lock()
+
+
+def round_money(amount):
+    """Округление денежной суммы до копеек"""
+    return Decimal(amount).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class PriceQuote:
+    """Расчет стоимости: сумма, скидка, доставка и итог"""
+
+    def __init__(self, subtotal, discount, delivery_cost):
+        self.subtotal = subtotal  # сумма товаров без скидки
+        self.discount = discount
+        self.cart_subtotal = max(subtotal - discount, ZERO)  # сумма после скидки
+        self.delivery_cost = delivery_cost
+        self.final_price = self.cart_subtotal + delivery_cost
+
+
+class PricingRules:
+    """
+    Скомпилированный набор правил
+
+    Args:
+        tiers: {способ доставки: [(сумма заказа от, стоимость), ...]}
+        coupon_stacking: STACKING_BEST или STACKING_SUM
+    """
+
+    def __init__(self, tiers, coupon_stacking=STACKING_BEST, version=0):
+        self.version = version
+        self.coupon_stacking = coupon_stacking
+        # Ступени по убыванию порога: первая подходящая и есть тариф
+        self.tiers = {
+            method: tuple(sorted(
+                ((Decimal(min_amount), Decimal(fee)) for min_amount, fee in method_tiers),
+                reverse=True,
+            ))
+            for method, method_tiers in tiers.items()
+        }
+
+    def delivery_cost(self, amount, delivery_method='courier'):
+        """Стоимость доставки для суммы заказа (после скидки)"""
+        for min_amount, fee in self.tiers.get(delivery_method, ()):
+            if amount >= min_amount:
+                return fee
+        return ZERO
+
+    def free_delivery_threshold(self, delivery_method='courier'):
+        """Сумма, с которой доставка бесплатна (None, если такой нет)"""
+        free = [min_amount for min_amount, fee in self.tiers.get(delivery_method, ()) if fee == 0]
+        return min(free) if free else None
+
+    def fixed_delivery_cost(self, delivery_method='courier'):
+        """Стоимость доставки для самого маленького заказа"""
+        return self.delivery_cost(ZERO, delivery_method)
+
+    def coupon_discount(self, coupon, amount):
+        """Скидка по одному купону (0, если купон не действует)"""
+        if coupon is None or not coupon.is_valid(amount):
+            return ZERO
+
+        if coupon.discount_amount > 0:
+            discount = min(coupon.discount_amount, amount)
+        elif coupon.discount_percent > 0:
+            discount = amount * coupon.discount_percent / 100
+        else:
+            discount = ZERO
+
+        return round_money(discount)
+
+    def discount(self, amount, coupons=()):
+        """Итоговая скидка по купонам с учетом правила сочетания"""
+        discounts = [self.coupon_discount(coupon, amount) for coupon in coupons]
+        if not discounts:
+            return ZERO
+
+        if self.coupon_stacking == STACKING_SUM:
+            return min(sum(discounts, ZERO), amount)
+        return max(discounts)
+
+    def quote(self, subtotal, coupons=(), delivery_method='courier'):
+        """Полный расчет: доставка считается от суммы ПОСЛЕ скидки"""
+        subtotal = round_money(subtotal)
+        discount = self.discount(subtotal, coupons)
+        delivery_cost = self.delivery_cost(max(subtotal - discount, ZERO), delivery_method)
+        return PriceQuote(subtotal, discount, delivery_cost)
+
+
+def build_pricing_rules(version=0):
+    """Собирает правила из активных тарифов DeliveryRule"""
+    from .models import DeliveryRule, Order
+
+    tiers = {}
+    for rule in DeliveryRule.objects.filter(is_active=True):
+        tiers.setdefault(rule.delivery_method, []).append((rule.min_order_amount, rule.fee))
+
+    # Способы без тарифов: фиксированная доставка и порог из настроек.
+    # Проверка по каждому способу - тариф только для самовывоза не
+    # должен делать курьерскую доставку бесплатной
+    tiers.setdefault(Order.DELIVERY_COURIER, [
+        (ZERO, Decimal(str(getattr(settings, 'FIXED_DELIVERY_COST', 5)))),
+        (Decimal(str(getattr(settings, 'FREE_DELIVERY_THRESHOLD', 100))), ZERO),
+    ])
+    tiers.setdefault(Order.DELIVERY_PICKUP, [(ZERO, ZERO)])
+
+    return PricingRules(
+        tiers,
+        coupon_stacking=getattr(settings, 'COUPON_STACKING', STACKING_BEST),
+        version=version,
+    )
+
+
+def get_pricing_rules():
+    """Актуальный набор правил; из базы читается только после изменений"""
+    global _local_rules
+
+    version = get_version(PRICING_VERSION_KEY)
+    local = _local_rules
+    if local is not None and local[0] == version:
+        return local[1]
+
+    with _rules_lock:
+        local = _local_rules
+        if local is None or local[0] != version:
+            local = _local_rules = (version, build_pricing_rules(version))
+        return local[1]
+
+
+def bump_pricing_version():
+    """Сбрасывает скомпилированные правила во всех процессах"""
+    return bump_version(PRICING_VERSION_KEY)
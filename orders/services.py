@@ -0,0 +1,112 @@
+"""
+Оформление заказа.
+
+Заказ и все его позиции собираются в памяти, а в базу пишутся в одной
+транзакции: использование купона (условный UPDATE), одна вставка заказа
+(вместе с хэшем SMS-кода) и один bulk_create для позиций. Число запросов
+не зависит от количества позиций в корзине.
+"""
+import hashlib
+import random
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from .models import Coupon, Order, OrderItem
+
+
+class CouponUnavailable(Exception):
+    """Купон исчерпан параллельными заказами или перестал действовать"""
+
+
+def generate_sms_code():
+    """SMS код из 4 цифр"""
+    return str(random.randint(1000, 9999))
+
+
+def hash_sms_code(sms_code):
+    return hashlib.sha256(sms_code.encode()).hexdigest()
+
+
+def build_order_items(order, cart_items):
+    """Позиции заказа из строк корзины (get_items_with_details) без запросов к базе"""
+    return [
+        OrderItem(
+            order=order,
+            dish_id=item['dish_id'],
+            quantity=item['quantity'],
+            price_at_order=item['price'],
+            dish_name=item['name'],
+            line_total=item['total_price'],
+        )
+        for item in cart_items
+    ]
+
+
+def place_order(cart, summary, coupon=None, **order_fields):
+    """
+    Создает заказ из корзины
+
+    Args:
+        cart: корзина Cart
+        summary: итоги корзины (Cart.get_summary) с учетом купона
+        coupon: примененный купон или None
+        order_fields: данные покупателя (customer_name, phone_number, ...)
+
+    Returns:
+        (заказ, SMS код в открытом виде)
+
+    Raises:
+        CouponUnavailable: купон не удалось использовать, заказ не создан
+    """
+    sms_code = generate_sms_code()
+
+    order = Order(
+        total_cost=summary.subtotal,
+        discount=summary.discount,
+        delivery_cost=summary.delivery_cost,
+        final_cost=summary.final_price,
+        coupon_code=coupon.code if coupon else None,
+        status=Order.STATUS_NEW,
+        sms_code=hash_sms_code(sms_code),
+        sms_code_sent_at=timezone.now(),
+        **order_fields,
+    )
+    items = build_order_items(order, cart.get_items_with_details())
+
+    # Купон и заказ в одной транзакции: если заказ не создастся,
+    # использование купона откатится
+    with transaction.atomic():
+        if coupon and not coupon.mark_as_used():
+            raise CouponUnavailable(coupon.code)
+
+        order.save(force_insert=True)
+        OrderItem.objects.bulk_create(items)
+
+    return order, sms_code
+
+
+def cancel_pending_order(order):
+    """
+    Отменяет неподтвержденный заказ, если покупатель не получил SMS
+
+    Заказ удаляется, а использование купона возвращается: счетчик
+    уменьшается, и купон, выключенный исчерпанным лимитом, снова
+    активен. Покупатель может повторить оформление с тем же купоном.
+    """
+    from .coupons import bump_coupon_version
+
+    with transaction.atomic():
+        deleted, _ = Order.objects.filter(pk=order.pk, is_confirmed=False).delete()
+        if deleted and order.coupon_code:
+            Coupon.objects.filter(code=order.coupon_code, times_used__gt=0).update(
+                times_used=F('times_used') - 1,
+                # В SET используются значения строки до обновления: купон
+                # включается, только если его выключил исчерпанный лимит
+                is_active=Case(
+                    When(times_used__gte=F('max_uses'), then=Value(True)),
+                    default=F('is_active'),
+                ),
+            )
+            transaction.on_commit(bump_coupon_version)
+    return bool(deleted)
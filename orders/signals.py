@@ -1,12 +1,15 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Order
-# from notifications.telegram import send_telegram_message
-# from notifications.email import send_admin_email
-import threading
+from .models import Order, DeliveryRule, Coupon
+from .pricing import bump_pricing_version
+from .coupons import bump_coupon_version
+from .stats import record_order_deleted, record_order_saved
+from notifications.channels import enqueue_admin_notification, escape_for_channel, send_to_admin
+from notifications.jobs import job
 
 
-def build_order_items_text(order):
+def build_order_items_text(order, escape=str):
     """
     Формирует текст состава заказа для Telegram
     """
@@ -14,7 +17,7 @@ def build_order_items_text(order):
 
     for item in order.items.all():
         lines.append(
-            f'• {item.dish_name} ×{item.quantity} — {item.total_price}'
+            f'• {escape(item.dish_name)} ×{item.quantity} — {item.total_price}'
         )
 
     if not lines:
@@ -23,23 +26,24 @@ def build_order_items_text(order):
     return '\n'.join(lines)
 
 
-def notify_admin_async(order_id):
-    from notifications.telegram import send_telegram_message
-    from notifications.email import send_admin_email
-    from .models import Order
-
+@job('orders.order_confirmed')
+def notify_order_confirmed(order_id, channel):
+    """
+    Задача очереди: уведомление администратора о подтвержденном заказе
+    """
     try:
         order = Order.objects.prefetch_related('items').get(id=order_id)
     except Order.DoesNotExist:
         return
 
-    items_text = build_order_items_text(order)
+    escape = escape_for_channel(channel)
+    items_text = build_order_items_text(order, escape)
 
     message_text = (
         f'🧾 *Новый подтверждённый заказ*\n'
         f'ID: `{order.id.hex[:8]}`\n'
-        f'👤 {order.customer_name}\n'
-        f'📞 {order.phone_number}\n'
+        f'👤 {escape(order.customer_name)}\n'
+        f'📞 {escape(order.phone_number)}\n'
         f'💳 Оплата: {order.get_payment_method_display()}\n'
         f'🚚 Доставка: {order.delivery_cost}\n\n'
         f'🍽 Состав заказа:\n'
@@ -47,27 +51,57 @@ def notify_admin_async(order_id):
         f'💰 Сумма: {order.final_cost}\n'
     )
 
-    # ---- EMAIL ----
-    send_admin_email(
-        subject='🧾 Новый подтверждённый заказ',
-        message=message_text
-    )
-
-    # ---- TELEGRAM ----
-    send_telegram_message(message_text)
+    send_to_admin(channel, '🧾 Новый подтверждённый заказ', message_text)
 
 
 @receiver(post_save, sender=Order)
 def order_confirmed_notify(sender, instance, **kwargs):
     """
     Уведомляем админа ТОЛЬКО когда заказ подтверждён по SMS
+
+    Сигнал только ставит задачу в очередь, отправляет ее run_jobs.
     """
     if not instance.tracker.has_changed('is_confirmed'):
         return
 
     if instance.tracker.previous('is_confirmed') is False and instance.is_confirmed is True:
-        threading.Thread(
-            target=notify_admin_async,
-            args=(instance.id,),
-            daemon=True
-        ).start()
+        enqueue_admin_notification(
+            'orders.order_confirmed',
+            f'order:{instance.id}:confirmed',
+            order_id=str(instance.id),
+        )
+
+
+@receiver(post_save, sender=Order)
+def order_stats_saved(sender, instance, created, **kwargs):
+    """
+    Счетчики заказов по дням и статусам для админки
+    """
+    record_order_saved(instance, created)
+
+
+@receiver(post_delete, sender=Order)
+def order_stats_deleted(sender, instance, **kwargs):
+    record_order_deleted(instance)
+
+
+@receiver(post_save, sender=DeliveryRule)
+@receiver(post_delete, sender=DeliveryRule)
+def delivery_rules_changed(sender, **kwargs):
+    """
+    Набор правил цен пересобирается только после изменения тарифов
+
+    Версия меняется после коммита, чтобы параллельный запрос не собрал
+    правила из старых строк под новой версией.
+    """
+    transaction.on_commit(bump_pricing_version)
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def coupons_changed(sender, **kwargs):
+    """
+    Индекс купонов сбрасывается при изменении купонов в админке
+    (после коммита, как и в Coupon.mark_as_used)
+    """
+    transaction.on_commit(bump_coupon_version)
@@ -0,0 +1,88 @@
+"""
+SMS-провайдеры для кодов подтверждения заказа.
+
+Клиент провайдера асинхронный: checkout ждет ответа шлюза в цикле
+событий и не держит поток на время запроса. Провайдер задается
+настройками SMS_PROVIDER (путь к классу) и SMS_PROVIDER_OPTIONS
+(аргументы конструктора). FakeSMSProvider ничего не отправляет и
+используется для разработки, тестов и нагрузочного теста.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_providers = {}
+
+
+class SMSError(Exception):
+    """Провайдер не смог отправить SMS"""
+
+
+class BaseSMSProvider:
+    """Интерфейс провайдера"""
+
+    async def send(self, phone, text):
+        """
+        Отправляет SMS
+
+        Returns:
+            словарь с ответом провайдера (как минимум message_id)
+
+        Raises:
+            SMSError: сообщение не отправлено
+        """
+        raise NotImplementedError
+
+
+class FakeSMSProvider(BaseSMSProvider):
+    """
+    Локальный провайдер: имитирует задержку шлюза и пишет сообщение в лог
+
+    Args:
+        latency: задержка ответа, секунды
+        fail: всегда отвечать ошибкой
+        echo: писать сообщения с уровнем INFO (иначе DEBUG)
+    """
+
+    def __init__(self, latency=0, fail=False, echo=False):
+        self.latency = latency
+        self.fail = fail
+        self.echo = echo
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send(self, phone, text):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.fail:
+                raise SMSError('Fake SMS provider failure')
+
+            self.sent.append((phone, text))
+            logger.log(logging.INFO if self.echo else logging.DEBUG, 'SMS to %s: %s', phone, text)
+            return {'success': True, 'message_id': f'fake-{len(self.sent)}'}
+        finally:
+            self.in_flight -= 1
+
+
+def get_sms_provider():
+    """Провайдер из настроек (один экземпляр на процесс и набор настроек)"""
+    path = getattr(settings, 'SMS_PROVIDER', 'orders.sms.FakeSMSProvider')
+    options = getattr(settings, 'SMS_PROVIDER_OPTIONS', {})
+
+    key = (path, repr(sorted(options.items())))
+    provider = _providers.get(key)
+    if provider is None:
+        provider = _providers[key] = import_string(path)(**options)
+    return provider
+
+
+def order_code_message(sms_code):
+    return f"Код подтверждения заказа: {sms_code}"
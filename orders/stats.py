@@ -0,0 +1,143 @@
+"""
+Счетчики заказов по дням и статусам (OrderDailyStat).
+
+Вместо COUNT/SUM по всей таблице заказов админка читает несколько строк
+счетчиков. Счетчики меняются инкрементально из сигналов заказа: новый
+заказ добавляет единицу к (день, статус), смена статуса или суммы
+переносит заказ между строками, удаление вычитает. Изменения, сделанные
+в обход save() (queryset.update), исправляет rebuild_order_stats().
+
+По этим же счетчикам пагинатор списка заказов в админке узнает число
+записей, когда список отфильтрован только по статусу и дате.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+ZERO = Decimal('0')
+
+
+def order_date(created_at):
+    """День заказа в текущем часовом поясе"""
+    if timezone.is_aware(created_at):
+        created_at = timezone.localtime(created_at)
+    return created_at.date()
+
+
+def apply_delta(date, status, count, amount):
+    """Атомарно меняет счетчики строки (день, статус)"""
+    from .models import OrderDailyStat
+
+    if not count and not amount:
+        return
+
+    changes = {
+        'orders_count': F('orders_count') + count,
+        'final_cost_sum': F('final_cost_sum') + amount,
+    }
+    if OrderDailyStat.objects.filter(date=date, status=status).update(**changes):
+        return
+
+    try:
+        with transaction.atomic():
+            OrderDailyStat.objects.create(date=date, status=status, orders_count=count, final_cost_sum=amount)
+    except IntegrityError:
+        # Строку одновременно создал другой запрос
+        OrderDailyStat.objects.filter(date=date, status=status).update(**changes)
+
+
+def record_order_saved(order, created):
+    """Учитывает сохранение заказа (вызывается из post_save)"""
+    date = order_date(order.created_at)
+    final_cost = order.final_cost or ZERO
+
+    if created:
+        apply_delta(date, order.status, 1, final_cost)
+        return
+
+    tracker = order.tracker
+    if not (tracker.has_changed('status') or tracker.has_changed('final_cost')):
+        return
+
+    previous_status = tracker.previous('status') or order.status
+    previous_cost = tracker.previous('final_cost')
+    previous_cost = ZERO if previous_cost is None else previous_cost
+
+    if previous_status == order.status:
+        apply_delta(date, order.status, 0, final_cost - previous_cost)
+    else:
+        apply_delta(date, previous_status, -1, -previous_cost)
+        apply_delta(date, order.status, 1, final_cost)
+
+
+def record_order_deleted(order):
+    """Учитывает удаление заказа (вызывается из post_delete)"""
+    apply_delta(order_date(order.created_at), order.status, -1, -(order.final_cost or ZERO))
+
+
+def rebuild_order_stats():
+    """Пересчитывает все счетчики по таблице заказов; возвращает число строк"""
+    from .models import Order, OrderDailyStat
+
+    rows = (
+        Order.objects
+        .annotate(date=TruncDate('created_at'))
+        .values('date', 'status')
+        .annotate(orders_count=Count('id'), final_cost_sum=Sum('final_cost'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        OrderDailyStat.objects.all().delete()
+        OrderDailyStat.objects.bulk_create(
+            OrderDailyStat(
+                date=row['date'],
+                status=row['status'],
+                orders_count=row['orders_count'],
+                final_cost_sum=row['final_cost_sum'] or ZERO,
+            )
+            for row in rows
+        )
+        return OrderDailyStat.objects.count()
+
+
+def counted_orders(status=None, **date):
+    """
+    Число заказов по счетчикам (вместо COUNT(*) по таблице заказов)
+
+    Args:
+        status: только заказы с этим статусом
+        date: части дня заказа - year, month, day (как в date_hierarchy)
+    """
+    from .models import OrderDailyStat
+
+    stats = OrderDailyStat.objects.all()
+    if status is not None:
+        stats = stats.filter(status=status)
+    stats = stats.filter(**{f'date__{part}': value for part, value in date.items()})
+    return stats.aggregate(count=Sum('orders_count'))['count'] or 0
+
+
+def status_totals(since=None):
+    """
+    Количество и сумма заказов по статусам
+
+    Args:
+        since: учитывать дни начиная с этой даты (None - за все время)
+    """
+    from .models import OrderDailyStat
+
+    stats = OrderDailyStat.objects.all()
+    if since is not None:
+        stats = stats.filter(date__gte=since)
+
+    return {
+        row['status']: (row['orders_count'], row['final_cost_sum'] or ZERO)
+        for row in stats.values('status').annotate(
+            orders_count=Sum('orders_count'),
+            final_cost_sum=Sum('final_cost_sum'),
+        ).order_by()
+    }
@@ -1,3 +1,514 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from menu.models import Category, MenuItem
+from menu.snapshot import get_menu_snapshot
+from .cart import CART_SCHEMA_VERSION, Cart, decode_cart
+from .coupons import get_coupon_index
+from .models import Coupon, DeliveryRule, Order, OrderDailyStat
+from .pricing import STACKING_BEST, STACKING_SUM, PricingRules, get_pricing_rules
+from .sms import get_sms_provider
+from .stats import order_date, rebuild_order_stats, status_totals
+
+CHECKOUT_DATA = {
+    'agree': 'on',
+    'customer_name': 'Customer',
+    'phone_number': '+70000000000',
+    'delivery_address': 'Street 1',
+    'payment_method': 'cash',
+}
+
+
+def create_dish(price='20.00'):
+    category = Category.objects.create(name='Main')
+    return MenuItem.objects.create(
+        name='Dish',
+        description='Description',
+        ingredients='Ingredients',
+        price=Decimal(price),
+        category=category,
+        is_delivery=True,
+    )
+
+
+def create_coupon(code='PROMO', max_uses=1):
+    now = timezone.now()
+    return Coupon.objects.create(
+        code=code,
+        discount_percent=10,
+        valid_from=now - timedelta(days=1),
+        valid_until=now + timedelta(days=1),
+        max_uses=max_uses,
+    )
+
+
+def client_with_cart(dish, coupon_code=None):
+    """Клиент с одним блюдом в корзине и, при желании, примененным купоном"""
+    client = Client()
+    session = client.session
+    price_cents = int(dish.price * 100)
+    session[settings.CART_SESSION_ID] = {'v': CART_SCHEMA_VERSION, 'items': [[dish.id, 2, price_cents]]}
+    if coupon_code:
+        session['applied_coupon'] = coupon_code
+    session.save()
+    return client
+
+
+# Запросы к базе из async checkout выполняются в потоке запроса, внутри
+# транзакции теста
+IN_REQUEST_THREAD = override_settings(ASYNC_DB_THREADS=0)
+
+
+# Корзина формата 1 - как ее сохраняли до версии схемы
+LEGACY_CART = {
+    '7': {'quantity': 2, 'price': '12.50', 'name': 'Soup', 'image': '', 'description': '-', 'cooking_time': 10},
+    '12': {'quantity': 1, 'price': '3.05', 'name': 'Tea', 'image': '', 'description': '-', 'cooking_time': 2},
+    'coupon': {'quantity': 1, 'price': '0'},
+}
+
+
+class CartSchemaTest(TestCase):
+
+    def test_legacy_cart_is_decoded(self):
+        cart = decode_cart(LEGACY_CART)
+
+        self.assertEqual(cart, {
+            7: {'quantity': 2, 'price': Decimal('12.50')},
+            12: {'quantity': 1, 'price': Decimal('3.05')},
+        })
+        self.assertIsInstance(cart[7]['price'], Decimal)
+
+    def test_legacy_cart_is_saved_in_current_format(self):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        request.session[settings.CART_SESSION_ID] = LEGACY_CART
+
+        cart = Cart(request)
+
+        self.assertEqual(request.session[settings.CART_SESSION_ID], {
+            'v': CART_SCHEMA_VERSION,
+            'items': [[7, 2, 1250], [12, 1, 305]],
+        })
+        self.assertTrue(request.session.modified)
+        self.assertEqual(cart.get_total_price(), Decimal('28.05'))
+        # Перезаписанная корзина читается так же
+        self.assertEqual(decode_cart(request.session[settings.CART_SESSION_ID]), cart.cart)
+
+
+@override_settings(FIXED_DELIVERY_COST=5, FREE_DELIVERY_THRESHOLD=100)
+class CartSummaryTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.dish = create_dish()
+        self.other = MenuItem.objects.create(
+            name='Other', description='-', ingredients='-', price=Decimal('45.00'),
+            category=self.dish.category, is_delivery=True,
+        )
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        self.cart = Cart(request)
+        self.cart.add(self.dish, quantity=2)
+
+    def count_quotes(self):
+        return mock.patch.object(PricingRules, 'quote', autospec=True, side_effect=PricingRules.quote)
+
+    def test_summary_is_computed_once_per_coupon_and_method(self):
+        coupon = create_coupon()
+
+        with self.count_quotes() as quote:
+            summary = self.cart.get_summary()
+            self.assertIs(self.cart.get_summary(), summary)
+            discounted = self.cart.get_summary(coupon)
+            self.assertIs(self.cart.get_summary(coupon), discounted)
+            pickup = self.cart.get_summary(delivery_method='pickup')
+
+        self.assertEqual(quote.call_count, 3)
+        self.assertEqual((summary.subtotal, summary.discount, summary.delivery_cost), (40, 0, 5))
+        self.assertEqual((summary.item_count, summary.unique_item_count), (2, 1))
+        self.assertEqual((discounted.discount, discounted.final_price), (Decimal('4.00'), Decimal('41.00')))
+        self.assertEqual(pickup.final_price, 40)
+
+    def test_changes_invalidate_summary(self):
+        summary = self.cart.get_summary()
+
+        self.cart.add(self.other)
+        added = self.cart.get_summary()
+        self.assertIsNot(added, summary)
+        self.assertEqual((added.subtotal, added.delivery_cost, added.item_count), (85, 5, 3))
+
+        self.cart.update_quantity(self.other.id, 2)
+        updated = self.cart.get_summary()
+        self.assertEqual((updated.subtotal, updated.delivery_cost, updated.item_count), (130, 0, 4))
+
+        self.cart.remove(self.other)
+        removed = self.cart.get_summary()
+        self.assertEqual((removed.subtotal, removed.item_count, removed.unique_item_count), (40, 2, 1))
+
+    def test_cart_update_prices_the_cart_once(self):
+        client = client_with_cart(self.dish)
+
+        with self.count_quotes() as quote:
+            response = client.post(reverse('orders:cart_update'), {'dish_id': self.dish.id, 'quantity': 3})
+
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual((data['quantity'], data['item_total']), (3, 60.0))
+        self.assertEqual((data['cart_item_count'], data['cart_total']), (3, 60.0))
+        self.assertEqual(quote.call_count, 1)
+
+
+@override_settings(FIXED_DELIVERY_COST=5, FREE_DELIVERY_THRESHOLD=100)
+class PricingRulesTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tier_selection_and_derived_values(self):
+        rules = PricingRules({'courier': [(0, 7), (50, 3), (120, 0)]})
+
+        self.assertEqual(rules.delivery_cost(Decimal('10'), 'courier'), 7)
+        self.assertEqual(rules.delivery_cost(Decimal('50'), 'courier'), 3)
+        self.assertEqual(rules.delivery_cost(Decimal('500'), 'courier'), 0)
+        self.assertEqual(rules.fixed_delivery_cost('courier'), 7)
+        self.assertEqual(rules.free_delivery_threshold('courier'), 120)
+        self.assertIsNone(PricingRules({'courier': [(0, 7)]}).free_delivery_threshold('courier'))
+
+        # Доставка считается от суммы после скидки
+        quote = rules.quote(Decimal('55'), coupons=[create_coupon()])
+        self.assertEqual(quote.discount, Decimal('5.50'))
+        self.assertEqual(quote.delivery_cost, 7)
+        self.assertEqual(quote.final_price, Decimal('56.50'))
+
+    def test_coupon_stacking(self):
+        percent = create_coupon('TEN')
+        amount = create_coupon('FIVE')
+        amount.discount_percent = 0
+        amount.discount_amount = Decimal('15')
+
+        best = PricingRules({}, coupon_stacking=STACKING_BEST)
+        self.assertEqual(best.discount(Decimal('100'), [percent, amount]), Decimal('15.00'))
+
+        total = PricingRules({}, coupon_stacking=STACKING_SUM)
+        self.assertEqual(total.discount(Decimal('100'), [percent, amount]), Decimal('25.00'))
+        # Скидка не больше суммы заказа
+        self.assertEqual(total.discount(Decimal('12'), [percent, amount]), Decimal('12'))
+
+    def test_settings_fallback_per_method_and_invalidation(self):
+        rules = get_pricing_rules()
+        self.assertEqual(rules.delivery_cost(Decimal('20'), 'courier'), 5)
+        self.assertEqual(rules.delivery_cost(Decimal('100'), 'courier'), 0)
+        self.assertEqual(rules.delivery_cost(Decimal('20'), 'pickup'), 0)
+
+        # Тариф только для самовывоза не делает курьера бесплатным
+        with self.captureOnCommitCallbacks(execute=True):
+            DeliveryRule.objects.create(delivery_method='pickup', min_order_amount=0, fee=Decimal('1'))
+            # До коммита действуют прежние правила
+            self.assertIs(get_pricing_rules(), rules)
+        rules = get_pricing_rules()
+        self.assertEqual(rules.delivery_cost(Decimal('20'), 'pickup'), 1)
+        self.assertEqual(rules.delivery_cost(Decimal('20'), 'courier'), 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rule = DeliveryRule.objects.create(delivery_method='courier', min_order_amount=0, fee=Decimal('9'))
+        self.assertEqual(get_pricing_rules().delivery_cost(Decimal('20'), 'courier'), 9)
+
+        # Без изменений правила не перечитываются из базы
+        with self.assertNumQueries(0):
+            self.assertIs(get_pricing_rules(), get_pricing_rules())
+
+        rule.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        self.assertEqual(get_pricing_rules().delivery_cost(Decimal('20'), 'courier'), 5)
+
+
+@IN_REQUEST_THREAD
+class CouponRedemptionTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.dish = create_dish()
+
+    def test_mark_as_used_respects_limit(self):
+        coupon = create_coupon(max_uses=2)
+
+        self.assertTrue(coupon.mark_as_used())
+        self.assertTrue(coupon.mark_as_used())
+        self.assertFalse(coupon.mark_as_used())
+
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.times_used, 2)
+        self.assertFalse(coupon.is_active)
+
+    def test_coupon_lookup_is_cached(self):
+        create_coupon()
+        client = client_with_cart(self.dish, 'PROMO')
+        client.post(reverse('orders:cart_summary'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('orders:cart_summary'))
+
+        self.assertEqual(response.json()['discount'], 4.0)
+        self.assertFalse(any('orders_coupon' in query['sql'] for query in queries))
+
+    def test_failed_order_rolls_back_redemption(self):
+        coupon = create_coupon()
+        client = client_with_cart(self.dish, 'PROMO')
+
+        with mock.patch('orders.services.OrderItem.objects.bulk_create', side_effect=RuntimeError('boom')):
+            response = client.post(reverse('orders:checkout'), CHECKOUT_DATA)
+
+        self.assertFalse(response.json()['success'])
+        self.assertFalse(Order.objects.exists())
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.times_used, 0)
+        self.assertTrue(coupon.is_active)
+
+
+@IN_REQUEST_THREAD
+class PlaceOrderTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Main')
+        self.dishes = MenuItem.objects.bulk_create(
+            MenuItem(
+                name=f'Dish {index}',
+                description='Description',
+                ingredients='Ingredients',
+                price=Decimal('10.00'),
+                category=category,
+                is_delivery=True,
+            )
+            for index in range(10)
+        )
+        get_menu_snapshot()
+
+    def place(self, dishes):
+        client = Client()
+        session = client.session
+        session[settings.CART_SESSION_ID] = {
+            'v': CART_SCHEMA_VERSION,
+            'items': [[dish.id, 1, 1000] for dish in dishes],
+        }
+        session.save()
+        client.post(reverse('orders:cart_summary'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(reverse('orders:checkout'), CHECKOUT_DATA)
+
+        self.assertTrue(response.json()['success'])
+        return Order.objects.get(pk=response.json()['order_id']), len(queries)
+
+    def test_query_count_does_not_grow_with_lines(self):
+        # Первый заказ за день создает строку счетчиков OrderDailyStat
+        self.place(self.dishes[:1])
+
+        _, single_line_queries = self.place(self.dishes[:1])
+        order, ten_line_queries = self.place(self.dishes)
+
+        self.assertEqual(single_line_queries, ten_line_queries)
+        self.assertEqual(order.items.count(), 10)
+        self.assertEqual(order.final_cost, Decimal('100.00'))
+        self.assertEqual({item.line_total for item in order.items.all()}, {Decimal('10.00')})
+        self.assertTrue(order.sms_code)
+
+
+class OrderStatsTest(TestCase):
+
+    def create_order(self, final_cost='30.00'):
+        return Order.objects.create(
+            customer_name='Test',
+            phone_number='+70000000000',
+            delivery_address='Street 1',
+            payment_method=Order.PAYMENT_CASH,
+            total_cost=Decimal(final_cost),
+            final_cost=Decimal(final_cost),
+        )
+
+    def counters(self):
+        return {
+            status: (count, amount)
+            for status, (count, amount) in status_totals().items()
+            if count
+        }
+
+    def test_counters_follow_order_changes(self):
+        first = self.create_order('30.00')
+        second = self.create_order('20.00')
+        self.assertEqual(self.counters(), {Order.STATUS_NEW: (2, Decimal('50.00'))})
+
+        first.status = Order.STATUS_CONFIRMED
+        first.save()
+        self.assertEqual(self.counters(), {
+            Order.STATUS_NEW: (1, Decimal('20.00')),
+            Order.STATUS_CONFIRMED: (1, Decimal('30.00')),
+        })
+
+        second.delete()
+        self.assertEqual(self.counters(), {Order.STATUS_CONFIRMED: (1, Decimal('30.00'))})
+
+    def test_rebuild_matches_incremental_counters(self):
+        for cost in ('10.00', '15.00', '25.00'):
+            self.create_order(cost)
+        Order.objects.filter(final_cost=Decimal('25.00')).update(status=Order.STATUS_CANCELLED)
+        incremental = self.counters()
+
+        rebuild_order_stats()
+
+        self.assertEqual(self.counters(), {
+            Order.STATUS_NEW: (2, Decimal('25.00')),
+            Order.STATUS_CANCELLED: (1, Decimal('25.00')),
+        })
+        self.assertNotEqual(incremental, self.counters())
+        self.assertEqual(OrderDailyStat.objects.count(), 2)
+
+    def test_changelist_counts_from_daily_stats(self):
+        for cost in ('10.00', '15.00', '25.00'):
+            self.create_order(cost)
+        Order.objects.filter(final_cost=Decimal('25.00')).update(status=Order.STATUS_CANCELLED)
+        rebuild_order_stats()
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        url = reverse('admin:orders_order_changelist')
+        today = order_date(timezone.now())
+
+        def order_counts(params):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            counts = [
+                query['sql'] for query in queries.captured_queries
+                if 'COUNT(' in query['sql'] and '"orders_order"' in query['sql']
+            ]
+            return response.context['cl'].result_count, counts
+
+        # Статус и дата - из счетчиков, без COUNT(*) по заказам
+        for params, expected in (
+            ({}, 3),
+            ({'status__exact': Order.STATUS_NEW}, 2),
+            ({'created_at__year': today.year, 'created_at__month': today.month, 'q': ''}, 3),
+        ):
+            self.assertEqual(order_counts(params), (expected, []))
+
+        # Поиск и другие фильтры считаются по таблице
+        count, counts = order_counts({'q': 'Test', 'payment_method__exact': Order.PAYMENT_CASH})
+        self.assertEqual(count, 3)
+        self.assertEqual(len(counts), 1)
+
+
+@IN_REQUEST_THREAD
+class AsyncCheckoutTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.dish = create_dish()
+
+    def test_code_from_provider_confirms_order(self):
+        client = client_with_cart(self.dish)
+
+        with self.assertLogs('orders.sms', 'DEBUG') as logs:
+            response = client.post(reverse('orders:checkout'), CHECKOUT_DATA)
+        self.assertTrue(response.json()['success'])
+
+        phone, text = get_sms_provider().sent[-1]
+        self.assertEqual(phone, CHECKOUT_DATA['phone_number'])
+        # Код не печатается в консоль, а пишется в лог с уровнем DEBUG
+        self.assertEqual(logs.output, [f'DEBUG:orders.sms:SMS to {phone}: {text}'])
+        sms_code = text.rsplit(' ', 1)[-1]
+
+        response = client.post(reverse('orders:verify_sms'), {'sms_code': sms_code})
+        self.assertTrue(response.json()['success'])
+
+        order = Order.objects.get()
+        self.assertTrue(order.is_confirmed)
+        self.assertEqual(order.status, Order.STATUS_CONFIRMED)
+        self.assertNotIn(settings.CART_SESSION_ID, client.session)
+
+    @override_settings(SMS_PROVIDER_OPTIONS={'fail': True})
+    def test_provider_failure_is_reported(self):
+        coupon = create_coupon()
+        client = client_with_cart(self.dish, coupon_code=coupon.code)
+
+        response = client.post(reverse('orders:checkout'), CHECKOUT_DATA)
+
+        self.assertFalse(response.json()['success'])
+        self.assertIn('SMS', response.json()['message'])
+
+        # Заказ отменен, купон возвращен и снова применен в сессии
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.times_used, 0)
+        self.assertTrue(coupon.is_active)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(client.session['applied_coupon'], coupon.code)
+        self.assertNotIn('pending_order_id', client.session)
+
+
+# Сессии в кэше: в SQLite параллельная запись сессий упирается в блокировку
+# таблицы, а проверяется здесь только купон
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache')
+class ConcurrentCouponCheckoutTest(TransactionTestCase):
+    """Параллельные оформления заказа не используют купон сверх лимита"""
+
+    CHECKOUTS = 8
+    MAX_USES = 3
+
+    def setUp(self):
+        cache.clear()
+
+    def test_parallel_checkouts_do_not_over_redeem(self):
+        dish = create_dish()
+        coupon = create_coupon(max_uses=self.MAX_USES)
+        clients = [client_with_cart(dish, coupon.code) for _ in range(self.CHECKOUTS)]
+
+        # Индекс купонов и снимок меню прогреты, как на работающем сайте:
+        # параллельно идет только оформление заказа
+        get_coupon_index()
+        get_menu_snapshot()
+
+        barrier = threading.Barrier(self.CHECKOUTS)
+        results = []
+
+        def checkout(client):
+            # SQLite в тестах отвечает на одновременную запись ошибкой
+            # блокировки: такой запрос считается неуспешным заказом
+            client.raise_request_exception = False
+            try:
+                barrier.wait()
+                results.append(client.post(reverse('orders:checkout'), CHECKOUT_DATA))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        coupon.refresh_from_db()
+        orders_with_coupon = Order.objects.filter(coupon_code=coupon.code).count()
+
+        successful = [
+            response for response in results
+            if response.status_code == 200 and response.json()['success']
+        ]
+
+        self.assertEqual(len(results), self.CHECKOUTS)
+        self.assertEqual(len(successful), orders_with_coupon)
+        self.assertLessEqual(coupon.times_used, self.MAX_USES)
+        self.assertEqual(coupon.times_used, orders_with_coupon)
+        # Купон достался хотя бы одному заказу и выключен, только если
+        # лимит исчерпан
+        self.assertGreater(orders_with_coupon, 0)
+        self.assertEqual(coupon.is_active, coupon.times_used < self.MAX_USES)
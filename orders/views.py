@@ -2,59 +2,70 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.views.decorators.http import require_POST
 from django.http import JsonResponse
+from analytics.recommendations import suggest_dishes
+from web_restaurant.async_db import run_db
 from .cart import Cart
-from menu.models import MenuItem
-from .models import Coupon, Order, OrderItem
-import hashlib
-import random
-import django.utils.timezone as timezone
+from .pricing import get_pricing_rules
+from .coupons import get_coupon
+from .models import Order
+from .services import CouponUnavailable, cancel_pending_order, hash_sms_code, place_order
+from .sms import SMSError, get_sms_provider, order_code_message
+import logging
 
+logger = logging.getLogger(__name__)
 
-def cart_detail(request):
-    cart = Cart(request)
-    cart_items = list(cart)
 
-    total_price = cart.get_total_price()
+def get_applied_coupon(request, cart, forget_invalid=False):
+    """
+    Купон из сессии, если он существует и действует для текущей корзины
 
-    # --- купон ---
+    Args:
+        forget_invalid: удалить недействительный купон из сессии
+    """
     coupon_code = request.session.get('applied_coupon')
-    discount = 0
-    applied_coupon = None
-
-    if coupon_code:
-        try:
-            coupon = Coupon.objects.get(code=coupon_code)
-            if coupon.is_valid(order_amount=total_price):
-                discount = coupon.calculate_discount(total_price)
-                applied_coupon = coupon
-            else:
-                del request.session['applied_coupon']
-        except Coupon.DoesNotExist:
-            del request.session['applied_coupon']
+    if not coupon_code:
+        return None
 
-    # ✅ subtotal после скидки
-    cart_subtotal = max(total_price - discount, 0)
+    # Купон ищется в кэшированном индексе, без запроса к базе
+    coupon = get_coupon(coupon_code)
+    if coupon is not None and coupon.is_valid(order_amount=cart.get_total_price()):
+        return coupon
 
-    # доставка считается от subtotal
-    delivery_cost = cart.get_delivery_cost(cart_subtotal)
+    if forget_invalid:
+        del request.session['applied_coupon']
+    return None
 
-    # итог
-    final_price = cart_subtotal + delivery_cost
+
+def cart_detail(request):
+    cart = Cart(request)
+    cart_items = list(cart)
+
+    # --- купон ---
+    applied_coupon = get_applied_coupon(request, cart, forget_invalid=True)
+
+    # Итоги корзины считаются один раз: subtotal после скидки,
+    # доставка от subtotal и итог
+    summary = cart.get_summary(applied_coupon)
+    rules = get_pricing_rules()
 
     context = {
         'cart': cart,
         'cart_items': cart_items,
+        'summary': summary,
 
-        'total_price': total_price,
-        'discount': discount,
-        'cart_subtotal': cart_subtotal,
-        'delivery_cost': delivery_cost,
-        'final_price': final_price,
+        'total_price': summary.subtotal,
+        'discount': summary.discount,
+        'cart_subtotal': summary.cart_subtotal,
+        'delivery_cost': summary.delivery_cost,
+        'final_price': summary.final_price,
 
         'applied_coupon': applied_coupon,
 
-        'free_delivery_threshold': 100,
-        'fixed_delivery_cost': 5,
+        'free_delivery_threshold': rules.free_delivery_threshold(),
+        'fixed_delivery_cost': rules.fixed_delivery_cost(),
+
+        # Из индекса в памяти процесса, без запросов к базе
+        'recommendations': suggest_dishes(cart.cart.keys()),
     }
 
     return render(request, 'orders/cart_detail.html', context)
@@ -77,58 +88,40 @@ def cart_update(request):
         'message': '',
         'item_removed': False,
         'item_total': 0,
-        'cart_item_count': cart.get_item_count(),
-        'cart_total': float(cart.get_total_price()),
     }
 
     if dish_id:
-        if action == 'remove':
+        if action == 'remove' or (quantity and quantity.isdigit() and int(quantity) == 0):
             # Удалить товар из корзины
-            try:
-                dish = MenuItem.objects.get(id=dish_id)
-                cart.remove(dish)
+            if dish_id in cart:
+                cart.remove(dish_id)
                 response_data.update({
                     'success': True,
                     'item_removed': True,
-                    'cart_item_count': cart.get_item_count(),
-                    'cart_total': float(cart.get_total_price())
                 })
-            except MenuItem.DoesNotExist:
+            else:
                 response_data['message'] = 'Item not found'
 
         elif quantity and quantity.isdigit():
             # Обновить количество
-            quantity = int(quantity)
-            if cart.update_quantity(dish_id, quantity):
-                if quantity == 0:
-                    # Если количество стало 0, удаляем товар
-                    try:
-                        dish = MenuItem.objects.get(id=dish_id)
-                        cart.remove(dish)
-                        response_data.update({
-                            'success': True,
-                            'item_removed': True,
-                            'cart_item_count': cart.get_item_count(),
-                            'cart_total': float(cart.get_total_price()),
-                        })
-                    except MenuItem.DoesNotExist:
-                        response_data['message'] = 'Item not found'
-                else:
-                    # Получаем обновленную информацию о позиции
-                    for item in cart.get_items_with_details():
-                        if str(item['dish_id']) == str(dish_id):
-                            response_data.update({
-                                'success': True,
-                                'quantity': item['quantity'],
-                                'item_total': float(item['total_price']),  # Конвертируем Decimal в float для JSON
-                                'item_removed': False,
-                                'cart_item_count': cart.get_item_count(),
-                                'cart_total': float(cart.get_total_price()),
-                            })
-                            break
+            if cart.update_quantity(dish_id, int(quantity)):
+                # Получаем обновленную информацию о позиции
+                line = cart.get_line(dish_id)
+                response_data.update({
+                    'success': True,
+                    'quantity': line['quantity'],
+                    'item_total': float(line['total_price']),  # Конвертируем Decimal в float для JSON
+                    'item_removed': False,
+                })
             else:
                 response_data['message'] = 'Item not found in cart'
 
+    summary = cart.get_summary()
+    response_data.update({
+        'cart_item_count': summary.item_count,
+        'cart_total': float(summary.subtotal),
+    })
+
     return JsonResponse(response_data)
 
 
@@ -144,64 +137,44 @@ def apply_coupon(request):
         messages.error(request, 'Please enter a coupon code')
         return redirect('orders:cart_detail')
 
-    try:
-        coupon = Coupon.objects.get(code=coupon_code)
-
-        if coupon.is_valid(order_amount=cart.get_total_price()):
-            request.session['applied_coupon'] = coupon_code
-            return JsonResponse({
-                'success': True
-            })
+    coupon = get_coupon(coupon_code)
 
+    if coupon is None:
         return JsonResponse({
             'success': False,
-            'message': 'Coupon is not valid for this order'
+            'message': 'Invalid coupon code'
         })
 
-    except Coupon.DoesNotExist:
+    if coupon.is_valid(order_amount=cart.get_total_price()):
+        request.session['applied_coupon'] = coupon_code
         return JsonResponse({
-            'success': False,
-            'message': 'Invalid coupon code'
+            'success': True
         })
 
+    return JsonResponse({
+        'success': False,
+        'message': 'Coupon is not valid for this order'
+    })
+
 
 @require_POST
 def update_totals(request):
     cart = Cart(request)
 
-    # Базовая сумма товаров
-    subtotal = cart.get_total_price()
-
-    # Купон
-    discount = 0
-    coupon_code = request.session.get('applied_coupon')
-
-    if coupon_code:
-        try:
-            coupon = Coupon.objects.get(code=coupon_code)
-            if coupon.is_valid(subtotal):
-                discount = coupon.calculate_discount(subtotal)
-        except Coupon.DoesNotExist:
-            pass
-
-    # Subtotal с учётом скидки
-    cart_subtotal = max(subtotal - discount, 0)
-
-    # Доставка считается от суммы ПОСЛЕ скидки
-    delivery_cost = cart.get_delivery_cost(cart_subtotal)
-
-    # Итог
-    order_total = cart_subtotal + delivery_cost
+    # Купон и итоги: доставка считается от суммы ПОСЛЕ скидки
+    coupon = get_applied_coupon(request, cart)
+    summary = cart.get_summary(coupon)
+    rules = get_pricing_rules()
 
     return JsonResponse({
         'success': True,
-        'subtotal': float(subtotal),
-        'discount': float(discount),
-        'cart_subtotal': float(cart_subtotal),
-        'delivery_cost': float(delivery_cost),
-        'order_total': float(order_total),
-        'free_delivery_threshold': 100,
-        'fixed_delivery_cost': 5,
+        'subtotal': float(summary.subtotal),
+        'discount': float(summary.discount),
+        'cart_subtotal': float(summary.cart_subtotal),
+        'delivery_cost': float(summary.delivery_cost),
+        'order_total': float(summary.final_price),
+        'free_delivery_threshold': float(rules.free_delivery_threshold() or 0),
+        'fixed_delivery_cost': float(rules.fixed_delivery_cost()),
     })
 
 
@@ -226,42 +199,40 @@ def cart_summary(request):
     """
     cart = Cart(request)
 
-    # Получаем скидку
-    coupon_code = request.session.get('applied_coupon')
-    discount = 0
-    # applied_coupon = None
-
-    if coupon_code:
-        try:
-            applied_coupon = Coupon.objects.get(code=coupon_code)
-            if applied_coupon.is_valid(order_amount=cart.get_total_price()):
-                discount = applied_coupon.calculate_discount(cart.get_total_price())
-        except Coupon.DoesNotExist:
-            pass
-
-    # Рассчитываем суммы
-    total_price = cart.get_total_price()
-    delivery_cost = cart.get_delivery_cost(total_price)
-    final_price = cart.get_final_price(discount)
+    # Получаем скидку и считаем все суммы за один проход
+    coupon = get_applied_coupon(request, cart)
+    summary = cart.get_summary(coupon)
+    rules = get_pricing_rules()
 
     return JsonResponse({
         'success': True,
-        'total_price': float(total_price),
-        'discount': float(discount),
-        'delivery_cost': float(delivery_cost),
-        'final_price': float(final_price),
-        'free_delivery_threshold': 100,
-        'fixed_delivery_cost': 5,
-        'item_count': cart.get_item_count(),
-        'unique_item_count': cart.get_unique_item_count(),
-        'is_empty': cart.is_empty(),
+        'total_price': float(summary.subtotal),
+        'discount': float(summary.discount),
+        'delivery_cost': float(summary.delivery_cost),
+        'final_price': float(summary.final_price),
+        'free_delivery_threshold': float(rules.free_delivery_threshold() or 0),
+        'fixed_delivery_cost': float(rules.fixed_delivery_cost()),
+        'item_count': summary.item_count,
+        'unique_item_count': summary.unique_item_count,
+        'is_empty': summary.is_empty,
     })
 
 
-@require_POST
-def checkout(request):
+def coupon_unavailable(request):
+    """Ответ checkout, когда примененный купон больше не действует"""
+    request.session.pop('applied_coupon', None)
+    return JsonResponse({
+        'success': False,
+        'message': 'Coupon is no longer available, please review your order'
+    })
+
+
+def create_pending_order(request):
     """
-    Создание заказа и отправка SMS кода
+    Синхронная часть checkout: проверка данных, создание заказа, сессия
+
+    Returns:
+        JsonResponse с ошибкой или (заказ, SMS код)
     """
     cart = Cart(request)
 
@@ -302,62 +273,26 @@ def checkout(request):
             'message': ', '.join(errors)
         })
 
-    # Рассчитываем суммы
-    total_price = cart.get_total_price()
+    # Применяем купон если есть и рассчитываем суммы и доставку
+    coupon = get_applied_coupon(request, cart)
+    summary = cart.get_summary(coupon)
 
-    # Применяем купон если есть
-    coupon_code = request.session.get('applied_coupon')
-    discount = 0
-    if coupon_code:
-        try:
-            coupon = Coupon.objects.get(code=coupon_code)
-            if coupon.is_valid(order_amount=total_price):
-                discount = coupon.calculate_discount(total_price)
-                # Отмечаем купон как использованный
-                coupon.mark_as_used()
-        except Coupon.DoesNotExist:
-            pass
-
-    # Рассчитываем доставку
-    delivery_cost = cart.get_delivery_cost(total_price - discount)
+    # Купон перестал действовать после того, как покупатель увидел скидку:
+    # не оформляем заказ молча по полной цене
+    if coupon is None and request.session.get('applied_coupon'):
+        return coupon_unavailable(request)
 
     try:
-        # Создаем заказ
-        order = Order.objects.create(
+        order, sms_code = place_order(
+            cart,
+            summary,
+            coupon=coupon,
             customer_name=customer_name,
             phone_number=phone_number,
             delivery_address=delivery_address,
             payment_method=payment_method,
-            total_cost=total_price,
-            discount=discount,
-            delivery_cost=delivery_cost,
-            final_cost=total_price - discount + delivery_cost,
-            coupon_code=coupon_code if coupon_code else None,
-            status=Order.STATUS_NEW
         )
 
-        # Добавляем товары в заказ
-        for item in cart.get_items_with_details():
-            OrderItem.objects.create(
-                order=order,
-                dish=item['dish'],
-                quantity=item['quantity'],
-                price_at_order=item['price'],
-                dish_name=item['dish'].name
-            )
-
-        # Генерируем SMS код (4 цифры)
-        sms_code = str(random.randint(1000, 9999))
-
-        # Сохраняем хэш кода в заказе
-        order.sms_code = hashlib.sha256(sms_code.encode()).hexdigest()
-        order.sms_code_sent_at = timezone.now()
-        order.save()
-
-        # Отправляем SMS (заглушка - в реальности используйте SMS сервис)
-        print(f"DEBUG: SMS code for order {order.id}: {sms_code}")
-        # Здесь будет вызов функции отправки SMS
-
         # Сохраняем ID заказа в сессии для верификации
         request.session['pending_order_id'] = str(order.id)
 
@@ -365,11 +300,11 @@ def checkout(request):
         if 'applied_coupon' in request.session:
             del request.session['applied_coupon']
 
-        return JsonResponse({
-            'success': True,
-            'message': 'SMS code sent to your phone',
-            'order_id': str(order.id)
-        })
+        return order, sms_code
+
+    except CouponUnavailable:
+        # Лимит купона исчерпали параллельные заказы
+        return coupon_unavailable(request)
 
     except Exception as e:
         return JsonResponse({
@@ -378,11 +313,61 @@ def checkout(request):
         })
 
 
+def release_pending_order(request, order):
+    """
+    Синхронная часть checkout после ошибки SMS-шлюза: заказ отменяется,
+    купон возвращается в сессию, чтобы повторная попытка получила скидку
+    """
+    cancel_pending_order(order)
+    if request.session.get('pending_order_id') == str(order.id):
+        del request.session['pending_order_id']
+    if order.coupon_code:
+        request.session['applied_coupon'] = order.coupon_code
+
+
 @require_POST
-def verify_sms(request):
+async def checkout(request):
+    """
+    Создание заказа и отправка SMS кода
+
+    Запросы к базе идут через ограниченный пул потоков, а ответа
+    SMS-шлюза view ждет в цикле событий, не занимая поток.
+    """
+    result = await run_db(create_pending_order, request)
+    if isinstance(result, JsonResponse):
+        return result
+
+    order, sms_code = result
+
+    try:
+        await get_sms_provider().send(order.phone_number, order_code_message(sms_code))
+    except SMSError as e:
+        logger.error(f'SMS sending error for order {order.id}: {e}')
+        await run_db(release_pending_order, request, order)
+        return JsonResponse({
+            'success': False,
+            'message': 'Could not send SMS code, please try again'
+        })
+
+    return JsonResponse({
+        'success': True,
+        'message': 'SMS code sent to your phone',
+        'order_id': str(order.id)
+    })
+
+
+@require_POST
+async def verify_sms(request):
     """
     Проверка SMS кода и подтверждение заказа
     """
+    return await run_db(confirm_order, request)
+
+
+def confirm_order(request):
+    """
+    Синхронная часть verify_sms: проверка кода и подтверждение заказа
+    """
     sms_code = request.POST.get('sms_code', '').strip()
     order_id = request.session.get('pending_order_id')
 
@@ -402,7 +387,7 @@ def verify_sms(request):
         order = Order.objects.get(id=order_id)
 
         # Проверяем код
-        code_hash = hashlib.sha256(sms_code.encode()).hexdigest()
+        code_hash = hash_sms_code(sms_code)
 
         if order.sms_code == code_hash:
             # Код верный - подтверждаем заказ
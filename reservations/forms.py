@@ -75,7 +75,6 @@ class ReservationForm(forms.Form):
         widget=forms.DateInput(attrs={
             'class': 'form-control js-date',
             'type': 'text',
-            'min': datetime.date.today().isoformat(),
             'data-label': 'Date',
             'placeholder': 'Date',
         },
@@ -125,6 +124,11 @@ class ReservationForm(forms.Form):
         }
     )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Минимальная дата считается при создании формы, а не при импорте модуля
+        self.fields['visit_date'].widget.attrs['min'] = datetime.date.today().isoformat()
+
     def clean_visit_date(self):
         visit_date = self.cleaned_data['visit_date']
         if visit_date < timezone.now().date():
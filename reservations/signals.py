@@ -1,48 +1,43 @@
-import threading
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import Reservation
-from django.template.loader import render_to_string
+from django.template.loader import get_template
 from django.core.mail import EmailMultiAlternatives
 from django.conf import settings
+from notifications.channels import enqueue_admin_notification, escape_for_channel, send_to_admin
+from notifications.jobs import enqueue, job, make_job
+from notifications.outbox import get_outbox
 
 
-def notify_admin_async(reservation_id):
-    from notifications.telegram import send_telegram_message
-    from notifications.email import send_admin_email
-    from .models import Reservation
-
+@job('reservations.reservation_created')
+def notify_reservation_created(reservation_id, channel):
+    """
+    Задача очереди: уведомление администратора о новом бронировании
+    """
     try:
         reservation = Reservation.objects.get(id=reservation_id)
     except Reservation.DoesNotExist:
         return
 
 
+    escape = escape_for_channel(channel)
     message_text = (
         f'📅 Новое бронирование\n'
-        f'👤 Имя: {reservation.name}\n'
-        f'📞 Телефон: {reservation.phone}\n'
-        f'✉️ Email: {reservation.email}\n'
+        f'👤 Имя: {escape(reservation.name)}\n'
+        f'📞 Телефон: {escape(reservation.phone)}\n'
+        f'✉️ Email: {escape(reservation.email)}\n'
         f'👥 Гостей: {reservation.guests}\n'
         f'🗓 Дата: {reservation.visit_date.strftime('%d.%m.%Y')}\n'
         f'⏰ Время: {reservation.visit_time.strftime('%H:%M')}\n'
     )
 
     if reservation.special_request:
-        message_text += f'\n📝 Пожелания:\n{reservation.special_request}'
-
-    # ---- EMAIL ----
-    send_admin_email(
-        subject='Новое бронирование столика',
-        message=message_text
-    )
+        message_text += f'\n📝 Пожелания:\n{escape(reservation.special_request)}'
 
-    # ---- TELEGRAM ----
-    send_telegram_message(message_text)
+    send_to_admin(channel, 'Новое бронирование столика', message_text)
 
-    # помечаем, что администратор уведомлён
-    reservation.admin_notified = True
-    reservation.save(update_fields=['admin_notified'])
+    # помечаем, что администратор уведомлён (update - без повторных сигналов)
+    Reservation.objects.filter(id=reservation_id).update(admin_notified=True)
 
 
 @receiver(post_save, sender=Reservation)
@@ -53,26 +48,18 @@ def reservation_created_notify(sender, instance: Reservation, created, **kwargs)
     if instance.admin_notified:
         return
 
-    threading.Thread(
-        target=notify_admin_async,
-        args=(instance.id,),
-        daemon=True
-    ).start()
+    enqueue_admin_notification(
+        'reservations.reservation_created',
+        f'reservation:{instance.id}:created',
+        reservation_id=instance.id,
+    )
 
 
-    # Отправка сообщения клиенту о подтверждении брони (async)
-def send_client_confirmation_email_async(reservation_id):
-    try:
-        reservation = Reservation.objects.get(id=reservation_id)
-    except Reservation.DoesNotExist:
-        return
-
+def build_client_confirmation_email(template, reservation):
+    """Письмо клиенту о подтверждении брони по уже загруженному шаблону"""
     subject = 'Подтверждение бронирования столика | Saffron'
 
-    html_content = render_to_string(
-        'emails/reservation_client.html',
-        {'reservation': reservation}
-    )
+    html_content = template.render({'reservation': reservation})
 
     email = EmailMultiAlternatives(
         subject=subject,
@@ -81,14 +68,32 @@ def send_client_confirmation_email_async(reservation_id):
         to=[reservation.email],
     )
     email.attach_alternative(html_content, "text/html")
+    return email
+
+
+# Отправка сообщений клиентам о подтверждении брони (задача очереди).
+# Задачи, захваченные воркером одновременно, обрабатываются одной пачкой:
+# один запрос к базе, один загруженный шаблон, одно SMTP-соединение
+@job('reservations.client_confirmation', batch=True)
+def send_client_confirmation_emails(payloads):
+    reservation_ids = [payload['reservation_id'] for payload in payloads]
+    # уже отправленные письма (например, при повторе пачки) не дублируем
+    reservations = list(Reservation.objects.filter(id__in=reservation_ids, email_sent=False))
+    if not reservations:
+        return
 
-    try:
-        email.send()
-        reservation.email_sent = True
-        reservation.save(update_fields=['email_sent'])
-    except Exception:
-        # если письмо не ушло — флаг не ставим
-        pass
+    template = get_template('emails/reservation_client.html')
+    emails = [build_client_confirmation_email(template, reservation) for reservation in reservations]
+
+    errors = get_outbox().send_many(emails)
+
+    # если письмо не ушло — флаг не ставим, задача будет повторена
+    sent_ids = [reservation.id for reservation, error in zip(reservations, errors) if error is None]
+    Reservation.objects.filter(id__in=sent_ids).update(email_sent=True)
+
+    failed = [error for error in errors if error is not None]
+    if failed:
+        raise failed[0]
 
 
 @receiver(post_save, sender=Reservation)
@@ -103,8 +108,8 @@ def reservation_confirmed_notify_client(sender, instance: Reservation, **kwargs)
         and instance.is_confirmed is True
         and not instance.email_sent
     ):
-        threading.Thread(
-            target=send_client_confirmation_email_async,
-            args=(instance.id,),
-            daemon=True
-        ).start()
+        enqueue(make_job(
+            'reservations.client_confirmation',
+            f'reservation:{instance.id}:client_email',
+            reservation_id=instance.id,
+        ))
@@ -0,0 +1,31 @@
+import datetime
+from functools import lru_cache
+
+from django import template
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+from reservations.forms import ReservationForm
+
+register = template.Library()
+
+
+@lru_cache(maxsize=16)
+def _render_reservation_form(day, language):
+    # Форма и виджет капчи собираются один раз на день и язык;
+    # CSRF-токен в шаблоне — метка, которую заполняет HolePunchMiddleware
+    return render_to_string(
+        'includes/reservation_form.html',
+        {'reservation_form': ReservationForm()}
+    )
+
+
+@register.simple_tag
+def reservation_form():
+    """
+    Готовый HTML формы бронирования из кэша процесса
+
+    Ключ кэша включает текущую дату, поэтому ограничение min у поля даты
+    обновляется при смене дня.
+    """
+    return mark_safe(_render_reservation_form(datetime.date.today(), get_language()))
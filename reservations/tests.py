@@ -1,3 +1,56 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TransactionTestCase, override_settings
+from notifications.jobs import Worker
+from notifications.models import Job
+from .models import Reservation
+
+
+@override_settings(DEFAULT_FROM_EMAIL='site@example.com')
+class ClientConfirmationEmailTest(TransactionTestCase):
+
+    def confirm_reservations(self, count, **extra):
+        reservations = [
+            Reservation.objects.create(
+                name=f'Guest {index}',
+                email=f'guest{index}@example.com',
+                phone='+70000000000',
+                guests=2,
+                visit_date=datetime.date.today(),
+                visit_time=datetime.time(19, 0),
+                **extra,
+            )
+            for index in range(count)
+        ]
+        for reservation in reservations:
+            reservation.is_confirmed = True
+            reservation.save()
+        return reservations
+
+    def test_confirmations_are_sent_as_one_batch(self):
+        reservations = self.confirm_reservations(3)
+
+        worker = Worker(workers=8, poll_interval=0.1)
+        worker.run(once=True)
+
+        self.assertEqual(worker.failed, 0)
+        self.assertFalse(Job.objects.exclude(status=Job.STATUS_DONE).exists())
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [r.email for r in reservations])
+        self.assertEqual(Reservation.objects.filter(email_sent=True).count(), 3)
+
+    def test_batch_is_not_limited_by_workers(self):
+        # Уведомления администратору отключены: считаем только письма клиентам
+        reservations = self.confirm_reservations(5, admin_notified=True)
+
+        with mock.patch.object(
+            EmailBackend, 'send_messages', autospec=True, side_effect=EmailBackend.send_messages,
+        ) as send_messages:
+            worker = Worker(workers=2, poll_interval=0.1)
+            worker.run(once=True)
+
+        self.assertEqual(worker.processed, 5)
+        self.assertEqual(send_messages.call_count, 1)
+        self.assertEqual(len(mail.outbox), len(reservations))
@@ -1,38 +1,32 @@
-import threading
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from notifications.channels import enqueue_admin_notification, escape_for_channel, send_to_admin
+from notifications.jobs import job
 from .models import Review
 
 
-def notify_admin_async(review_id):
-    from notifications.telegram import send_telegram_message
-    from notifications.email import send_admin_email
-    from .models import Review
-
+@job('reviews.review_created')
+def notify_review_created(review_id, channel):
+    """
+    Задача очереди: уведомление администратора о новом отзыве
+    """
     try:
         review = Review.objects.get(id=review_id)
     except Review.DoesNotExist:
         return
 
+    escape = escape_for_channel(channel)
     message_text = (
         f'⭐ Новый отзыв (на модерации)\n'
-        f'👤 Автор: {review.author}\n'
+        f'👤 Автор: {escape(review.author)}\n'
         f'⭐ Рейтинг: {review.get_rating_display()}\n\n'
-        f'💬 Текст отзыва:\n{review.text}'
-    )
-
-    # ---- EMAIL ----
-    send_admin_email(
-        subject='Новый отзыв посетителя',
-        message=message_text
+        f'💬 Текст отзыва:\n{escape(review.text)}'
     )
 
-    # ---- TELEGRAM ----
-    send_telegram_message(message_text)
+    send_to_admin(channel, 'Новый отзыв посетителя', message_text)
 
-    # помечаем, что администратор уведомлён
-    review.admin_notified = True
-    review.save(update_fields=['admin_notified'])
+    # помечаем, что администратор уведомлён (update - без повторных сигналов)
+    Review.objects.filter(id=review_id).update(admin_notified=True)
 
 
 @receiver(post_save, sender=Review)
@@ -43,8 +37,8 @@ def review_created_notify(sender, instance: Review, created, **kwargs):
     if instance.admin_notified:
         return
 
-    threading.Thread(
-        target=notify_admin_async,
-        args=(instance.id,),
-        daemon=True
-    ).start()
+    enqueue_admin_notification(
+        'reviews.review_created',
+        f'review:{instance.id}:created',
+        review_id=instance.id,
+    )
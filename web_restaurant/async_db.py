@@ -0,0 +1,60 @@
+"""
+Запросы к базе из асинхронных view.
+
+Синхронный ORM вызывается через sync_to_async в отдельном пуле из
+ASYNC_DB_THREADS потоков. Медленные внешние вызовы (например, SMS-шлюз)
+ждут в цикле событий и не занимают потоков, а к базе одновременно
+обращается не больше ASYNC_DB_THREADS потоков.
+
+ASYNC_DB_THREADS = 0 выполняет запросы в потоке запроса
+(thread_sensitive, поведение Django по умолчанию) - так работают тесты
+внутри транзакции TestCase.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_db_executor():
+    """Общий пул потоков для запросов к базе"""
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ASYNC_DB_THREADS', 8),
+                thread_name_prefix='db',
+            )
+        return _executor
+
+
+def _with_connection_cleanup(func):
+    # Потоки пула живут дольше запроса: соединения закрываются по тем же
+    # правилам (CONN_MAX_AGE), что и в конце обычного запроса
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+async def run_db(func, *args, **kwargs):
+    """Выполняет синхронную функцию с запросами к базе из async-кода"""
+    if not getattr(settings, 'ASYNC_DB_THREADS', 8):
+        return await sync_to_async(func)(*args, **kwargs)
+
+    return await sync_to_async(
+        _with_connection_cleanup(func),
+        thread_sensitive=False,
+        executor=get_db_executor(),
+    )(*args, **kwargs)
@@ -0,0 +1,29 @@
+"""
+Монотонные счетчики версий в общем кэше.
+
+Версия входит в ключи кэша (снимок меню, страницы, правила цен): чтобы
+сбросить все старые записи, достаточно увеличить счетчик.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def get_version(key):
+    """Текущая версия по ключу"""
+    version = cache.get(key)
+    if version is None:
+        # Ключ вытеснен или еще не создан: начинаем с метки времени,
+        # чтобы версия не откатилась назад относительно старых записей
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Увеличивает версию; записи со старой версией перестают использоваться"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+        return cache.incr(key)
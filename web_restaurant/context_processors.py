@@ -1,5 +1,6 @@
 from reservations.forms import ReservationForm
 from orders.cart import Cart
+from django.utils.functional import SimpleLazyObject
 
 
 # Активный пункт меню
@@ -22,16 +23,21 @@ def nav_active(request):
 def reservation_form_context(request):
     """
     Добавляет форму бронирования с капчей в контекст всех шаблонов
+
+    Форма создается только при обращении к ней. Шапка и подвал выводят
+    готовый HTML через тег {% reservation_form %} (reservation_tags).
     """
     return {
-        'reservation_form': ReservationForm()
+        'reservation_form': SimpleLazyObject(ReservationForm)
     }
 
 
 def cart(request):
     """
     Контекстный процессор, который добавляет корзину в контекст всех шаблонов
+
+    Корзина ленивая: сессия читается, только если шаблон обратился к cart.
     """
     return {
-        'cart': Cart(request)
+        'cart': SimpleLazyObject(lambda: Cart(request))
     }
@@ -0,0 +1,58 @@
+"""
+Загрузчик данных главной страницы.
+
+Все блюда и категории берутся из снимка меню (menu/snapshot.py), поэтому
+число запросов к базе не зависит от количества категорий: в прогретом
+состоянии это только отзывы и команда.
+"""
+from menu.snapshot import get_menu_snapshot
+from reviews.models import Review
+from chefs.models import Chef
+
+SPECIALS_COUNT = 6
+NEW_DISHES_COUNT = 2
+CATEGORIES_COUNT = 6
+REVIEWS_COUNT = 6
+CHEFS_COUNT = 4
+
+
+def load_homepage_context():
+    """
+    Возвращает контекст для home.html (те же ключи, что и раньше)
+    """
+    snapshot = get_menu_snapshot()
+
+    # Для секции Specials - берем 6 блюд, помеченных как специальные
+    special_dishes = [dish for dish in snapshot.dishes if dish.is_special][:SPECIALS_COUNT]
+    # Для секции New Dishes - берем 2 блюда, помеченных как Новинки
+    new_dishes = [dish for dish in snapshot.dishes if dish.is_new][:NEW_DISHES_COUNT]
+
+    # Если специальных блюд меньше 6, дополняем обычными
+    if len(special_dishes) < SPECIALS_COUNT:
+        additional_dishes = [
+            dish for dish in snapshot.dishes if not dish.is_special
+        ][:SPECIALS_COUNT - len(special_dishes)]
+        special_dishes = special_dishes + additional_dishes
+        new_dishes = new_dishes + additional_dishes
+
+    # Для секции Menu9 - берем по одному блюду из каждой категории
+    menu_categories = snapshot.categories[:CATEGORIES_COUNT]
+    category_dishes = [
+        {'category': category, 'dish': category.items[0]}
+        for category in menu_categories
+        if category.items
+    ]
+
+    # Секция Testimonials - отзывы клиентов
+    reviews = list(Review.objects.filter(is_published=True)[:REVIEWS_COUNT])
+    # Секция Chefs - команда
+    chefs = list(Chef.objects.filter(is_active=True).order_by('order')[:CHEFS_COUNT])
+
+    return {
+        'special_dishes': special_dishes,
+        'new_dishes': new_dishes,
+        'menu_categories': menu_categories,
+        'category_dishes': category_dishes,
+        'reviews': reviews,
+        'chefs': chefs,
+    }
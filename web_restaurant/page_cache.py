@@ -0,0 +1,244 @@
+"""
+Кэш готовых страниц для анонимных посетителей с «пробиванием дыр».
+
+Публичные страницы (главная, меню, блог, события, галерея) одинаковы для
+всех анонимных посетителей, кроме счетчика корзины, отметок «In Cart»,
+CSRF-токена и flash-сообщений. Шаблоны выводят вместо них метки
+(web_restaurant/templatetags/holes.py), страница кэшируется целиком по
+пути, значимым GET-параметрам и языку, а HolePunchMiddleware на каждом ответе подставляет данные
+текущей сессии. Прогретая страница — это поиск в словаре и замена строк.
+"""
+import re
+import threading
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.html import escape
+from django.utils.translation import get_language
+from .cache_versions import get_version, bump_version
+
+PAGE_CACHE_VERSION_KEY = 'page_cache:version'
+PAGE_CACHE_KEY = 'page_cache:{version}:{menu_version}:{language}:{path}'
+
+# Приложения, изменение данных которых меняет публичные страницы
+CONTENT_APPS = {'menu', 'blog', 'events', 'gallery', 'reviews', 'chefs'}
+
+HOLE_RE = re.compile(
+    rb'<!--hole:in_cart:(\d+)-->(.*?)<!--hole:else-->(.*?)<!--hole:end-->'
+    rb'|<!--hole:(\w+)-->',
+    re.S,
+)
+
+# Последние страницы в памяти процесса: ключ → (тело, content-type)
+_local_pages = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def hole(name):
+    return f'<!--hole:{name}-->'
+
+
+def in_cart_hole(dish_id, in_cart, not_in_cart):
+    return f'<!--hole:in_cart:{dish_id}-->{in_cart}<!--hole:else-->{not_in_cart}<!--hole:end-->'
+
+
+def get_page_cache_version():
+    return get_version(PAGE_CACHE_VERSION_KEY)
+
+
+def bump_page_cache_version():
+    """Сбрасывает все закэшированные страницы"""
+    return bump_version(PAGE_CACHE_VERSION_KEY)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def content_changed(sender, **kwargs):
+    # После коммита: иначе параллельный запрос сохранил бы под новой
+    # версией страницу со старыми данными
+    if sender._meta.app_label in CONTENT_APPS:
+        transaction.on_commit(bump_page_cache_version)
+
+
+def _page_key(request, params):
+    """
+    Ключ страницы: путь и только те GET-параметры, от которых зависит
+    ответ (params), в отсортированном порядке
+
+    Returns:
+        ключ или None, если в запросе есть другие параметры (utm-метки,
+        случайные строки) - такие ответы не кэшируются, чтобы запросы
+        с произвольными URL не заполняли общий кэш
+    """
+    from menu.snapshot import get_menu_version
+
+    if any(name not in params for name in request.GET):
+        return None
+
+    path = request.path
+    if request.GET:
+        path += '?' + urlencode(sorted(
+            (name, value) for name, values in request.GET.lists() for value in values
+        ))
+
+    return PAGE_CACHE_KEY.format(
+        version=get_page_cache_version(),
+        menu_version=get_menu_version(),
+        language=get_language(),
+        path=path,
+    )
+
+
+def _get_page(key):
+    page = _local_pages.get(key)
+    if page is not None:
+        return page
+
+    page = cache.get(key)
+    if page is not None:
+        _remember_page(key, page)
+    return page
+
+
+def _remember_page(key, page):
+    with _local_lock:
+        _local_pages[key] = page
+        _local_pages.move_to_end(key)
+        while len(_local_pages) > getattr(settings, 'PAGE_CACHE_LOCAL_SIZE', 256):
+            _local_pages.popitem(last=False)
+
+
+def anonymous_page_cache(view=None, *, params=()):
+    """
+    Декоратор: отдает анонимным посетителям страницу из кэша
+
+    В кэш попадает тело с метками, до подстановки данных сессии.
+
+        @anonymous_page_cache
+        @anonymous_page_cache(params=('q', 'page'))
+
+    Args:
+        params: GET-параметры, от которых зависит страница; запросы с
+            любыми другими параметрами обрабатываются без кэша
+    """
+    if view is None:
+        return lambda view: anonymous_page_cache(view, params=params)
+
+    params = frozenset(params)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        key = _page_key(request, params)
+        if key is None:
+            return view(request, *args, **kwargs)
+
+        page = _get_page(key)
+        if page is not None:
+            content, content_type = page
+            return HttpResponse(content, content_type=content_type)
+
+        response = view(request, *args, **kwargs)
+
+        if response.status_code == 200 and not response.streaming:
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            page = (response.content, response['Content-Type'])
+            cache.set(key, page, getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 10))
+            _remember_page(key, page)
+
+        return response
+
+    return wrapper
+
+
+def _has_holes(response):
+    return (
+        not response.streaming
+        and response.get('Content-Type', '').startswith('text/html')
+        and b'<!--hole:' in response.content
+    )
+
+
+class HolePunchMiddleware:
+    """
+    Подставляет в HTML-ответ данные текущего посетителя вместо меток
+
+    Поддерживает и ASGI: async view (checkout) не переводится в поток
+    из-за синхронного middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        response = self.get_response(request)
+        if _has_holes(response):
+            response.content = punch_holes(request, response.content)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if _has_holes(response):
+            # Корзина и сообщения читаются из сессии - это запросы к базе
+            response.content = await sync_to_async(punch_holes)(request, response.content)
+        return response
+
+
+def punch_holes(request, content):
+    """Заменяет все метки в теле ответа за один проход"""
+    from orders.cart import Cart
+
+    state = {}
+
+    def get_cart():
+        if 'cart' not in state:
+            state['cart'] = Cart(request)
+        return state['cart']
+
+    def replace(match):
+        dish_id, in_cart, not_in_cart, name = match.groups()
+        if dish_id is not None:
+            return in_cart if dish_id.decode() in get_cart() else not_in_cart
+
+        name = name.decode()
+
+        if name == 'cart_badge':
+            cart = get_cart()
+            if cart.is_empty():
+                return b''
+            return f'<span class="cart-count">{cart.get_item_count()}</span>'.encode()
+
+        if name == 'csrf_token':
+            token = escape(get_token(request))
+            return f'<input type="hidden" name="csrfmiddlewaretoken" value="{token}">'.encode()
+
+        if name == 'messages':
+            storage = get_messages(request)
+            if not storage:
+                return b''
+            return render_to_string('includes/messages.html', {'messages': storage}).encode()
+
+        return match.group(0)
+
+    return HOLE_RE.sub(replace, content)
@@ -0,0 +1,267 @@
+"""
+Постраничный вывод по ключу (keyset pagination).
+
+Вместо OFFSET следующая страница начинается после последней записи
+предыдущей: WHERE (order, created_at, id) идет после значений из курсора.
+С составным индексом в том же порядке база читает ровно одну страницу,
+сколько бы записей ни было в архиве, а новые записи не сдвигают
+страницы, которые посетитель уже видел.
+
+Курсор - значения полей сортировки последней записи страницы в JSON,
+закодированном в base64 для URL.
+
+Для списков на сайте (блог, события): ссылки ?after=/?before=, общее
+число записей из кэша (cached_count) и переадресация старых ссылок
+?page=N на страницу с курсором (redirect_to_cursor).
+"""
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+import math
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import HttpResponseRedirect
+from .cache_versions import bump_version, get_version
+
+COUNT_VERSION_KEY = 'pagination:count:{label}:version'
+COUNT_KEY = 'pagination:count:{version}:{digest}'
+
+
+@dataclass(frozen=True)
+class KeysetPage:
+    items: list
+    next_cursor: str = None
+    previous_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder обрезает время до миллисекунд - курсору нужны все цифры"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    data = json.dumps(values, cls=CursorEncoder, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor, fields):
+    """
+    Значения полей сортировки из курсора
+
+    Raises:
+        ValueError: курсор поврежден или не подходит к сортировке
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise ValueError('Invalid cursor')
+    try:
+        return [field.to_python(value) for field, value in zip(fields, values)]
+    except ValidationError as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def after(ordering, values):
+    """
+    Условия «запись идет после values» для сортировки ordering в порядке
+    вывода записей
+
+    Для ['order', '-created_at', 'id']:
+        order = o AND created_at = c AND id > i
+        order = o AND created_at < c
+        order > o
+
+    Каждое условие - один диапазон индекса. Одно условие с OR база
+    читала бы по индексу с самого начала, и глубокие страницы
+    становились бы тем медленнее, чем больше архив.
+    """
+    conditions = []
+    equal = {}
+    for name, value in zip(ordering, values):
+        field = name.lstrip('-')
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        conditions.append(Q(**equal, **{f'{field}__{lookup}': value}))
+        equal[field] = value
+    return conditions[::-1]
+
+
+def reverse_ordering(ordering):
+    return [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+
+def item_cursor(item, fields):
+    return encode_cursor([field.value_from_object(item) for field in fields])
+
+
+def read_after(queryset, ordering, values, limit):
+    """До limit записей после values - по запросу на условие из after()"""
+    queryset = queryset.order_by(*ordering)
+    items = []
+    for condition in after(ordering, values):
+        items.extend(queryset.filter(condition)[:limit - len(items)])
+        if len(items) >= limit:
+            break
+    return items
+
+
+def keyset_page(queryset, ordering, cursor=None, per_page=20, before=None):
+    """
+    Страница queryset после курсора
+
+    Args:
+        ordering: поля сортировки; последнее должно быть уникальным (id),
+            все - без NULL
+        cursor: next_cursor предыдущей страницы или None для первой
+        before: previous_cursor следующей страницы - страница перед ней
+
+    Returns:
+        KeysetPage; читается per_page + 1 запись, чтобы узнать, есть ли
+        еще страница. Первая страница - один запрос, остальные - не больше
+        одного запроса на поле сортировки (обычно один-два)
+
+    Raises:
+        ValueError: поврежденный курсор
+    """
+    model_fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in ordering]
+
+    if before:
+        items = read_after(
+            queryset, reverse_ordering(ordering), decode_cursor(before, model_fields), per_page + 1,
+        )
+        if len(items) > per_page:
+            items = items[per_page - 1::-1]
+            return KeysetPage(items, item_cursor(items[-1], model_fields), item_cursor(items[0], model_fields))
+        # Перед курсором меньше страницы записей - это первая страница
+        cursor = None
+
+    if cursor:
+        items = read_after(queryset, ordering, decode_cursor(cursor, model_fields), per_page + 1)
+    else:
+        items = list(queryset.order_by(*ordering)[:per_page + 1])
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = item_cursor(items[-1], model_fields)
+    previous_cursor = item_cursor(items[0], model_fields) if cursor and items else None
+    return KeysetPage(items, next_cursor, previous_cursor)
+
+
+def bump_count_version(model):
+    """Записи model добавлены, удалены или сняты с публикации: счетчики устарели"""
+    return bump_version(COUNT_VERSION_KEY.format(label=model._meta.label_lower))
+
+
+def cached_count(queryset):
+    """
+    COUNT(*) для queryset из общего кэша
+
+    Ключ - SQL запроса с параметрами, поэтому у каждого фильтра (тег,
+    поиск) свой счетчик. Все счетчики модели сбрасывает
+    bump_count_version (сигналы приложения).
+    """
+    version = get_version(COUNT_VERSION_KEY.format(label=queryset.model._meta.label_lower))
+    # values('pk'): select_related и сортировка не влияют на ключ
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    digest = hashlib.md5(f'{sql}:{params!r}'.encode()).hexdigest()
+    key = COUNT_KEY.format(version=version, digest=digest)
+
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, getattr(settings, 'PAGINATION_COUNT_TIMEOUT', 60 * 60))
+    return count
+
+
+def page_url(request, **params):
+    """URL текущего списка с другими параметрами страницы (остальные GET-параметры сохраняются)"""
+    query = request.GET.copy()
+    for name in ('page', 'after', 'before'):
+        query.pop(name, None)
+    for name, value in params.items():
+        if value:
+            query[name] = value
+    return f'{request.path}?{query.urlencode()}' if query else request.path
+
+
+def redirect_to_cursor(request, queryset, ordering, per_page):
+    """
+    Переадресация старой ссылки ?page=N на ту же страницу с курсором
+
+    Номер страницы переводится в курсор один раз: запрос с OFFSET
+    читает одну запись. Номер больше числа страниц ведет на последнюю
+    страницу, не число - на первую, как раньше с Paginator.
+
+    Переадресация временная: после публикации новых записей тот же
+    номер страницы соответствует другому курсору.
+
+    Returns:
+        HttpResponseRedirect или None, если в URL нет page
+    """
+    if 'page' not in request.GET:
+        return None
+    try:
+        number = int(request.GET['page'])
+    except ValueError:
+        number = 1
+
+    pages = max(math.ceil(cached_count(queryset) / per_page), 1)
+    number = min(number, pages)
+    cursor = None
+    if number > 1:
+        offset = (number - 1) * per_page - 1
+        model_fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in ordering]
+        previous = list(queryset.order_by(*ordering)[offset:offset + 1])
+        if previous:
+            cursor = item_cursor(previous[0], model_fields)
+    return HttpResponseRedirect(page_url(request, after=cursor))
+
+
+def paginate(request, queryset, ordering, per_page):
+    """
+    Страница списка по курсору из ?after= или ?before=
+
+    Поврежденный курсор - первая страница.
+
+    Returns:
+        (KeysetPage, {'count', 'previous_url', 'next_url'})
+    """
+    try:
+        page = keyset_page(
+            queryset, ordering, request.GET.get('after'), per_page, before=request.GET.get('before'),
+        )
+    except ValueError:
+        page = keyset_page(queryset, ordering, per_page=per_page)
+
+    return page, {
+        'count': cached_count(queryset),
+        'previous_url': page_url(request, before=page.previous_cursor) if page.has_previous else None,
+        'next_url': page_url(request, after=page.next_cursor) if page.has_next else None,
+    }
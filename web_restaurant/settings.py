@@ -48,6 +48,10 @@ INSTALLED_APPS = [
     'reservations.apps.ReservationsConfig',
     'django_recaptcha',
     'orders.apps.OrdersConfig',
+    'notifications.apps.NotificationsConfig',
+    'analytics.apps.AnalyticsConfig',
+    'images.apps.ImagesConfig',
+    'assets.apps.AssetsConfig',
 ]
 
 MIDDLEWARE = [
@@ -58,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'web_restaurant.page_cache.HolePunchMiddleware',
 ]
 
 ROOT_URLCONF = 'web_restaurant.urls'
@@ -76,6 +81,9 @@ TEMPLATES = [
                 'web_restaurant.context_processors.reservation_form_context',
                 'web_restaurant.context_processors.cart',
             ],
+            'libraries': {
+                'holes': 'web_restaurant.templatetags.holes',
+            },
         },
     },
 ]
@@ -113,6 +121,19 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# В продакшене укажите общий бэкенд (Redis/Memcached), чтобы снимок меню
+# и его версия были общими для всех воркеров
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'web-restaurant',
+    }
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -141,6 +162,38 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Сборка статики (assets/pipeline.py, manage.py build_static): бандлы,
+# хэши в именах файлов и сжатые копии .gz/.br. В разработке файлы
+# подключаются по отдельности и без хэшей
+STATIC_PIPELINE = not DEBUG
+STATIC_BUILD_DIR = os.path.join(BASE_DIR, 'static_build')
+STATIC_BUNDLES = {
+    'css/site.bundle.css': [
+        'css/external.css',
+        'css/bootstrap.min.css',
+        'css/style.css',
+        'css/stars.css',
+        'css/slider.css',
+        'css/flatpickr.css',
+        # Revolution Slider
+        'css/settings.css',
+        'css/layers.css',
+        'css/navigation.css',
+    ],
+    'js/site.bundle.js': [
+        'js/jquery-2.2.4.min.js',
+        'js/plugins.js',
+        'js/functions.js',
+    ],
+}
+STATIC_PIPELINE_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'assets.pipeline.PipelineStaticFilesStorage'},
+}
+if STATIC_PIPELINE:
+    STATICFILES_DIRS.append(STATIC_BUILD_DIR)
+    STORAGES = STATIC_PIPELINE_STORAGES
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -165,6 +218,9 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = ''
 EMAIL_HOST_PASSWORD = ''  # Для Gmail: пароль приложения
 DEFAULT_FROM_EMAIL = ''
+EMAIL_BATCH_WINDOW = 0.5  # письма за это время (секунды) уходят одной пачкой
+EMAIL_BATCH_SIZE = 50
+EMAIL_CONNECTION_IDLE_TIMEOUT = 60  # простаивающее SMTP-соединение закрывается
 
 # # Уведомления администратора
 ADMIN_EMAIL = ''  # Email администратора
@@ -174,6 +230,10 @@ ADMIN_EMAIL = ''  # Email администратора
 # Telegram настройки
 TELEGRAM_BOT_TOKEN = ''  # Токен бота
 TELEGRAM_CHAT_ID = ''  # ID чата/канала
+TELEGRAM_API_URL = 'https://api.telegram.org'
+TELEGRAM_COALESCE_WINDOW = 2  # сообщения за это время (секунды) уходят одной сводкой
+TELEGRAM_RATE_LIMIT = 1  # запросов в секунду в один чат
+TELEGRAM_RATE_BURST = 3  # запросов подряд без ожидания
 
 # Название сайта для email
 SITE_NAME = 'Saffron'
@@ -189,3 +249,72 @@ SESSION_SAVE_EVERY_REQUEST = True  # Обновлять сессию при ка
 # Настройки доставки
 FIXED_DELIVERY_COST = 5  # Фиксированная стоимость доставки
 FREE_DELIVERY_THRESHOLD = 100  # Порог бесплатной доставки
+
+# Снимок меню
+MENU_SNAPSHOT_TIMEOUT = 60 * 60 * 24  # Время жизни снимка в общем кэше (сек)
+
+# Кэш страниц для анонимных посетителей
+PAGE_CACHE_TIMEOUT = 60 * 10  # Время жизни страницы в общем кэше (сек)
+PAGE_CACHE_LOCAL_SIZE = 256  # Сколько страниц держать в памяти процесса
+
+# Сочетание купонов: 'best' - действует купон с наибольшей скидкой, 'sum' - скидки складываются
+COUPON_STACKING = 'best'
+
+# Время жизни индекса купонов в кэше (секунды)
+COUPON_CACHE_TIMEOUT = 60
+
+# Очередь фоновых задач (notifications.jobs, manage.py run_jobs)
+JOB_WORKERS = 4  # потоков в одном процессе run_jobs
+JOB_BATCH_SIZE = 100  # задач batch-обработчика (например, писем), выполняемых одной пачкой
+JOB_POLL_INTERVAL = 2  # пауза между опросами пустой очереди (секунды)
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_DELAY = 30  # задержка перед повтором удваивается с каждой попыткой
+JOB_RETRY_MAX_DELAY = 60 * 60
+JOB_LOCK_TIMEOUT = 60 * 10  # задачу упавшего воркера снова берут в работу через это время
+JOB_RETENTION_DAYS = 30  # выполненные и упавшие задачи старше этого удаляются
+JOB_PURGE_INTERVAL = 60 * 60  # как часто воркер удаляет старые задачи (секунды)
+
+# Асинхронный checkout: потоки для запросов к базе из async view
+# (web_restaurant/async_db.py; 0 - в потоке запроса)
+ASYNC_DB_THREADS = 8
+
+# SMS-провайдер кодов подтверждения заказа (orders/sms.py)
+SMS_PROVIDER = 'orders.sms.FakeSMSProvider'
+SMS_PROVIDER_OPTIONS = {}
+
+# Отчет menu engineering (analytics/menu_engineering.py)
+MENU_ENGINEERING_CHUNK_SIZE = 50000  # строк заказов в одной порции
+MENU_DEFAULT_FOOD_COST_RATIO = 0.35  # доля себестоимости в цене, если она не указана у блюда
+MENU_ENGINEERING_CACHE_TIMEOUT = 60 * 60  # время жизни отчета в кэше для админки (сек)
+
+# Рекомендации «с этим часто заказывают» (analytics/recommendations.py)
+RECOMMENDATIONS_LIMIT = 4  # сколько блюд предлагать
+RECOMMENDATIONS_NEIGHBOURS = 20  # соседей на блюдо в индексе
+RECOMMENDATIONS_MIN_ORDERS = 3  # пары, встречавшиеся реже, не учитываются
+RECOMMENDATIONS_TIMEOUT = 60 * 60 * 24  # время жизни индекса в общем кэше (сек)
+
+# Поиск по блогу (blog/search.py)
+BLOG_SEARCH_MAX_RESULTS = 1000  # сколько найденных постов показывать
+BLOG_SEARCH_CACHE_TIMEOUT = 60 * 5  # время жизни результатов поиска в кэше (сек)
+
+# Адаптивные изображения (images/derivatives.py)
+IMAGE_DERIVATIVE_WIDTHS = (160, 320, 480, 768, 1024, 1600)  # ширины копий, px
+IMAGE_DERIVATIVE_FORMATS = ('avif', 'webp', 'jpeg')  # последний - запасной формат для <img>
+IMAGE_DERIVATIVE_QUALITY = {'avif': 55, 'webp': 78, 'jpeg': 80}
+IMAGE_MANIFEST_TIMEOUT = 60 * 60 * 24  # время жизни манифеста копий в общем кэше (сек)
+
+# Галерея: фото на странице и в одной подгрузке при прокрутке (gallery/views.py)
+GALLERY_PAGE_SIZE = 15
+
+# Число записей в списках блога и событий (web_restaurant/pagination.py)
+PAGINATION_COUNT_TIMEOUT = 60 * 60  # время жизни счетчика в общем кэше (сек)
+
+# Отдача медиафайлов (assets/views.py serve_media). None - файл отдает
+# сам Django (FileResponse; gunicorn передает его через sendfile),
+# 'x-accel-redirect' - nginx, 'x-sendfile' - Apache/lighttpd. Во втором
+# и третьем случае Django только проверяет путь, а файл, Range и 304
+# отдает веб-сервер
+MEDIA_SENDFILE = None
+# internal location nginx, который смотрит в MEDIA_ROOT:
+#     location /protected-media/ { internal; alias /path/to/media/; }
+MEDIA_ACCEL_PREFIX = '/protected-media/'
@@ -0,0 +1,67 @@
+"""
+Метки «дыр» для кэша страниц (см. web_restaurant/page_cache.py).
+
+Вместо данных конкретного посетителя шаблон выводит HTML-комментарий,
+который HolePunchMiddleware заменяет на актуальное значение из сессии.
+Так одна и та же закэшированная страница подходит любому посетителю.
+"""
+from django import template
+from django.utils.safestring import mark_safe
+from web_restaurant.page_cache import hole, in_cart_hole
+
+register = template.Library()
+
+
+@register.simple_tag
+def cart_badge():
+    """Счетчик товаров в корзине в шапке"""
+    return mark_safe(hole('cart_badge'))
+
+
+@register.simple_tag
+def csrf_token_hole():
+    """Скрытое поле с CSRF-токеном текущего посетителя"""
+    return mark_safe(hole('csrf_token'))
+
+
+@register.simple_tag
+def messages_hole():
+    """Блок flash-сообщений текущего посетителя"""
+    return mark_safe(hole('messages'))
+
+
+@register.tag('in_cart')
+def do_in_cart(parser, token):
+    """
+    {% in_cart item.id %} ...в корзине... {% else %} ...не в корзине... {% endin_cart %}
+
+    В кэш попадают обе ветки, нужную выбирает middleware.
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag takes exactly one argument: dish id")
+
+    nodelist_in = parser.parse(('else', 'endin_cart'))
+    token = parser.next_token()
+    if token.contents == 'else':
+        nodelist_out = parser.parse(('endin_cart',))
+        parser.delete_first_token()
+    else:
+        nodelist_out = template.NodeList()
+
+    return InCartNode(parser.compile_filter(bits[1]), nodelist_in, nodelist_out)
+
+
+class InCartNode(template.Node):
+
+    def __init__(self, dish_id, nodelist_in, nodelist_out):
+        self.dish_id = dish_id
+        self.nodelist_in = nodelist_in
+        self.nodelist_out = nodelist_out
+
+    def render(self, context):
+        return mark_safe(in_cart_hole(
+            self.dish_id.resolve(context),
+            self.nodelist_in.render(context),
+            self.nodelist_out.render(context),
+        ))
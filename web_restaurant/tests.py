@@ -0,0 +1,181 @@
+import re
+from decimal import Decimal
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from analytics.models import DishPair
+from analytics.recommendations import publish_index
+from menu.models import Category, MenuItem
+from reviews.models import Review
+from chefs.models import Chef
+from .homepage import load_homepage_context
+from .page_cache import _page_key, anonymous_page_cache, get_page_cache_version
+
+# Максимум запросов на главную: снимок меню (4), отзывы, команда и сессия
+HOMEPAGE_QUERY_BUDGET = 10
+
+
+class HomepageQueryBudgetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(8):
+            category = Category.objects.create(name=f'Category {index}', order=index)
+            for number in range(8):
+                MenuItem.objects.create(
+                    name=f'Dish {index}-{number}',
+                    description='Description',
+                    ingredients='Ingredients',
+                    price=Decimal('10.00') + number,
+                    category=category,
+                    is_special=number == 0,
+                    is_new=number == 1,
+                )
+        for index in range(8):
+            Review.objects.create(author=f'Author {index}', text='Text', admin_notified=True)
+        for index in range(5):
+            Chef.objects.create(
+                name=f'Chef {index}',
+                position='Chef',
+                bio='Bio',
+                image='chefs_images/1.jpg',
+                experience=5,
+                specialty='Soup',
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_homepage_within_query_budget(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), HOMEPAGE_QUERY_BUDGET)
+
+    def test_query_count_does_not_grow_with_categories(self):
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(reverse('home'))
+
+        category = Category.objects.create(name='Extra', order=100)
+        MenuItem.objects.create(
+            name='Extra dish', description='-', ingredients='-', price=Decimal('1.00'), category=category
+        )
+
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(reverse('home'))
+
+        self.assertEqual(len(before), len(after))
+
+    def test_warm_loader_only_queries_reviews_and_chefs(self):
+        load_homepage_context()
+        with self.assertNumQueries(2):
+            context = load_homepage_context()
+
+        self.assertEqual(len(context['special_dishes']), 6)
+        self.assertEqual(len(context['category_dishes']), 6)
+        self.assertEqual(len(context['reviews']), 6)
+        self.assertEqual(len(context['chefs']), 4)
+        self.assertEqual(context['category_dishes'][0]['dish'].name, 'Dish 0-0')
+
+
+class PageCacheKeyTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def request(self, url):
+        request = self.factory.get(url)
+        request.user = AnonymousUser()
+        return request
+
+    def test_key_uses_whitelisted_params_in_sorted_order(self):
+        params = frozenset(['q', 'page'])
+        self.assertEqual(
+            _page_key(self.request('/blog/?q=soup&page=2'), params),
+            _page_key(self.request('/blog/?page=2&q=soup'), params),
+        )
+        self.assertNotEqual(
+            _page_key(self.request('/blog/?q=soup'), params),
+            _page_key(self.request('/blog/'), params),
+        )
+
+    def test_unknown_params_are_not_cached(self):
+        calls = []
+
+        @anonymous_page_cache(params=('cursor',))
+        def view(request):
+            calls.append(request)
+            return HttpResponse('page')
+
+        view(self.request('/gallery/images/?cursor=abc'))
+        view(self.request('/gallery/images/?cursor=abc'))
+        self.assertEqual(len(calls), 1)
+
+        # utm-метки и мусор в URL не создают записей в кэше
+        for url in ('/gallery/images/?utm_source=mail', '/gallery/images/?cursor=abc&fbclid=1'):
+            view(self.request(url))
+            self.assertIsNone(_page_key(self.request(url), frozenset(['cursor'])))
+        self.assertEqual(len(calls), 3)
+
+
+@override_settings(RECOMMENDATIONS_MIN_ORDERS=1)
+class HolePunchTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Desserts')
+        self.soup, self.cake = (
+            MenuItem.objects.create(
+                name=name, description='-', ingredients='-', price=Decimal('5.00'), category=category, is_delivery=True,
+            )
+            for name in ('Soup', 'Cake')
+        )
+        # Подсказка «часто заказывают» дает каждому посетителю свое сообщение
+        DishPair.objects.bulk_create(
+            DishPair(first_id=first.id, second_id=second.id, orders_count=1)
+            for first, second in ((self.soup, self.soup), (self.cake, self.cake), (self.cake, self.soup))
+        )
+        publish_index()
+
+    def visit_menu(self, dish):
+        client = Client()
+        client.get(reverse('menu:add_to_cart', args=[dish.id]), HTTP_REFERER='/')
+        return client.get(reverse('menu:list'))
+
+    def test_cached_page_gets_each_visitors_holes(self):
+        first = self.visit_menu(self.soup)
+        second = self.visit_menu(self.cake)
+        # Вторая страница отдана из кэша, шаблон меню не рендерился
+        self.assertIn('menu/list.html', [template.name for template in first.templates])
+        self.assertNotIn('menu/list.html', [template.name for template in second.templates])
+
+        tokens = []
+        for page, in_cart, other in ((first, self.soup, self.cake), (second, self.cake, self.soup)):
+            content = page.content.decode()
+            self.assertNotIn('<!--hole:', content)
+            self.assertIn('<span class="cart-count">1</span>', content)
+            self.assertNotIn(f'value="dish-{in_cart.id}"', content)
+            self.assertIn(f'value="dish-{other.id}"', content)
+            self.assertEqual(content.count('delivery in-cart'), 1)
+            self.assertIn(f'С блюдом &quot;{in_cart.name}&quot; часто заказывают: {other.name}', content)
+            self.assertNotIn(f'С блюдом &quot;{other.name}&quot;', content)
+            tokens.append(re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', content).group(1))
+
+        # CSRF-токен у каждого посетителя свой
+        self.assertNotEqual(*tokens)
+
+    def test_content_change_resets_cache_after_commit(self):
+        version = get_page_cache_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.soup.name = 'Borscht'
+            self.soup.save()
+            self.assertEqual(get_page_cache_version(), version)
+        self.assertNotEqual(get_page_cache_version(), version)
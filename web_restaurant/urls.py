@@ -15,9 +15,9 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, include, re_path
 from django.conf import settings
+from assets.views import serve_media, serve_static
 from . import views
 
 
@@ -32,7 +32,16 @@ urlpatterns = [
     path('gallery/', include('gallery.urls', namespace='gallery')),
     path('reservations/', include('reservations.urls')),
     path('orders/', include('orders.urls', namespace='orders')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('analytics/', include('analytics.urls', namespace='analytics')),
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Загруженные файлы: ETag/304 и Range, в продакшене - через
+    # X-Accel-Redirect/X-Sendfile (MEDIA_SENDFILE)
+    re_path(rf'^{settings.MEDIA_URL.strip("/")}/(?P<path>.*)$', serve_media, name='media'),
+]
+
+# Собранная статика (manage.py build_static) со сжатыми копиями и
+# долгим кэшированием, если перед Django нет отдельного веб-сервера
+if settings.STATIC_PIPELINE:
+    urlpatterns += [
+        re_path(rf'^{settings.STATIC_URL.strip("/")}/(?P<path>.*)$', serve_static, name='static'),
+    ]